@@ -0,0 +1,32 @@
+"""Import and query benchmarks of timelink.
+
+Not part of the test suite, run with::
+
+    pytest benchmarks
+    pytest benchmarks --tl-benchmark-acts 2000 --tl-benchmark-db all
+    pytest benchmarks/test_query_benchmark.py --tl-benchmark-entities 100000
+
+The files imported are generated by :mod:`benchmarks.corpus`. For each
+corpus and database the suite reports entities per second, commits,
+sql statements and the peak memory of the importing process.
+
+The query benchmarks build databases of generated entities, 10000 by
+default, --tl-benchmark-entities can be repeated for 100000 or 1000000
+(building the larger ones takes from minutes to hours and is not
+measured). For the pandas helpers, networks, get_entity, to_kleio and
+export_as_kleio they report latency percentiles and the sql statements
+of each call; query counts must stay within the budget of each helper,
+see :mod:`benchmarks.test_query_benchmark`.
+
+Results can be saved as a baseline, in benchmarks/baselines, and later
+runs compared with it; a run fails if a measure is worse than the
+baseline by more than the tolerance (20%), or executes more queries::
+
+    pytest benchmarks --tl-benchmark-save before
+    # change the importer
+    pytest benchmarks --tl-benchmark-compare before
+
+Baselines are only comparable on the same machine and with the same
+number of acts; query results are saved by number of entities. PostgreSQL runs in the docker container started by
+TimelinkDatabase, and is skipped without docker.
+"""
@@ -0,0 +1,131 @@
+"""Options and baselines of the benchmark suite, see benchmarks/__init__.py"""
+
+import json
+import platform
+from pathlib import Path
+
+import pytest
+
+import timelink
+
+BASELINES_DIR = Path(__file__).parent / "baselines"
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup("timelink benchmarks")
+    group.addoption(
+        "--tl-benchmark-acts", type=int, default=500, help="acts in each synthetic file"
+    )
+    group.addoption(
+        "--tl-benchmark-rounds", type=int, default=3, help="imports of each file, the median is kept"
+    )
+    group.addoption(
+        "--tl-benchmark-entities",
+        type=int,
+        action="append",
+        help="entities of the query benchmark databases, can be repeated, default 10000",
+    )
+    group.addoption(
+        "--tl-benchmark-repeat",
+        type=int,
+        default=20,
+        help="calls of each query helper, for the latency percentiles",
+    )
+    group.addoption(
+        "--tl-benchmark-db",
+        choices=["sqlite", "postgres", "all"],
+        default="sqlite",
+        help="databases to benchmark, postgres runs in docker",
+    )
+    group.addoption(
+        "--tl-benchmark-save", metavar="NAME", help="save results in baselines/NAME.json"
+    )
+    group.addoption(
+        "--tl-benchmark-compare", metavar="NAME", help="fail if worse than baselines/NAME.json"
+    )
+    group.addoption(
+        "--tl-benchmark-tolerance",
+        type=float,
+        default=0.2,
+        help="fraction a measure can be worse than the baseline, default 0.2",
+    )
+
+
+def pytest_generate_tests(metafunc):
+    if "db_type" in metafunc.fixturenames:
+        db = metafunc.config.getoption("--tl-benchmark-db")
+        db_types = ["sqlite", "postgres"] if db == "all" else [db]
+        metafunc.parametrize("db_type", db_types)
+    if "n_entities" in metafunc.fixturenames:
+        sizes = metafunc.config.getoption("--tl-benchmark-entities") or [10000]
+        metafunc.parametrize("n_entities", sizes)
+
+
+@pytest.fixture(scope="session")
+def benchmark_results(request):
+    """Results of the session by benchmark id, saved at the end if requested"""
+    results = {}
+    request.config._timelink_benchmarks = results
+    yield results
+    name = request.config.getoption("--tl-benchmark-save")
+    if name and results:
+        BASELINES_DIR.mkdir(exist_ok=True)
+        baseline = {
+            "machine": platform.node(),
+            "platform": platform.platform(),
+            "python": platform.python_version(),
+            "timelink": timelink.version,
+            "acts": request.config.getoption("--tl-benchmark-acts"),
+            "entities": request.config.getoption("--tl-benchmark-entities") or [10000],
+            "results": results,
+        }
+        with open(BASELINES_DIR / f"{name}.json", "w", encoding="utf-8") as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+
+
+@pytest.fixture(scope="session")
+def baseline(request) -> dict:
+    """Results of the baseline to compare with, empty if none"""
+    name = request.config.getoption("--tl-benchmark-compare")
+    if not name:
+        return {}
+    path = BASELINES_DIR / f"{name}.json"
+    if not path.exists():
+        pytest.fail(f"No baseline {path}")
+    with open(path, encoding="utf-8") as f:
+        saved = json.load(f)
+    if saved.get("acts") != request.config.getoption("--tl-benchmark-acts"):
+        pytest.fail(f"Baseline {name} was measured with {saved.get('acts')} acts per file")
+    return saved["results"]
+
+
+def pytest_terminal_summary(terminalreporter, config):
+    results = getattr(config, "_timelink_benchmarks", None)
+    if not results:
+        return
+    imports = {key: result for key, result in results.items() if "entities_per_second" in result}
+    queries = {key: result for key, result in results.items() if "queries" in result}
+    if imports:
+        terminalreporter.section("timelink import benchmarks")
+        terminalreporter.write_line(
+            f"{'benchmark':<24}{'entities':>10}{'ent/s':>10}{'commits':>10}"
+            f"{'statements':>12}{'peak MB':>10}"
+        )
+    for key, result in imports.items():
+        terminalreporter.write_line(
+            f"{key:<24}{result['entities']:>10}{result['entities_per_second']:>10.1f}"
+            f"{result['commits']:>10}{result['statements']:>12}{result['peak_rss_mb']:>10.1f}"
+        )
+    if queries:
+        terminalreporter.section("timelink query benchmarks")
+        terminalreporter.write_line(
+            f"{'benchmark':<52}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"
+            f"{'queries':>10}{'per id':>8}"
+        )
+    for key, result in queries.items():
+        per_item = result.get("queries_per_item")
+        per_item = "" if per_item is None else f"{per_item:.1f}"
+        terminalreporter.write_line(
+            f"{key:<52}{result['p50_ms']:>10.2f}{result['p95_ms']:>10.2f}"
+            f"{result['p99_ms']:>10.2f}{result['queries']:>10}{per_item:>8}"
+        )
@@ -0,0 +1,239 @@
+"""Synthetic Kleio xml files for import benchmarks.
+
+The files have the structure of the exports of the Kleio translator
+(see tests/xml_data) with a configurable number of acts. Each act has
+persons, with attributes and relations, some persons are declared the
+same as a person of the previous act, and some acts and objects are of
+classes with tables of their own (dynamic classes).
+
+Content is generated from a seed, so that the same parameters always
+produce the same file.
+
+Example::
+
+    xml = synthetic_kleio_xml(n_acts=1000, seed=1)
+    Path("synthetic.xml").write_bytes(xml)
+"""
+
+import random
+from pathlib import Path
+
+FIRST_NAMES = ["maria", "joao", "ana", "manuel", "antonia", "francisco", "isabel", "pedro"]
+LAST_NAMES = ["vargas", "goncalves", "cordeiro", "madeira", "ferreira", "gomes", "rodrigues"]
+PLACES = ["alencarce", "soure", "coimbra", "granja", "vinha da rainha", "tapeus"]
+ATTRIBUTE_TYPES = ["residencia", "profissao", "titulo", "naturalidade"]
+
+# name, super class, table, group, extra columns
+CLASSES = [
+    ("source", "entity", "sources", "fonte", ["date", "type", "value", "loc", "ref", "kleiofile"]),
+    ("act", "entity", "acts", "bap", ["date", "type", "loc", "ref"]),
+    ("person", "entity", "persons", "n", ["name", "sex"]),
+    ("relation", "entity", "relations", "relation", ["date", "origin", "destination", "type", "value"]),
+    ("attribute", "entity", "attributes", "ls", ["entity", "date", "type", "value"]),
+    ("object", "entity", "objects", "object", ["name", "type"]),
+    # dynamic classes, the importer creates their tables
+    ("bench_obito", "act", "bench_obitos", "obito", ["date", "type", "loc", "ref", "causa"]),
+    ("bench_bem", "object", "bench_bens", "bem", ["name", "type", "valor"]),
+]
+
+COLUMNS = {"date": "the_date", "type": "the_type", "value": "the_value"}
+
+
+def _class_xml(name, super_class, table, group, columns) -> str:
+    attributes = ["id"] + columns + ["obs"]
+    lines = [f'<CLASS NAME="{name}" SUPER="{super_class}" TABLE="{table}" GROUP="{group}">']
+    for attribute in attributes:
+        size = 1024 if attribute == "obs" else 64
+        pkey = 1 if attribute == "id" else 0
+        lines.append(
+            f'     <ATTRIBUTE NAME="{attribute}" COLUMN="{COLUMNS.get(attribute, attribute)}" '
+            f'CLASS="{attribute}" TYPE="varchar" SIZE="{size}" PRECISION="0" '
+            f'PKEY="{pkey}" ></ATTRIBUTE>'
+        )
+    lines.append("</CLASS>")
+    return "\n".join(lines)
+
+
+class _Writer:
+    """Keeps the order and line of the groups written"""
+
+    def __init__(self):
+        self.parts = []
+        self.order = 0
+        self.line = 1
+
+    def group(self, gid, name, the_class, level, inside, elements: dict):
+        self.order += 1
+        self.line += 1
+        parts = [
+            f'<GROUP ID="{gid}" NAME="{name}" CLASS="{the_class}" ORDER="{self.order}" '
+            f'LEVEL="{level}" LINE="{self.line}">',
+            f'    <ELEMENT NAME="line" CLASS="line"><core>{self.line}</core></ELEMENT>',
+            f'    <ELEMENT NAME="id" CLASS="id"><core>{gid}</core></ELEMENT>',
+            f'    <ELEMENT NAME="groupname" CLASS="groupname"><core>{name}</core></ELEMENT>',
+            f'    <ELEMENT NAME="inside" CLASS="inside"><core>{inside}</core></ELEMENT>',
+            f'    <ELEMENT NAME="class" CLASS="class"><core>{the_class}</core></ELEMENT>',
+            f'    <ELEMENT NAME="order" CLASS="order"><core>{self.order}</core></ELEMENT>',
+            f'    <ELEMENT NAME="level" CLASS="level"><core>{level}</core></ELEMENT>',
+        ]
+        for element, value in elements.items():
+            parts.append(
+                f'    <ELEMENT NAME="{element}" CLASS="{element}">'
+                f"<core><![CDATA[{value}]]></core></ELEMENT>"
+            )
+        parts.append("</GROUP>")
+        self.parts.append("\n".join(parts))
+
+    def relation(self, rid, origin, destination, rel_type, value, date, inside, level):
+        self.group(
+            rid,
+            "relation",
+            "relation",
+            level,
+            inside,
+            {
+                "type": rel_type,
+                "value": value,
+                "origin": origin,
+                "destination": destination,
+                "date": date,
+            },
+        )
+
+    def same_as(self, rid, origin, destination):
+        self.parts.append(
+            f'<RELATION ID="{rid}" ORG="{origin}" DEST="{destination}" '
+            f'TYPE="META" VALUE="same_as"/>'
+        )
+
+
+def synthetic_kleio_xml(
+    n_acts: int = 100,
+    persons_per_act: int = 3,
+    attributes_per_person: int = 2,
+    same_as_every: int = 5,
+    dynamic_every: int = 4,
+    source_id: str = "synthetic",
+    seed: int = 0,
+) -> bytes:
+    """Return a Kleio xml export with n_acts acts
+
+    Args:
+        n_acts (int): number of acts
+        persons_per_act (int): persons in each act, the second is the
+            father of the first
+        attributes_per_person (int): attributes of each person
+        same_as_every (int): the first person of every n-th act is the
+            same as the first person of the previous act, 0 for none
+        dynamic_every (int): every n-th act, and an object in it, are of
+            dynamic classes, 0 for none
+        source_id (str): id of the source, prefix of the ids of the groups
+        seed (int): seed of the random content
+
+    Returns:
+        bytes: the xml, utf-8 encoded
+    """
+    rng = random.Random(seed)
+    kleio_file = f"/kleio-home/sources/benchmarks/{source_id}.cli"
+    header = (
+        "<?xml version='1.0'?>\n"
+        f'<KLEIO STRUCTURE="/kleio-home/system/conf/kleio/stru/gacto2.str" '
+        f'SOURCE="{kleio_file}" TRANSLATOR="gactoxml2.str" '
+        f'WHEN="2024-1-1 12:00:00" OBS="" SPACE="">'
+    )
+    writer = _Writer()
+    writer.parts.append(header)
+    writer.parts.extend(_class_xml(*definition) for definition in CLASSES)
+    writer.group(
+        source_id,
+        "fonte",
+        "source",
+        1,
+        "root",
+        {"type": "benchmark", "date": "16850000", "kleiofile": kleio_file},
+    )
+    previous_person = None
+    for i in range(1, n_acts + 1):
+        act_id = f"{source_id}.{i}"
+        date = f"1685{rng.randint(1, 12):02d}{rng.randint(1, 28):02d}"
+        dynamic = dynamic_every > 0 and i % dynamic_every == 0
+        if dynamic:
+            writer.group(
+                act_id, "obito", "bench_obito", 2, source_id,
+                {"date": date, "type": "obito", "loc": rng.choice(PLACES),
+                 "causa": rng.choice(["febre", "velhice", "acidente"])},
+            )
+        else:
+            writer.group(
+                act_id, "bap", "act", 2, source_id,
+                {"date": date, "type": "bap", "loc": rng.choice(PLACES), "ref": f"fol. {i}"},
+            )
+        first_person = None
+        for j in range(1, persons_per_act + 1):
+            person_id = f"{act_id}-per{j}"
+            writer.group(
+                person_id, "n", "person", 3, act_id,
+                {"name": f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+                 "sex": rng.choice("mf")},
+            )
+            writer.relation(
+                f"{person_id}-rela1", person_id, act_id, "function-in-act", "n",
+                date, person_id, 4,
+            )
+            if j == 1:
+                first_person = person_id
+            elif j == 2:
+                writer.relation(
+                    f"{person_id}-rela2", person_id, first_person, "parentesco", "pai",
+                    date, person_id, 4,
+                )
+            for k in range(1, attributes_per_person + 1):
+                writer.group(
+                    f"{person_id}-att{k}", "ls", "attribute", 4, person_id,
+                    {"type": rng.choice(ATTRIBUTE_TYPES), "value": rng.choice(PLACES),
+                     "entity": person_id, "date": date},
+                )
+        if dynamic:
+            writer.group(
+                f"{act_id}-obj1", "bem", "bench_bem", 3, act_id,
+                {"name": "casa", "type": "bem", "valor": str(rng.randint(1, 1000))},
+            )
+        if (
+            same_as_every > 0
+            and i % same_as_every == 0  # noqa: W503
+            and previous_person is not None  # noqa: W503
+            and first_person is not None  # noqa: W503
+        ):
+            rid = f"{first_person}-sameas"
+            writer.same_as(rid, first_person, previous_person)
+            writer.relation(
+                rid, first_person, previous_person, "identification", "same as",
+                date, first_person, 4,
+            )
+        previous_person = first_person
+    writer.parts.append("</KLEIO>\n")
+    return "\n".join(writer.parts).encode("utf-8")
+
+
+def write_corpus(directory, n_files: int = 1, **kwargs) -> list[Path]:
+    """Write synthetic files to a directory, one source per file
+
+    Args:
+        directory (str | Path): directory for the files
+        n_files (int): number of files
+        **kwargs: arguments of synthetic_kleio_xml, the seed of each file
+            is the seed plus its number
+
+    Returns:
+        list[Path]: the files written
+    """
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    seed = kwargs.pop("seed", 0)
+    files = []
+    for n in range(n_files):
+        source_id = f"synthetic{n + 1}"
+        path = directory / f"{source_id}.xml"
+        path.write_bytes(synthetic_kleio_xml(source_id=source_id, seed=seed + n, **kwargs))
+        files.append(path)
+    return files
@@ -0,0 +1,96 @@
+"""Run one import and measure it, in a process of its own.
+
+Each run starts a fresh interpreter so that the peak memory of the
+process (peak RSS) is that of the import, not of earlier runs.
+"""
+
+import multiprocessing
+import resource
+import shutil
+import sys
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+import pytest
+
+BENCHMARK_DB = "timelink_benchmark"
+
+
+def check_postgres(db_type):
+    """Skip a postgres benchmark if docker is not running"""
+    if db_type != "postgres":
+        return
+    from timelink.kleio.kleio_server import is_docker_running
+
+    if not is_docker_running():
+        pytest.skip("postgres benchmarks need docker")
+
+
+def peak_rss_mb() -> float:
+    """Peak resident memory of this process, in MB"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # bytes in macOS, kilobytes in Linux
+    if sys.platform == "darwin":
+        return peak / (1024 * 1024)
+    return peak / 1024
+
+
+def _import_file(xml_file: str, db_type: str) -> dict:
+    # start_rss_mb includes the modules, not the import
+    from sqlalchemy import event
+
+    from timelink.api.database import TimelinkDatabase
+    from timelink.kleio.importer import import_from_xml
+
+    rss_start = peak_rss_mb()
+    db_dir = tempfile.mkdtemp(prefix="timelink-benchmark-")
+    try:
+        db = TimelinkDatabase(BENCHMARK_DB, db_type, db_path=db_dir, drop_if_exists=True)
+        statements = 0
+
+        def count_statement(*args):
+            nonlocal statements
+            statements += 1
+
+        event.listen(db.engine, "before_cursor_execute", count_statement)
+        try:
+            with db.session() as session:
+                stats = import_from_xml(
+                    xml_file, session, {"return_stats": True, "slow_group_seconds": None}
+                )
+        finally:
+            event.remove(db.engine, "before_cursor_execute", count_statement)
+            db.drop_db()
+    finally:
+        shutil.rmtree(db_dir, ignore_errors=True)
+
+    stages = stats["stages"]
+    return {
+        "entities": stats["entities_processed"],
+        "seconds": stats["import_time_seconds"],
+        "entities_per_second": stats["entity_rate"],
+        "commits": stages.get("commit", {}).get("calls", 0),
+        "statements": statements,
+        "peak_rss_mb": peak_rss_mb(),
+        "start_rss_mb": rss_start,
+        "nerrors": stats["nerrors"],
+        "stages": {name: stage["seconds"] for name, stage in stages.items()},
+    }
+
+
+def measure_import(xml_file, db_type: str = "sqlite") -> dict:
+    """Import a file into an empty database in a new process and measure it
+
+    Args:
+        xml_file (str | Path): the xml file
+        db_type (str): "sqlite" or "postgres"
+
+    Returns:
+        dict: entities, seconds, entities_per_second, commits, statements
+        (sql statements executed), peak_rss_mb, start_rss_mb (peak before
+        the import, interpreter and modules), nerrors and the seconds of
+        each stage, see :mod:`timelink.kleio.import_timer`
+    """
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+        return executor.submit(_import_file, str(xml_file), db_type).result()
@@ -0,0 +1,131 @@
+"""Databases of generated entities and measures of the read path.
+
+A database of about n entities is built by importing synthetic files
+(see :mod:`benchmarks.corpus`) of up to ACTS_PER_FILE acts each. The
+queries are then timed with :func:`measure_calls`, which also counts
+the sql statements of each call with an engine event, so that a helper
+that starts issuing a query per row (N+1) shows up in the counts.
+"""
+
+import math
+import statistics
+import time
+from pathlib import Path
+
+from sqlalchemy import event, func, select
+
+from benchmarks.corpus import synthetic_kleio_xml
+from timelink.api.database import TimelinkDatabase
+from timelink.api.models.entity import Entity
+from timelink.kleio.importer import import_from_xml
+
+# entities of an act with the default arguments of synthetic_kleio_xml:
+# act, 3 persons with a function-in-act relation and 2 attributes each,
+# a parent relation, an object every 4 acts and a same_as every 5
+ENTITIES_PER_ACT = 14.45
+ACTS_PER_FILE = 5000
+
+
+class QueryCounter:
+    """Count the sql statements executed by an engine
+
+    Example::
+
+        with QueryCounter(db.engine) as counter:
+            db.get_entity("synthetic1.1")
+        print(counter.count)
+    """
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.count = 0
+
+    def _count(self, *args):
+        self.count += 1
+
+    def __enter__(self):
+        event.listen(self.engine, "before_cursor_execute", self._count)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(self.engine, "before_cursor_execute", self._count)
+        return False
+
+
+def build_database(db_name: str, db_type: str, n_entities: int, db_path=None) -> tuple:
+    """Create a database with about n_entities generated entities
+
+    Args:
+        db_name (str): name of the database, dropped if it exists
+        db_type (str): "sqlite" or "postgres"
+        n_entities (int): approximate number of entities
+        db_path (str | Path): directory of the sqlite database and of
+            the files imported
+
+    Returns:
+        tuple: the TimelinkDatabase and the number of entities stored
+    """
+    db = TimelinkDatabase(db_name, db_type, db_path=db_path, drop_if_exists=True)
+    acts = max(1, math.ceil(n_entities / ENTITIES_PER_ACT))
+    directory = Path(db_path or ".")
+    n = 0
+    while acts > 0:
+        n += 1
+        source_id = f"synthetic{n}"
+        xml_file = directory / f"{source_id}.xml"
+        xml_file.write_bytes(
+            synthetic_kleio_xml(n_acts=min(acts, ACTS_PER_FILE), source_id=source_id, seed=n)
+        )
+        try:
+            with db.session() as session:
+                import_from_xml(xml_file, session, {"slow_group_seconds": None})
+        finally:
+            xml_file.unlink()
+        acts -= ACTS_PER_FILE
+    with db.session() as session:
+        stored = session.scalar(select(func.count()).select_from(Entity))
+    return db, stored
+
+
+def percentile(data: list, p: float) -> float:
+    """Percentile of data, with linear interpolation between values"""
+    values = sorted(data)
+    position = (len(values) - 1) * p / 100
+    lower = math.floor(position)
+    upper = min(lower + 1, len(values) - 1)
+    return values[lower] + (values[upper] - values[lower]) * (position - lower)
+
+
+def measure_calls(db: TimelinkDatabase, function, repeat: int = 20) -> dict:
+    """Call function(session) repeat times, each with a new session
+
+    A new session for each call keeps objects loaded by one call from
+    saving queries in the next. A first call, not measured, loads the
+    table metadata the helpers cache.
+
+    Returns:
+        dict: p50_ms, p95_ms, p99_ms and mean_ms of the calls, and
+        queries, the sql statements of the first call. Calls that
+        execute a different number of statements raise ValueError,
+        the count must not depend on timing.
+    """
+    with db.session() as session:
+        function(session)
+    seconds = []
+    counts = []
+    for _ in range(max(1, repeat)):
+        with db.session() as session, QueryCounter(db.engine) as counter:
+            start = time.perf_counter()
+            function(session)
+            seconds.append(time.perf_counter() - start)
+        counts.append(counter.count)
+    if len(set(counts)) > 1:
+        raise ValueError(f"Query counts differ between calls: {counts}")
+    return {
+        "p50_ms": percentile(seconds, 50) * 1000,
+        "p95_ms": percentile(seconds, 95) * 1000,
+        "p99_ms": percentile(seconds, 99) * 1000,
+        "mean_ms": statistics.fmean(seconds) * 1000,
+        "calls": len(seconds),
+        "queries": counts[0],
+    }
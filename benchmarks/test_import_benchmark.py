@@ -0,0 +1,64 @@
+"""Import benchmarks with synthetic Kleio files.
+
+Each corpus is imported into an empty database, in a new process,
+--tl-benchmark-rounds times; the round with the median rate is kept.
+"""
+
+import statistics
+
+import pytest
+
+from benchmarks.corpus import write_corpus
+from benchmarks.import_run import check_postgres, measure_import
+
+# arguments of synthetic_kleio_xml, besides the number of acts
+CORPORA = {
+    # persons with attributes and relations, same_as and dynamic classes
+    "mixed": {},
+    # larger acts, more groups inside each act
+    "wide": {"persons_per_act": 8, "attributes_per_person": 4, "same_as_every": 2},
+}
+
+# measures where lower is better, the rate is checked apart
+LOWER_IS_BETTER = ("commits", "statements", "peak_rss_mb")
+
+
+@pytest.fixture(scope="module")
+def corpus_files(request, tmp_path_factory) -> dict:
+    """A synthetic xml file for each corpus"""
+    acts = request.config.getoption("--tl-benchmark-acts")
+    directory = tmp_path_factory.mktemp("corpus")
+    return {
+        name: write_corpus(directory / name, n_acts=acts, **kwargs)[0]
+        for name, kwargs in CORPORA.items()
+    }
+
+
+@pytest.mark.parametrize("corpus", list(CORPORA))
+def test_import(corpus, db_type, corpus_files, benchmark_results, baseline, request):
+    """Rate, commits, statements and peak memory of an import"""
+    check_postgres(db_type)
+    rounds = request.config.getoption("--tl-benchmark-rounds")
+    runs = [measure_import(corpus_files[corpus], db_type) for _ in range(max(1, rounds))]
+    rates = [run["entities_per_second"] for run in runs]
+    result = dict(runs[rates.index(statistics.median_low(rates))])
+    result["peak_rss_mb"] = max(run["peak_rss_mb"] for run in runs)
+    result["rounds"] = len(runs)
+    assert result["nerrors"] == 0
+    key = f"{corpus}-{db_type}"
+    benchmark_results[key] = result
+
+    previous = baseline.get(key)
+    if previous is None:
+        return
+    tolerance = request.config.getoption("--tl-benchmark-tolerance")
+    regressions = []
+    if result["entities_per_second"] < previous["entities_per_second"] * (1 - tolerance):
+        regressions.append(
+            f"entities_per_second {result['entities_per_second']:.1f} "
+            f"< {previous['entities_per_second']:.1f}"
+        )
+    for measure in LOWER_IS_BETTER:
+        if result[measure] > previous[measure] * (1 + tolerance):
+            regressions.append(f"{measure} {result[measure]} > {previous[measure]}")
+    assert not regressions, f"{key} regressed: " + "; ".join(regressions)
@@ -0,0 +1,152 @@
+"""Benchmarks of the query and pandas helpers.
+
+Each helper is called --tl-benchmark-repeat times, with a new session each
+time, on a database of --tl-benchmark-entities generated entities. The
+latency percentiles and the sql statements of each call are reported.
+
+Query counts are deterministic, so they are checked strictly: a helper
+must stay within its query budget, helpers that take a list of ids must
+not add queries per id, and with --tl-benchmark-compare no helper may
+execute more statements than in the baseline. This is what catches a
+helper that starts loading related objects one by one (N+1).
+"""
+
+from collections import namedtuple
+
+import pytest
+
+from benchmarks.corpus import PLACES
+from benchmarks.import_run import check_postgres
+from benchmarks.query_run import build_database, measure_calls
+from timelink.networks.network_generation import network_from_attribute
+from timelink.pandas import (
+    attribute_values,
+    entities_with_attribute,
+    group_attributes,
+    pname_to_df,
+)
+
+# function(db, session, ids, tmp_path) is called with `items` ids of acts,
+# or one if items is None; budget is the maximum number of queries of a call, None if
+# the number of queries grows with the data
+Helper = namedtuple("Helper", "function items budget")
+
+HELPERS = {
+    "entities_with_attribute": Helper(
+        lambda db, session, ids, tmp: entities_with_attribute(
+            "residencia", the_value=PLACES[1], entity_type="person",
+            show_elements=["name", "sex"], db=db, session=session,
+        ),
+        None, 1,
+    ),
+    "group_attributes": Helper(
+        lambda db, session, ids, tmp: group_attributes(
+            [f"{act}-per1" for act in ids], db=db, session=session
+        ),
+        20, 2,
+    ),
+    "attribute_values": Helper(
+        lambda db, session, ids, tmp: attribute_values("residencia", db=db, session=session),
+        None, 1,
+    ),
+    "pname_to_df": Helper(
+        lambda db, session, ids, tmp: pname_to_df("maria%", db=db, session=session),
+        None, 1,
+    ),
+    "pname_to_df_similar": Helper(
+        lambda db, session, ids, tmp: pname_to_df(
+            "maria vargas", db=db, session=session, similar=True
+        ),
+        None, 1,
+    ),
+    "network_cliques": Helper(
+        lambda db, session, ids, tmp: network_from_attribute(
+            "residencia", max_clique_size=50, random_seed=1, db=db, session=session
+        ),
+        None, 3,
+    ),
+    # one query per entity to get the node information
+    "network_value_node": Helper(
+        lambda db, session, ids, tmp: network_from_attribute(
+            "residencia", mode="value-node", ignore_values=PLACES[1:], db=db, session=session
+        ),
+        None, None,
+    ),
+    "get_entity": Helper(
+        lambda db, session, ids, tmp: db.get_entity(f"{ids[0]}-per1", session),
+        None, 2,
+    ),
+    # lazy loads of the contained entities, relations and attributes
+    "to_kleio": Helper(
+        lambda db, session, ids, tmp: db.get_entity(ids[0], session).to_kleio(),
+        None, None,
+    ),
+    "export_as_kleio": Helper(
+        lambda db, session, ids, tmp: db.export_as_kleio(ids, tmp / "export.cli"),
+        10, None,
+    ),
+}
+
+
+@pytest.fixture(scope="session")
+def query_databases(tmp_path_factory):
+    """Databases built in the session, by db type and number of entities"""
+    databases = {}
+    yield databases
+    for db, _ in databases.values():
+        db.drop_db()
+
+
+@pytest.fixture
+def query_db(db_type, n_entities, query_databases, tmp_path_factory):
+    """A database of n_entities generated entities, and the entities stored"""
+    check_postgres(db_type)
+    key = (db_type, n_entities)
+    if key not in query_databases:
+        query_databases[key] = build_database(
+            f"timelink_benchmark_{n_entities}",
+            db_type,
+            n_entities,
+            db_path=tmp_path_factory.mktemp(f"query-{db_type}-{n_entities}"),
+        )
+    return query_databases[key]
+
+
+def act_ids(n: int) -> list:
+    """Ids of the first n acts of the first synthetic source"""
+    return [f"synthetic1.{i}" for i in range(1, n + 1)]
+
+
+@pytest.mark.parametrize("helper", list(HELPERS))
+def test_query(helper, db_type, n_entities, query_db, benchmark_results, baseline, request, tmp_path):
+    """Latency percentiles and queries of a helper"""
+    db, stored = query_db
+    function, items, budget = HELPERS[helper]
+    repeat = request.config.getoption("--tl-benchmark-repeat")
+    ids = act_ids(items or 1)
+    result = measure_calls(db, lambda session: function(db, session, ids, tmp_path), repeat)
+    result["entities"] = stored
+    if items is not None:
+        # queries added by each id, 0 unless the helper fetches them one by one
+        double = measure_calls(
+            db, lambda session: function(db, session, act_ids(2 * items), tmp_path), 1
+        )
+        result["queries_per_item"] = (double["queries"] - result["queries"]) / items
+    key = f"query-{helper}-{db_type}-{n_entities}"
+    benchmark_results[key] = result
+
+    problems = []
+    if budget is not None:
+        if result["queries"] > budget:
+            problems.append(f"{result['queries']} queries, budget is {budget}")
+        if result.get("queries_per_item", 0) > 0:
+            problems.append(f"{result['queries_per_item']} queries per id")
+    previous = baseline.get(key)
+    if previous is not None:
+        tolerance = request.config.getoption("--tl-benchmark-tolerance")
+        for measure in ("queries", "queries_per_item"):
+            if result.get(measure, 0) > previous.get(measure, 0):
+                problems.append(f"{measure} {result[measure]} > {previous[measure]}")
+        if result["p95_ms"] > previous["p95_ms"] * (1 + tolerance):
+            problems.append(f"p95_ms {result['p95_ms']:.1f} > {previous['p95_ms']:.1f}")
+    assert not problems, f"{key} regressed: " + "; ".join(problems)
@@ -0,0 +1,204 @@
+"""Test generation of clique and relation networks.
+
+Data is imported directly from xml files, no Kleio Server needed.
+"""
+
+# pylint: disable=import-error
+from pathlib import Path
+
+import networkx as nx
+import pytest
+
+from tests import TEST_DIR, skip_on_github_actions
+from timelink.api.database import TimelinkDatabase
+from timelink.kleio.importer import import_from_xml
+from timelink.networks import (
+    attribute_cooccurrence_edges,
+    network_from_attribute,
+    network_from_relations,
+)
+from timelink.networks.network_draw import (
+    clear_layout_cache,
+    compute_layout,
+    draw_network,
+    graph_fingerprint,
+)
+from timelink.pandas import entities_with_attribute
+
+pytestmark = skip_on_github_actions
+
+db_path = Path(TEST_DIR, "sqlite")
+TEST_DB = "networks_cliques"
+test_set = [("sqlite", TEST_DB), ("postgres", TEST_DB)]
+xml_file = Path(TEST_DIR, "xml_data", "dehergne-a.xml")
+
+
+@pytest.fixture(scope="module")
+def dbsystem(request):
+    """Create a database with the dehergne-a sample"""
+    db_type, db_name = request.param
+    database = TimelinkDatabase(db_name, db_type, db_path=db_path, drop_if_exists=True)
+    with database.session() as session:
+        import_from_xml(xml_file, session=session, options={"mode": "TL"})
+    try:
+        yield database
+    finally:
+        database.drop_db()
+
+
+@pytest.mark.parametrize("dbsystem", test_set, indirect=True)
+def test_cliques_weighted_projection(dbsystem):
+    """Entities sharing a value are linked, weight counts shared values"""
+    G = network_from_attribute("nacionalidade", mode="cliques", db=dbsystem)
+    assert isinstance(G, nx.Graph)
+    assert len(G.edges) > 0
+    for _id1, _id2, data in G.edges(data=True):
+        assert data["attribute"] == "nacionalidade"
+        assert data["weight"] >= 1
+        assert "date1" in data and "obs2" in data
+
+    # a value shared by exactly two entities still produces an edge
+    G = network_from_attribute("estadia", mode="cliques", db=dbsystem)
+    rows = entities_with_attribute("estadia", db=dbsystem)
+    members = rows.reset_index().groupby("estadia")["id"].unique()
+    pairs = [ids for ids in members if len(ids) == 2]
+    assert len(pairs) > 0
+    for id1, id2 in pairs:
+        assert G.has_edge(id1, id2)
+
+
+@pytest.mark.parametrize("dbsystem", test_set, indirect=True)
+def test_cliques_max_size(dbsystem):
+    """Oversized values are sampled or skipped"""
+    full = network_from_attribute("nacionalidade", db=dbsystem)
+    sampled = network_from_attribute(
+        "nacionalidade", db=dbsystem, max_clique_size=5, random_seed=1
+    )
+    skipped = network_from_attribute(
+        "nacionalidade", db=dbsystem, max_clique_size=5, oversize="skip"
+    )
+    assert len(skipped.edges) < len(sampled.edges) < len(full.edges)
+    # no value contributes more than a 5-clique
+    for value in {data["value"] for _u, _v, data in sampled.edges(data=True)}:
+        n = sum(1 for _u, _v, d in sampled.edges(data=True) if d["value"] == value)
+        assert n <= 5 * 4 / 2
+
+    with pytest.raises(ValueError):
+        network_from_attribute("nacionalidade", db=dbsystem, oversize="bad")
+
+
+@pytest.mark.parametrize("dbsystem", test_set, indirect=True)
+def test_cliques_sparse_backend(dbsystem):
+    """The sparse backend produces the same edges and weights"""
+    pytest.importorskip("scipy")
+    G = network_from_attribute("estadia", db=dbsystem)
+    S = network_from_attribute("estadia", db=dbsystem, backend="sparse")
+    edges = attribute_cooccurrence_edges("estadia", db=dbsystem)
+
+    assert len(edges) == len(G.edges) == len(S.edges)
+    for id1, id2, weight in edges.itertuples(index=False):
+        assert G.edges[id1, id2]["weight"] == weight
+        assert S.edges[id1, id2]["weight"] == weight
+
+
+@pytest.mark.parametrize("dbsystem", test_set, indirect=True)
+def test_network_from_relations(dbsystem):
+    """Networks of relations, filtered, directed and as edge lists"""
+    G = network_from_relations(db=dbsystem)
+    assert isinstance(G, nx.Graph)
+    assert len(G.edges) > 0
+
+    kinship = network_from_relations("parentesco", directed=True, db=dbsystem)
+    assert isinstance(kinship, nx.DiGraph)
+    assert all(d["type"] == "parentesco" for _u, _v, d in kinship.edges(data=True))
+
+    edges = network_from_relations(
+        ["parentesco"], as_dataframe=True, chunk_size=7, db=dbsystem
+    )
+    assert len(edges) == sum(d["weight"] for _u, _v, d in kinship.edges(data=True))
+    assert set(edges["type"]) == {"parentesco"}
+
+    before = network_from_relations(
+        dates_between=("1500-01-01", "1600-01-01"), as_dataframe=True, db=dbsystem
+    )
+    assert before["date"].between("15000101", "16000101").all()
+
+    # a session is enough, the view is reflected from its database
+    with dbsystem.session() as session:
+        from_session = network_from_relations(
+            ["parentesco"], as_dataframe=True, session=session
+        )
+    assert sorted(from_session["relation_id"]) == sorted(edges["relation_id"])
+
+
+@pytest.mark.parametrize("dbsystem", test_set, indirect=True)
+def test_network_from_relations_real_entities(dbsystem):
+    """Occurrences linked by a user collapse into real entities"""
+    occurrences = network_from_relations(db=dbsystem)
+    real = network_from_relations(user="user", db=dbsystem)
+    real_nodes = [n for n, d in real.nodes(data=True) if d["is_real"]]
+    assert len(real_nodes) > 0
+    assert len(real.nodes) < len(occurrences.nodes)
+    # relations between occurrences of the same real entity are dropped
+    # from the edge list as they are from the graph
+    edges = network_from_relations(user="user", as_dataframe=True, db=dbsystem)
+    assert not (edges["origin"] == edges["destination"]).any()
+    assert len(edges) == sum(d["weight"] for _u, _v, d in real.edges(data=True))
+
+
+def test_layout_cache():
+    """Layouts are cached by graph fingerprint"""
+    clear_layout_cache()
+    G = nx.karate_club_graph()
+    calls = []
+
+    def counted_layout(g, iterations):
+        calls.append(g)
+        return nx.spring_layout(g, iterations=iterations, seed=1)
+
+    pos1 = compute_layout(G, layout=counted_layout)
+    pos2 = compute_layout(G.copy(), layout=counted_layout)
+    assert len(calls) == 1  # second call comes from the cache
+    assert pos1 is not pos2 and all((pos1[n] == pos2[n]).all() for n in G.nodes)
+    # positions returned are copies, changing them does not change the cache
+    pos2[0][0] = 100
+    assert compute_layout(G, layout=counted_layout)[0][0] != 100
+    assert graph_fingerprint(G) == graph_fingerprint(G.copy())
+
+    H = G.copy()
+    H.add_edge(0, 33, weight=10)
+    assert graph_fingerprint(H) != graph_fingerprint(G)
+    compute_layout(H, layout=counted_layout)
+    assert len(calls) == 2
+
+    # functions with the same name are different layouts
+    layouts = [
+        lambda g, iterations: nx.circular_layout(g),
+        lambda g, iterations: nx.shell_layout(g, [list(g)[:10], list(g)[10:]]),
+    ]
+    first, second = (compute_layout(G, layout=layout) for layout in layouts)
+    assert not all((first[n] == second[n]).all() for n in G.nodes)
+
+    for layout in ["circular", "kamada_kawai", lambda g, iterations: nx.random_layout(g)]:
+        pos = compute_layout(G, layout=layout)
+        assert set(pos.keys()) == set(G.nodes)
+        assert all(abs(c) <= 1.0 + 1e-9 for xy in pos.values() for c in xy)
+
+    with pytest.raises(ValueError):
+        compute_layout(G, layout="unknown")
+
+
+def test_draw_network_missing_positions():
+    """A layout dictionary must have the position of every node"""
+    G = nx.path_graph(["a", "b", "c"])
+    with pytest.raises(ValueError, match="nodes: b, c"):
+        draw_network(G, layout={"a": (0, 0)})
+
+
+def test_lazy_names_listed_once():
+    """Functions bound on first use are listed once by dir()"""
+    import timelink.networks
+
+    names = dir(timelink.networks)
+    assert "network_from_relations" in names
+    assert len(names) == len(set(names))
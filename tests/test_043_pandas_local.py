@@ -0,0 +1,194 @@
+"""Test pandas helpers against databases with a local xml file imported.
+
+Data is imported directly from xml files, no Kleio Server needed.
+"""
+
+# pylint: disable=import-error
+from pathlib import Path
+
+import pytest
+from sqlalchemy import func, select
+
+from tests import TEST_DIR, skip_on_github_actions
+from timelink.api.database import TimelinkDatabase
+from timelink.api.models import Person, PersonName
+from timelink.api.models.person_name import (
+    name_trigrams,
+    normalize_name,
+    rebuild_person_names,
+    similar_names_select,
+)
+from timelink.kleio.importer import import_from_xml
+from timelink.pandas import attribute_values, pname_to_df
+
+pytestmark = skip_on_github_actions
+
+db_path = Path(TEST_DIR, "sqlite")
+TEST_DB = "pandas_local"
+test_set = [("sqlite", TEST_DB), ("postgres", TEST_DB)]
+xml_file = Path(TEST_DIR, "xml_data", "dehergne-a.xml")
+
+
+@pytest.fixture(scope="module")
+def dbsystem(request):
+    """Create a database with the dehergne-a sample"""
+    db_type, db_name = request.param
+    database = TimelinkDatabase(db_name, db_type, db_path=db_path, drop_if_exists=True)
+    with database.session() as session:
+        import_from_xml(xml_file, session=session, options={"mode": "TL"})
+    try:
+        yield database
+    finally:
+        database.drop_db()
+
+
+@pytest.mark.parametrize("dbsystem", test_set, indirect=True)
+def test_attribute_values_groupname(dbsystem):
+    """Groupname filter restricts counts to entities of that group"""
+    all_groups = attribute_values("nacionalidade", db=dbsystem)
+    assert len(all_groups) > 0
+    assert list(all_groups.columns) == ["count", "date_min", "date_max"]
+
+    persons = attribute_values("nacionalidade", groupname="n", db=dbsystem)
+    assert 0 < persons["count"].sum() < all_groups["count"].sum()
+    groups = attribute_values("nacionalidade", groupname=["n", "referido"], db=dbsystem)
+    assert groups["count"].sum() >= persons["count"].sum()
+
+    none = attribute_values("nacionalidade", groupname=["no-such-group"], db=dbsystem)
+    assert len(none) == 0
+
+
+@pytest.mark.parametrize("dbsystem", test_set, indirect=True)
+def test_attribute_values_dates_between(dbsystem):
+    """Dates in yyyy-mm-dd format are compared with stored yyyymmdd dates"""
+    df = attribute_values(
+        "jesuita-entrada", dates_between=("1600-01-01", "1650-12-31"), db=dbsystem
+    )
+    assert len(df) > 0
+    assert df["date_min"].min() > "16000101"
+    assert df["date_max"].max() < "16501231"
+
+
+@pytest.mark.parametrize("histogram", ["year", "decade"])
+@pytest.mark.parametrize("dbsystem", test_set, indirect=True)
+def test_attribute_values_histogram(dbsystem, histogram):
+    """Counts per value and period, computed in the database"""
+    df = attribute_values("jesuita-entrada", histogram=histogram, db=dbsystem)
+    assert list(df.index.names) == ["value", histogram]
+    assert list(df.columns) == ["count"]
+    periods = df.index.get_level_values(histogram)
+    assert periods.min() > 1000
+    if histogram == "decade":
+        assert all(period % 10 == 0 for period in periods)
+
+    totals = attribute_values("jesuita-entrada", db=dbsystem)
+    by_value = df["count"].groupby(level="value").sum()
+    for value, count in by_value.items():
+        assert count >= totals.loc[value, "count"]
+
+
+@pytest.mark.parametrize("dbsystem", test_set, indirect=True)
+def test_attribute_values_bad_histogram(dbsystem):
+    with pytest.raises(ValueError):
+        attribute_values("jesuita-entrada", histogram="century", db=dbsystem)
+
+
+def test_normalize_name():
+    assert normalize_name("João  de Sá-Pereira") == "joao sa pereira"
+    assert normalize_name("ANTÓNIO DOS SANTOS") == "antonio santos"
+    assert normalize_name(None) == ""
+    assert name_trigrams("joao sa") == {"joa", "oao"}
+
+
+@pytest.mark.parametrize("dbsystem", test_set, indirect=True)
+def test_pname_to_df_similar(dbsystem):
+    """Similar search ignores case, accents and particles"""
+    df = pname_to_df("Antonio de Andrade", db=dbsystem, similar=True)
+    assert df is not None
+    assert "deh-antonio-de-andrade" in list(df["id"])
+
+    df_accents = pname_to_df("ANTÓNIO ANDRADE", db=dbsystem, similar=True)
+    assert set(df_accents["id"]) == set(df["id"])
+
+    # components must appear in order, the first at the start
+    assert pname_to_df("andrade antonio", db=dbsystem, similar=True) is None
+
+    # the index has the names without the default particles, others are ignored
+    with pytest.warns(DeprecationWarning):
+        df_particles = pname_to_df(
+            "Antonio de Andrade", db=dbsystem, similar=True, name_particles=["antonio"]
+        )
+    assert set(df_particles["id"]) == set(df["id"])
+
+
+@pytest.mark.parametrize("dbsystem", test_set, indirect=True)
+def test_person_names_maintained(dbsystem):
+    """Normalized names follow inserts, updates and deletes of persons"""
+    with dbsystem.session() as session:
+        count_persons = session.scalar(select(func.count()).select_from(Person))
+        count_names = session.scalar(select(func.count()).select_from(PersonName))
+        assert count_names == count_persons
+
+        person = session.get(Person, "deh-antonio-de-andrade")
+        person.name = "Antão de Andrade"
+        session.commit()
+        assert session.get(PersonName, person.id).norm_name == "antao andrade"
+        df = pname_to_df("antao andr", session=session, similar=True)
+        assert list(df["id"]) == ["deh-antonio-de-andrade"]
+
+        similar_stmt = similar_names_select("antao", session.get_bind().dialect.name)
+        assert list(session.scalars(similar_stmt)) == ["deh-antonio-de-andrade"]
+
+
+@pytest.mark.parametrize("dbsystem", test_set, indirect=True)
+def test_rebuild_person_names(dbsystem):
+    with dbsystem.engine.begin() as connection:
+        before = connection.execute(select(PersonName.__table__)).all()
+        rebuild_person_names(connection)
+        after = connection.execute(select(PersonName.__table__)).all()
+    assert sorted(before) == sorted(after)
+
+
+@pytest.mark.parametrize("dbsystem", test_set, indirect=True)
+def test_materialized_views(dbsystem):
+    """Pandas helpers give the same results on materialized views"""
+    from_view = attribute_values("nacionalidade", db=dbsystem)
+    dbsystem.materialize_views()
+    try:
+        eattributes = dbsystem.get_view("eattributes")
+        assert eattributes.name == "mv_eattributes"
+        from_table = attribute_values("nacionalidade", db=dbsystem)
+        assert from_table.equals(from_view)
+
+        with dbsystem.session() as session:
+            for view_name, table in dbsystem.materialized_views.items():
+                view = dbsystem.views[view_name]
+                in_view = session.scalar(select(func.count()).select_from(view))
+                in_table = session.scalar(select(func.count()).select_from(table))
+                assert in_view == in_table, view_name
+
+        # get_view() does not write, an import outside the database
+        # object is refreshed explicitly
+        with dbsystem.engine.begin() as connection:
+            connection.execute(dbsystem.materialized_views["nattributes"].delete())
+        with dbsystem.session() as session:
+            import_from_xml(xml_file, session=session, options={"mode": "TL"})
+        with dbsystem.session() as session:
+            nattributes = dbsystem.get_view("nattributes")
+            assert session.scalar(select(func.count()).select_from(nattributes)) == 0
+        dbsystem.refresh_materialized_views()
+        with dbsystem.session() as session:
+            nattributes = dbsystem.get_view("nattributes")
+            in_table = session.scalar(select(func.count()).select_from(nattributes))
+            in_view = session.scalar(
+                select(func.count()).select_from(dbsystem.views["nattributes"])
+            )
+        assert in_table == in_view > 0
+
+        # materialization is kept when the database is opened again
+        db = TimelinkDatabase(db_url=dbsystem.db_url, db_type=dbsystem.db_type)
+        assert set(db.materialized_views) == set(dbsystem.materialized_views)
+    finally:
+        dbsystem.drop_materialized_views()
+    assert dbsystem.get_view("eattributes").name == "eattributes"
+    assert "mv_eattributes" not in dbsystem.db_table_names()
@@ -0,0 +1,87 @@
+"""Test the fast path when opening existing databases.
+
+Imports a local xml file, no Kleio Server needed.
+"""
+
+# pylint: disable=import-error
+from pathlib import Path
+
+import pytest
+
+from tests import TEST_DIR, skip_on_github_actions
+from timelink import migrations
+from timelink.api.database import TimelinkDatabase
+from timelink.api.database_metadata import SCHEMA_FINGERPRINT
+from timelink.api.models import SysPar
+from timelink.kleio.importer import import_from_xml
+
+pytestmark = skip_on_github_actions
+
+db_path = Path(TEST_DIR, "sqlite")
+TEST_DB = "database_open"
+test_set = [("sqlite", TEST_DB), ("postgres", TEST_DB)]
+xml_file = Path(TEST_DIR, "xml_data", "dehergne-a.xml")
+
+
+@pytest.fixture(scope="module")
+def dbsystem(request):
+    """Create a database with the dehergne-a sample"""
+    db_type, db_name = request.param
+    database = TimelinkDatabase(db_name, db_type, db_path=db_path, drop_if_exists=True)
+    with database.session() as session:
+        import_from_xml(xml_file, session=session, options={"mode": "TL"})
+    try:
+        yield database
+    finally:
+        database.drop_db()
+
+
+def reopen(database, **kwargs) -> TimelinkDatabase:
+    """Open the database again, as another program would"""
+    return TimelinkDatabase(db_url=database.db_url, db_type=database.db_type, **kwargs)
+
+
+def fail(*args, **kwargs):
+    raise AssertionError("should have been skipped")
+
+
+@pytest.mark.parametrize("dbsystem", test_set, indirect=True)
+def test_schema_fingerprint_stored(dbsystem):
+    """Opening the database stores the fingerprint of the schema"""
+    reopen(dbsystem)
+    stored = dbsystem.get_schema_fingerprint()
+    assert stored is not None
+    assert stored == dbsystem.schema_fingerprint()
+
+
+@pytest.mark.parametrize("dbsystem", test_set, indirect=True)
+def test_fast_open(dbsystem, monkeypatch):
+    """Unchanged schema skips migrations, view rebuild and reflection"""
+    dbsystem.store_schema_fingerprint()
+    monkeypatch.setattr(migrations, "upgrade", fail)
+    monkeypatch.setattr(TimelinkDatabase, "check_db", fail)
+    monkeypatch.setattr(TimelinkDatabase, "_update_views", fail)
+    db = reopen(dbsystem)
+    assert "persons" in db.get_table("persons").name
+    assert db.get_person("deh-antonio-de-andrade") is not None
+    assert db.get_view("nrelations") is not None
+
+
+@pytest.mark.parametrize("dbsystem", test_set, indirect=True)
+def test_changed_schema_full_open(dbsystem, monkeypatch):
+    """A different fingerprint runs the full checks and stores a new one"""
+    with dbsystem.session() as session:
+        session.merge(SysPar(pname=SCHEMA_FINGERPRINT, pvalue="old", ptype="string", obs=""))
+        session.commit()
+    called = []
+    upgrade = migrations.upgrade
+    monkeypatch.setattr(
+        migrations, "upgrade", lambda *args, **kw: called.append(1) or upgrade(*args, **kw)
+    )
+    reopen(dbsystem)
+    assert called
+    assert dbsystem.get_schema_fingerprint() == dbsystem.schema_fingerprint()
+
+    called.clear()
+    reopen(dbsystem, fast_open=False)
+    assert called
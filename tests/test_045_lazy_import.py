@@ -0,0 +1,94 @@
+"""Test that importing timelink does not load heavy dependencies.
+
+Each check runs in a fresh interpreter so that modules imported
+by other tests do not interfere.
+"""
+
+# pylint: disable=import-error
+import json
+import subprocess
+import sys
+
+import pytest
+
+HEAVY_MODULES = ["pandas", "docker", "bokeh", "networkx", "alembic", "sqlalchemy"]
+
+# generous limit, "import timelink" takes a few ms,
+# loading the database layer took about 2 seconds.
+MAX_IMPORT_SECONDS = 1.0
+
+
+def loaded_after(statement: str) -> dict:
+    """Run statement in a new interpreter, return heavy modules loaded and time"""
+    code = f"""
+import json, sys, time
+start = time.perf_counter()
+{statement}
+elapsed = time.perf_counter() - start
+loaded = [m for m in {HEAVY_MODULES!r} if m in sys.modules]
+print(json.dumps({{"loaded": loaded, "elapsed": elapsed}}))
+"""
+    result = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def test_import_timelink_is_light():
+    result = loaded_after("import timelink")
+    assert result["loaded"] == []
+    assert result["elapsed"] < MAX_IMPORT_SECONDS
+
+
+@pytest.mark.parametrize(
+    "statement",
+    [
+        "import timelink.kleio",
+        "import timelink.networks",
+    ],
+)
+def test_import_subpackages_is_light(statement):
+    result = loaded_after(statement)
+    assert "pandas" not in result["loaded"]
+    assert "docker" not in result["loaded"]
+    assert "networkx" not in result["loaded"]
+    assert "bokeh" not in result["loaded"]
+
+
+def test_import_pandas_loads_no_networks():
+    """timelink.pandas needs pandas and the database, not networkx or bokeh"""
+    result = loaded_after("import timelink.pandas")
+    assert "networkx" not in result["loaded"]
+    assert "bokeh" not in result["loaded"]
+
+
+def test_functions_named_as_modules():
+    """Importing a submodule does not hide the function with its name"""
+    code = """
+from timelink.pandas import group_attributes
+from timelink.pandas import entities_with_attribute, attribute_values
+import timelink.pandas.attribute_values
+import timelink.pandas
+print(callable(entities_with_attribute), callable(attribute_values),
+      callable(timelink.pandas.entities_with_attribute),
+      callable(timelink.pandas.attribute_values))
+"""
+    result = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True
+    )
+    assert result.stdout.split() == ["True"] * 4
+
+
+def test_lazy_attributes():
+    import timelink
+    import timelink.kleio
+    import timelink.networks
+    import timelink.pandas
+
+    assert timelink.models.Person.__tablename__ == "persons"
+    assert hasattr(timelink.database, "TimelinkDatabase")
+    assert timelink.kleio.KleioServer.__name__ == "KleioServer"
+    assert callable(timelink.pandas.pname_to_df)
+    assert callable(timelink.networks.network_from_attribute)
+    with pytest.raises(AttributeError):
+        timelink.no_such_attribute  # noqa: B018
@@ -0,0 +1,90 @@
+"""Test the catalog of (group, class) pairs.
+
+Imports a local xml file, no Kleio Server needed.
+"""
+
+# pylint: disable=import-error
+from pathlib import Path
+
+import pytest
+from sqlalchemy import func, select
+
+from tests import TEST_DIR, skip_on_github_actions
+from timelink.api.database import TimelinkDatabase
+from timelink.api.models import Entity, GroupClass
+from timelink.api.models.group_class import (
+    _known_pairs,
+    rebuild_group_classes,
+    register_group_class,
+)
+from timelink.kleio.importer import import_from_xml
+
+pytestmark = skip_on_github_actions
+
+db_path = Path(TEST_DIR, "sqlite")
+TEST_DB = "group_classes"
+test_set = [("sqlite", TEST_DB), ("postgres", TEST_DB)]
+xml_file = Path(TEST_DIR, "xml_data", "dehergne-a.xml")
+
+
+@pytest.fixture(scope="module")
+def dbsystem(request):
+    """Create a database with the dehergne-a sample"""
+    db_type, db_name = request.param
+    database = TimelinkDatabase(db_name, db_type, db_path=db_path, drop_if_exists=True)
+    with database.session() as session:
+        import_from_xml(xml_file, session=session, options={"mode": "TL"})
+    try:
+        yield database
+    finally:
+        database.drop_db()
+
+
+@pytest.mark.parametrize("dbsystem", test_set, indirect=True)
+def test_group_classes_catalog(dbsystem):
+    """The importer keeps the (group, class) catalog in sync with entities"""
+    with dbsystem.session() as session:
+        catalog = set(session.execute(select(GroupClass.groupname, GroupClass.pom_class)))
+        in_entities = set(
+            session.execute(
+                select(func.coalesce(Entity.groupname, "class"), Entity.pom_class).distinct()
+            )
+        )
+    assert ("n", "person") in catalog
+    # entities without a group are cataloged under "class"
+    assert ("class", "class") in catalog
+    assert catalog == in_entities
+
+    with dbsystem.engine.begin() as connection:
+        rebuild_group_classes(connection)
+    with dbsystem.session() as session:
+        rebuilt = set(session.execute(select(GroupClass.groupname, GroupClass.pom_class)))
+    assert rebuilt == catalog
+
+
+@pytest.mark.parametrize("dbsystem", test_set, indirect=True)
+def test_group_models_from_catalog(dbsystem):
+    """Opening the database maps groups to ORM classes from the catalog"""
+    Entity.clear_group_models_cache()
+    TimelinkDatabase(db_url=dbsystem.db_url, db_type=dbsystem.db_type)
+    assert Entity.get_orm_for_group("n").__name__ == "Person"
+    assert Entity.get_orm_for_group("lista") is not None
+    assert Entity.get_orm_for_group("class") is not None
+
+
+@pytest.mark.parametrize("dbsystem", test_set, indirect=True)
+def test_group_class_cache_rollback(dbsystem, tmp_path):
+    """The cache is cleared on rollback of its own engine only"""
+    other = TimelinkDatabase("group_class_other", "sqlite", db_path=tmp_path)
+    try:
+        with dbsystem.engine.connect() as connection:
+            register_group_class(connection, "rollback-test", "person")
+            with other.engine.connect() as other_connection:
+                other_connection.rollback()
+            assert ("rollback-test", "person") in _known_pairs[dbsystem.engine]
+            connection.rollback()
+        assert dbsystem.engine not in _known_pairs
+        with dbsystem.session() as session:
+            assert session.get(GroupClass, ("rollback-test", "person")) is None
+    finally:
+        other.drop_db()
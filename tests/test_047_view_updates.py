@@ -0,0 +1,83 @@
+"""Test that views are replaced only when their definition changes.
+
+Imports a local xml file, no Kleio Server needed.
+"""
+
+# pylint: disable=import-error
+from pathlib import Path
+
+import pytest
+from sqlalchemy import event, select, text
+
+from tests import TEST_DIR, skip_on_github_actions
+from timelink.api.database import TimelinkDatabase
+from timelink.api.database_views import VIEW_HASH_PREFIX
+from timelink.api.models import SysPar
+from timelink.kleio.importer import import_from_xml
+
+pytestmark = skip_on_github_actions
+
+db_path = Path(TEST_DIR, "sqlite")
+TEST_DB = "view_updates"
+test_set = [("sqlite", TEST_DB), ("postgres", TEST_DB)]
+xml_file = Path(TEST_DIR, "xml_data", "dehergne-a.xml")
+
+
+@pytest.fixture(scope="module")
+def dbsystem(request):
+    """Create a database with the dehergne-a sample"""
+    db_type, db_name = request.param
+    database = TimelinkDatabase(db_name, db_type, db_path=db_path, drop_if_exists=True)
+    with database.session() as session:
+        import_from_xml(xml_file, session=session, options={"mode": "TL"})
+    try:
+        yield database
+    finally:
+        database.drop_db()
+
+
+def view_ddl(database):
+    """Collect view DDL statements executed on database.engine"""
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, *args):
+        if " VIEW " in statement.upper():
+            statements.append(statement)
+
+    event.listen(database.engine, "before_cursor_execute", before_cursor_execute)
+    return statements
+
+
+@pytest.mark.parametrize("dbsystem", test_set, indirect=True)
+def test_views_unchanged_no_ddl(dbsystem, monkeypatch):
+    """Views with an unchanged hash are not dropped or recreated"""
+    dbsystem._update_views()
+    statements = view_ddl(dbsystem)
+    inspections = []
+    view_names = dbsystem.view_names
+    monkeypatch.setattr(dbsystem, "view_names", lambda: inspections.append(1) or view_names())
+    dbsystem._update_views()
+    assert statements == []
+    # the views in the database are listed once, not once per view
+    assert len(inspections) == 1
+    assert set(dbsystem.get_view_hashes()) == set(dbsystem.views)
+
+
+@pytest.mark.parametrize("dbsystem", test_set, indirect=True)
+def test_views_changed_replaced(dbsystem):
+    """Only views with a different hash or missing are replaced"""
+    with dbsystem.session() as session:
+        session.merge(
+            SysPar(pname=VIEW_HASH_PREFIX + "eattributes", pvalue="old", ptype="string", obs="")
+        )
+        session.execute(text("DROP VIEW nfunctions"))
+        session.commit()
+    statements = view_ddl(dbsystem)
+    dbsystem._update_views()
+    created = [s.split(" AS ")[0] for s in statements if "CREATE" in s.upper()]
+    assert len(created) == 2
+    assert any("eattributes" in s for s in created)
+    assert any("nfunctions" in s for s in created)
+    assert dbsystem.get_view_hashes()["eattributes"] == dbsystem.view_hash("eattributes")
+    with dbsystem.session() as session:
+        assert session.execute(select(dbsystem.get_view("nfunctions"))).first() is not None
@@ -0,0 +1,81 @@
+"""Test exact, parallel and estimated table row counts.
+
+Imports a local xml file, no Kleio Server needed.
+"""
+
+# pylint: disable=import-error
+from pathlib import Path
+
+import pytest
+from sqlalchemy import text
+
+from tests import TEST_DIR, skip_on_github_actions
+from timelink.api.database import TimelinkDatabase
+from timelink.kleio.importer import import_from_xml
+
+pytestmark = skip_on_github_actions
+
+db_path = Path(TEST_DIR, "sqlite")
+TEST_DB = "row_counts"
+test_set = [("sqlite", TEST_DB), ("postgres", TEST_DB)]
+xml_file = Path(TEST_DIR, "xml_data", "dehergne-a.xml")
+
+
+@pytest.fixture(scope="module")
+def dbsystem(request):
+    """Create a database with the dehergne-a sample"""
+    db_type, db_name = request.param
+    database = TimelinkDatabase(db_name, db_type, db_path=db_path, drop_if_exists=True)
+    with database.session() as session:
+        import_from_xml(xml_file, session=session, options={"mode": "TL"})
+    try:
+        yield database
+    finally:
+        database.drop_db()
+
+
+@pytest.mark.parametrize("dbsystem", test_set, indirect=True)
+def test_table_row_count_parallel(dbsystem):
+    """Parallel exact counts give the same result as sequential counts"""
+    sequential = dbsystem.table_row_count()
+    assert dict(sequential)["persons"] > 0
+    assert dbsystem.table_row_count(parallel=True, max_workers=3) == sequential
+
+
+@pytest.mark.parametrize("dbsystem", test_set, indirect=True)
+def test_table_row_count_estimate(dbsystem):
+    """Estimates come from the statistics, exact counts without them"""
+    exact = dict(dbsystem.table_row_count())
+    if dbsystem.db_type == "postgres":
+        with dbsystem.engine.begin() as connection:
+            connection.execute(text("ANALYZE"))
+        # small tables are sampled whole, the estimate is exact
+        assert dict(dbsystem.table_row_count(estimate=True)) == exact
+        return
+
+    # no statistics yet, counted exactly
+    assert dict(dbsystem.table_row_count(estimate=True)) == exact
+    with dbsystem.engine.begin() as connection:
+        connection.execute(text("ANALYZE"))
+        connection.execute(
+            text("UPDATE sqlite_stat1 SET stat = '12345 1' WHERE tbl = 'persons'")
+        )
+    estimated = dict(dbsystem.table_row_count(estimate=True))
+    assert estimated["persons"] == 12345
+    assert estimated["entities"] == exact["entities"]
+    assert set(estimated) == set(exact)
+
+    # a row per index, the largest count is the estimate, not the last row
+    with dbsystem.engine.begin() as connection:
+        rowids = connection.scalars(
+            text("SELECT rowid FROM sqlite_stat1 WHERE tbl = 'entities' ORDER BY rowid")
+        ).all()
+        assert len(rowids) > 1
+        connection.execute(
+            text("UPDATE sqlite_stat1 SET stat = '5 1' WHERE tbl = 'entities'")
+        )
+        connection.execute(
+            text("UPDATE sqlite_stat1 SET stat = '54321 1' WHERE rowid = :rowid"),
+            {"rowid": rowids[0]},
+        )
+    assert dict(dbsystem.table_row_count(estimate=True))["entities"] == 54321
@@ -0,0 +1,110 @@
+"""Test engine presets and the engines shared between database objects.
+
+Uses local sqlite databases, no Kleio Server needed.
+"""
+
+# pylint: disable=import-error
+from pathlib import Path
+
+import pytest
+from sqlalchemy import text
+
+from tests import TEST_DIR, skip_on_github_actions
+from timelink.api.database import TimelinkDatabase
+from timelink.api.database_engine import (
+    dispose_engine,
+    dispose_engines,
+    engine_settings,
+    shared_engines,
+)
+
+pytestmark = skip_on_github_actions
+
+db_path = Path(TEST_DIR, "sqlite")
+TEST_DB = "engines"
+test_set = [("sqlite", TEST_DB), ("postgres", TEST_DB)]
+
+
+@pytest.fixture(scope="module")
+def dbsystem(request):
+    """Create an empty database"""
+    db_type, db_name = request.param
+    database = TimelinkDatabase(db_name, db_type, db_path=db_path, drop_if_exists=True)
+    try:
+        yield database
+    finally:
+        database.drop_db()
+
+
+def test_engine_preset_sqlite_pragmas(tmp_path):
+    """Presets set the pool and the SQLite pragmas of each connection"""
+    db = TimelinkDatabase(
+        "engine_preset",
+        "sqlite",
+        db_path=tmp_path,
+        engine_preset="bulk",
+        sqlite_pragmas={"cache_size": -1000},
+    )
+    try:
+        assert db.engine.pool.size() == 2
+        with db.engine.connect() as connection:
+            assert connection.scalar(text("PRAGMA journal_mode")) == "wal"
+            assert connection.scalar(text("PRAGMA synchronous")) == 1  # NORMAL
+            assert connection.scalar(text("PRAGMA cache_size")) == -1000
+            assert connection.scalar(text("PRAGMA temp_store")) == 2  # MEMORY
+    finally:
+        db.engine.dispose()
+
+
+def test_engine_settings_in_memory():
+    """Queue pool options of the presets are ignored for in-memory databases"""
+    options, pragmas = engine_settings(
+        "sqlite:///:memory:", "interactive", engine_options={"echo_pool": True}
+    )
+    assert "pool_size" not in options
+    assert "max_overflow" not in options
+    assert options["pool_pre_ping"] is True
+    assert options["echo_pool"] is True
+    assert pragmas["journal_mode"] == "WAL"
+    options, pragmas = engine_settings(
+        "postgresql://u:p@localhost/db", "bulk", sqlite_pragmas={"cache_size": 1}
+    )
+    assert options["pool_size"] == 2
+    assert pragmas == {}
+
+
+def test_engine_preset_invalid():
+    with pytest.raises(ValueError):
+        TimelinkDatabase(db_url="sqlite:///:memory:", engine_preset="no-such-preset")
+    with pytest.raises(ValueError):
+        TimelinkDatabase(
+            db_url="sqlite:///:memory:", sqlite_pragmas={"cache_size": "1; DROP"}
+        )
+
+
+@pytest.mark.parametrize("dbsystem", test_set, indirect=True)
+def test_shared_engine(dbsystem):
+    """Database objects on the same url and options share the engine"""
+    other = TimelinkDatabase(db_url=dbsystem.db_url, db_type=dbsystem.db_type)
+    assert other.engine is dbsystem.engine
+    assert dbsystem.engine in shared_engines()
+    tuned = TimelinkDatabase(
+        db_url=dbsystem.db_url, db_type=dbsystem.db_type, engine_options={"pool_size": 3}
+    )
+    assert tuned.engine is not dbsystem.engine
+    dispose_engine(tuned.engine)
+    assert tuned.engine not in shared_engines()
+    assert dbsystem.engine in shared_engines()
+
+
+def test_dispose_engines(tmp_path):
+    """Disposed engines are removed, later objects get a new engine"""
+    db = TimelinkDatabase("dispose_engines", "sqlite", db_path=tmp_path)
+    engine = db.engine
+    dispose_engines()
+    assert shared_engines() == []
+    db = TimelinkDatabase("dispose_engines", "sqlite", db_path=tmp_path)
+    assert db.engine is not engine
+    assert db.table_row_count()
+    db.drop_db()
+    assert db.engine not in shared_engines()
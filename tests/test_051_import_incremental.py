@@ -0,0 +1,189 @@
+"""Test incremental imports of sources already in the database.
+
+Imports local xml files, no Kleio Server needed.
+"""
+
+# pylint: disable=import-error
+import io
+import re
+from pathlib import Path
+
+import pytest
+from sqlalchemy import event, func, select
+from sqlalchemy.orm import aliased
+
+from tests import TEST_DIR, skip_on_github_actions
+from timelink.api.database import TimelinkDatabase
+from timelink.api.models import Entity, EntityDigest, Person, Relation
+from timelink.api.models.rentity import BLink, Link, REntity
+from timelink.kleio.importer import import_from_xml
+
+pytestmark = skip_on_github_actions
+
+db_path = Path(TEST_DIR, "sqlite")
+TEST_DB = "import_incremental"
+test_set = [("sqlite", TEST_DB), ("postgres", TEST_DB)]
+xml = Path(TEST_DIR, "xml_data", "b1685.xml").read_bytes()
+RELATION = "b1685.33-per5-rela314"
+
+
+@pytest.fixture(scope="module")
+def dbsystem(request):
+    """Create a database with the b1685 sample"""
+    db_type, db_name = request.param
+    database = TimelinkDatabase(db_name, db_type, db_path=db_path, drop_if_exists=True)
+    import_xml(database, xml)
+    try:
+        yield database
+    finally:
+        database.drop_db()
+
+
+def import_xml(db, content: bytes, incremental=False) -> dict:
+    with db.session() as session:
+        return import_from_xml(
+            io.BytesIO(content),
+            session,
+            options={"return_stats": True, "incremental": incremental},
+        )
+
+
+def shift_lines(content: bytes) -> bytes:
+    """Simulate a line added at the start of the source"""
+    content = re.sub(rb'LINE="(\d+)"', lambda m: b'LINE="%d"' % (int(m[1]) + 1), content)
+    return re.sub(
+        rb'CLASS="line"><core>(\d+)<',
+        lambda m: b'CLASS="line"><core>%d<' % (int(m[1]) + 1),
+        content,
+    )
+
+
+@pytest.mark.parametrize("dbsystem", test_set, indirect=True)
+def test_digests_stored(dbsystem):
+    """A full import stores the digest of each imported group"""
+    with dbsystem.session() as session:
+        ndigests = session.scalar(select(func.count()).select_from(EntityDigest))
+        nsourced = session.scalar(
+            select(func.count()).select_from(Entity).where(Entity.the_source.is_not(None))
+        )
+    assert ndigests == nsourced > 0
+
+
+@pytest.mark.parametrize("dbsystem", test_set, indirect=True)
+def test_incremental_unchanged(dbsystem):
+    """Reimporting the same file writes nothing"""
+    updates = []
+
+    def count_updates(conn, cursor, statement, *args):
+        # the record of the import is replaced
+        if statement.startswith(("INSERT", "UPDATE", "DELETE")) and "kleiofiles" not in statement:
+            updates.append(statement)
+
+    event.listen(dbsystem.engine, "before_cursor_execute", count_updates)
+    try:
+        stats = import_xml(dbsystem, xml, incremental=True)
+    finally:
+        event.remove(dbsystem.engine, "before_cursor_execute", count_updates)
+    counts = stats["incremental"]
+    assert counts["unchanged"] > 0
+    assert counts["inserted"] == counts["updated"] == counts["deleted"] == 0
+    assert updates == []
+
+    # relations to persons later in the file are stored at the end,
+    # they are counted as unchanged with the other groups
+    destination = aliased(Entity)
+    with dbsystem.session() as session:
+        forward = session.scalar(
+            select(func.count())
+            .select_from(Relation)
+            .join(destination, destination.id == Relation.destination)
+            .where(destination.the_line > Relation.the_line)
+        )
+        ndigests = session.scalar(select(func.count()).select_from(EntityDigest))
+    assert forward > 0
+    assert counts["unchanged"] == ndigests
+
+
+@pytest.mark.parametrize("dbsystem", test_set, indirect=True)
+def test_incremental_changes(dbsystem):
+    """Only changed entities are written, links of other entities are kept"""
+    with dbsystem.session() as session:
+        rentity = REntity.same_as("b1685.33-per6", "b1685.33-per5", session=session)
+        real_id = rentity.id
+        session.commit()
+
+    changed = xml.replace(b"domingos goncalves vargas", b"domingos goncalves varga", 1)
+    changed = re.sub(rb'<GROUP ID="' + RELATION.encode() + rb'".*?</GROUP>', b"", changed, flags=re.S)
+    stats = import_xml(dbsystem, shift_lines(changed), incremental=True)
+    assert stats["nerrors"] == 0
+    assert stats["incremental"]["updated"] == 1
+    assert stats["incremental"]["deleted"] == 1
+    assert stats["incremental"]["inserted"] == 0
+
+    with dbsystem.session() as session:
+        person = session.get(Person, "b1685.33-per6")
+        assert person.name == "domingos goncalves varga"
+        assert person.the_line == 588
+        assert session.get(Entity, RELATION) is None
+        linked = session.scalars(select(Link.entity).where(Link.rid == real_id)).all()
+        assert sorted(linked) == ["b1685.33-per5", "b1685.33-per6"]
+
+    # back to the original: the relation is inserted again
+    stats = import_xml(dbsystem, xml, incremental=True)
+    assert stats["incremental"]["inserted"] == 1
+    with dbsystem.session() as session:
+        assert session.get(Entity, RELATION) is not None
+
+
+def remove_group(content: bytes, group_id: str) -> bytes:
+    """Remove a group and the groups inside it"""
+    groups = re.findall(rb"<GROUP .*?</GROUP>", content, flags=re.S)
+    inside = f'CLASS="inside"><core>{group_id}</core>'.encode()
+    for group in groups:
+        if group.startswith(f'<GROUP ID="{group_id}"'.encode()) or inside in group:
+            content = content.replace(group, b"")
+    return content
+
+
+@pytest.mark.parametrize("dbsystem", test_set, indirect=True)
+def test_incremental_deleted_entity_links_saved(dbsystem):
+    """Links of entities removed from the source are kept as blinks"""
+    with dbsystem.session() as session:
+        REntity.same_as("b1685.33-per6", "b1685.33-per5", session=session)
+        session.commit()
+    removed = remove_group(xml, "b1685.33-per6")
+    stats = import_xml(dbsystem, removed, incremental=True)
+    assert stats["incremental"]["deleted"] == xml.count(b"<GROUP ") - removed.count(b"<GROUP ")
+    with dbsystem.session() as session:
+        assert session.get(Person, "b1685.33-per6") is None
+        blink = session.scalars(select(BLink).where(BLink.entity == "b1685.33-per6")).first()
+        assert blink is not None
+        assert session.scalars(select(Link).where(Link.entity == "b1685.33-per5")).first()
+    import_xml(dbsystem, xml)
+
+
+@pytest.mark.parametrize("dbsystem", test_set, indirect=True)
+def test_incremental_class_change(dbsystem):
+    """An entity whose class changed is replaced, with the entities inside it"""
+    changed = xml.replace(
+        b'<GROUP ID="b1685.2-per6" NAME="pmad" CLASS="person"',
+        b'<GROUP ID="b1685.2-per6" NAME="pmad" CLASS="act"',
+    )
+    changed = xml_without(changed, RELATION)
+    stats = import_xml(dbsystem, changed, incremental=True)
+    assert stats["nerrors"] == 0, stats["errors"]
+    # the groups inside the replaced entity are inserted again
+    assert stats["incremental"]["updated"] == 1
+    assert stats["incremental"]["inserted"] == 2
+    # removed entities after the change are still deleted
+    assert stats["incremental"]["deleted"] == 1
+    with dbsystem.session() as session:
+        assert session.get(Entity, "b1685.2-per6").pom_class == "act"
+        assert session.get(Entity, "b1685.2-per6-att4-38") is not None
+        assert session.get(Entity, RELATION) is None
+        assert session.get(EntityDigest, "b1685.2-per6-att4-38") is not None
+    import_xml(dbsystem, xml)
+
+
+def xml_without(content: bytes, group_id: str) -> bytes:
+    return re.sub(rb'<GROUP ID="' + group_id.encode() + rb'".*?</GROUP>', b"", content, flags=re.S)
@@ -0,0 +1,181 @@
+"""Test background import jobs.
+
+Imports local xml files, no Kleio Server needed.
+"""
+
+# pylint: disable=import-error
+import os
+import socket
+import subprocess
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from tests import TEST_DIR, skip_on_github_actions
+from timelink.api.database import TimelinkDatabase
+from timelink.api.jobs import JobQueue
+from timelink.api.models import Job, JobStatus
+from timelink.app.backend.timelink_webapp import TimelinkWebApp
+from timelink.app.jobs import router as jobs_router
+from timelink.app.models.project import Project
+from timelink.kleio.kleio_server import KleioServer
+
+pytestmark = skip_on_github_actions
+
+db_path = Path(TEST_DIR, "sqlite")
+TEST_DB = "import_jobs"
+test_set = [("sqlite", TEST_DB), ("postgres", TEST_DB)]
+XML_FILE = str(Path(TEST_DIR, "xml_data", "b1685.xml"))
+
+
+@pytest.fixture(scope="module")
+def dbsystem(request):
+    """Create an empty database"""
+    db_type, db_name = request.param
+    database = TimelinkDatabase(db_name, db_type, db_path=db_path, drop_if_exists=True)
+    try:
+        yield database
+    finally:
+        database.drop_db()
+
+
+@pytest.fixture(scope="module")
+def client(dbsystem, tmp_path_factory):
+    """A web app with the jobs endpoints and a project on the test database"""
+    home = tmp_path_factory.mktemp("timelink-home")
+    # not contacted, jobs here do not use the kleio server
+    kserver = KleioServer(url="http://localhost:8088", token="none", kleio_home=str(home))
+    webapp = TimelinkWebApp(
+        timelink_home=str(home),
+        kleio_server=kserver,
+        users_db_name="import_jobs_users.sqlite",
+        sqlite_dir=str(db_path),
+        import_workers=1,
+    )
+    with webapp.users_db.session() as session:
+        session.add(Project(name="jobs", databaseURL=dbsystem.db_url))
+        session.commit()
+    webapp.update_projects()
+    app = FastAPI()
+    app.state.webapp = webapp
+    app.include_router(jobs_router)
+    try:
+        yield TestClient(app)
+    finally:
+        webapp.shutdown()
+
+
+@pytest.mark.parametrize("dbsystem", test_set, indirect=True)
+def test_jobs_endpoints(client):
+    """Submit, follow and cancel jobs through the web app"""
+    response = client.post(f"/jobs/import/{XML_FILE}", params={"project": "jobs"})
+    assert response.status_code == 200, response.text
+    running = response.json()
+    queued = client.post(f"/jobs/import/{XML_FILE}", params={"project": "jobs"}).json()
+
+    # a single worker, the second job waits for the first
+    response = client.post(f"/jobs/{queued['id']}/cancel", params={"project": "jobs"})
+    assert response.json()["status"] == "cancelled"
+
+    # the project may be omitted when only one has a database
+    deadline = time.time() + 120
+    while client.get(f"/jobs/{running['id']}").json()["status"] not in ("done", "failed"):
+        assert time.time() < deadline
+        time.sleep(0.1)
+    job = client.get(f"/jobs/{running['id']}").json()
+    assert job["status"] == "done", job["error"]
+    assert job["result"]["entities_processed"] > 0
+
+    assert running["id"] in [j["id"] for j in client.get("/jobs").json()]
+    assert client.get("/jobs/nonexistent").status_code == 404
+    assert client.post("/jobs/nonexistent/cancel").status_code == 404
+    assert client.get("/jobs", params={"project": "other"}).status_code == 404
+
+
+@pytest.mark.parametrize("dbsystem", test_set, indirect=True)
+def test_import_job(dbsystem):
+    """An import job reports progress and stores the import stats"""
+    jobs = JobQueue(dbsystem, progress_interval=0)
+    try:
+        job = jobs.submit_import(XML_FILE)
+        assert job.status in (JobStatus.queued, JobStatus.running)
+        job = jobs.wait(job.id, timeout=120)
+    finally:
+        jobs.shutdown()
+    assert job.status == JobStatus.done, job.error
+    assert job.progress["groups_processed"] > 0
+    assert job.progress["nerrors"] == 0
+    assert job.result["entities_processed"] > 0
+    assert job.finished >= job.started >= job.created
+    assert [j.id for j in jobs.jobs(status="done")][0] == job.id
+
+
+@pytest.mark.parametrize("dbsystem", test_set, indirect=True)
+def test_cancel_jobs(dbsystem):
+    """Queued jobs do not start, a running import finishes its file"""
+    jobs = JobQueue(dbsystem, max_workers=1, progress_interval=0)
+    try:
+        running = jobs.submit_import(XML_FILE)
+        queued = jobs.submit_import(XML_FILE)
+        while jobs.status(running.id).progress is None:
+            time.sleep(0.01)
+        assert jobs.cancel(queued.id).status == JobStatus.cancelled
+        jobs.cancel(running.id)
+        running = jobs.wait(running.id, timeout=120)
+    finally:
+        jobs.shutdown()
+    assert running.status == JobStatus.done
+    assert running.result["entities_processed"] > 0
+    assert jobs.status(queued.id).started is None
+    assert jobs.cancel("nonexistent") is None
+
+
+@pytest.mark.parametrize("dbsystem", test_set, indirect=True)
+def test_interrupted_jobs_failed(dbsystem):
+    """Jobs left running by a process that ended are marked failed"""
+    with dbsystem.session() as session:
+        session.add(
+            Job(
+                id="interrupted",
+                kind="import",
+                path=XML_FILE,
+                status=JobStatus.running.value,
+                created=datetime.now(),
+            )
+        )
+        session.commit()
+    # a process that ended, and this process, which is running
+    ended = subprocess.run([sys.executable, "-c", "import os; print(os.getpid())"],
+                           capture_output=True, text=True, check=True)
+    host = socket.gethostname()
+    owners = {
+        "ended": f"{host}:{ended.stdout.strip()}",
+        "alive": f"{host}:{os.getpid()}",
+        "other_host": "other-host:1",
+    }
+    with dbsystem.session() as session:
+        for job_id, owner in owners.items():
+            session.add(
+                Job(
+                    id=job_id,
+                    kind="import",
+                    path=XML_FILE,
+                    status=JobStatus.running.value,
+                    created=datetime.now(),
+                    owner=owner,
+                )
+            )
+        session.commit()
+    jobs = JobQueue(dbsystem)
+    jobs.shutdown()
+    for job_id in ("interrupted", "ended"):
+        job = jobs.status(job_id)
+        assert job.status == JobStatus.failed
+        assert job.error == "Interrupted"
+    assert jobs.status("alive").status == JobStatus.running
+    assert jobs.status("other_host").status == JobStatus.running
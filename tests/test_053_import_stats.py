@@ -0,0 +1,72 @@
+"""Test the timing and counters in import stats.
+
+Imports local xml files, no Kleio Server needed.
+"""
+
+# pylint: disable=import-error
+from contextlib import contextmanager
+from pathlib import Path
+
+import pytest
+
+from tests import TEST_DIR, skip_on_github_actions
+from timelink.api.database import TimelinkDatabase
+from timelink.kleio.importer import import_from_xml
+
+pytestmark = skip_on_github_actions
+
+db_path = Path(TEST_DIR, "sqlite")
+TEST_DB = "import_stats"
+test_set = [("sqlite", TEST_DB), ("postgres", TEST_DB)]
+XML_FILE = Path(TEST_DIR, "xml_data", "b1685.xml")
+
+
+@pytest.fixture(scope="module")
+def dbsystem(request):
+    """Create an empty database"""
+    db_type, db_name = request.param
+    database = TimelinkDatabase(db_name, db_type, db_path=db_path, drop_if_exists=True)
+    try:
+        yield database
+    finally:
+        database.drop_db()
+
+
+class FakeTracer:
+    """Records the spans started, like an OpenTelemetry tracer"""
+
+    def __init__(self):
+        self.spans = []
+
+    @contextmanager
+    def start_as_current_span(self, name, attributes=None):
+        self.spans.append((name, attributes))
+        yield
+
+
+@pytest.mark.parametrize("dbsystem", test_set, indirect=True)
+def test_import_stages(dbsystem):
+    """Stats have the time of each stage and the groups stored by class"""
+    tracer = FakeTracer()
+    with dbsystem.session() as session:
+        stats = import_from_xml(
+            XML_FILE,
+            session,
+            options={"return_stats": True, "slow_group_seconds": 0, "tracer": tracer},
+        )
+    stages = stats["stages"]
+    for stage in ("parse", "group_build", "new_group", "store_group", "flush", "commit"):
+        assert stages[stage]["seconds"] > 0, stage
+    # stage times are exclusive, they add up to at most the time of the import
+    total = sum(stage["seconds"] for stage in stages.values())
+    assert total <= stats["import_time_seconds"]
+
+    counts = stats["group_counts"]
+    assert counts["person"] > 0
+    assert stats["entities_processed"] == sum(counts.values())
+    assert stages["store_group"]["calls"] == stats["entities_processed"]
+    assert len(stats["slow_groups"]) == min(100, stages["new_group"]["calls"])
+
+    names = [name for name, _ in tracer.spans]
+    assert names[0] == "timelink.import"
+    assert "timelink.import.postponed_relations" in names
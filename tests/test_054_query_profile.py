@@ -0,0 +1,123 @@
+"""Test the statement profiler of TimelinkDatabase.
+
+Imports local xml files, no Kleio Server needed.
+"""
+
+# pylint: disable=import-error
+import threading
+from pathlib import Path
+
+import pytest
+from sqlalchemy import select
+
+from tests import TEST_DIR, skip_on_github_actions
+from timelink.api.database import TimelinkDatabase
+from timelink.api.database_profile import normalize_statement
+from timelink.api.models import Entity
+
+pytestmark = skip_on_github_actions
+
+db_path = Path(TEST_DIR, "sqlite")
+TEST_DB = "query_profile"
+test_set = [("sqlite", TEST_DB), ("postgres", TEST_DB)]
+XML_FILE = Path(TEST_DIR, "xml_data", "b1685.xml")
+PERSONS = [f"b1685.{i}-per1" for i in range(1, 13)]
+
+
+@pytest.fixture(scope="module")
+def dbsystem(request):
+    """Create a database with a file imported"""
+    db_type, db_name = request.param
+    database = TimelinkDatabase(db_name, db_type, db_path=db_path, drop_if_exists=True)
+    with database.session() as session:
+        database.import_from_xml(XML_FILE, session)
+    try:
+        yield database
+    finally:
+        database.drop_db()
+
+
+def test_normalize_statement():
+    """Values and lists of parameters do not make statements different"""
+    assert normalize_statement(
+        "SELECT a.id\n  FROM attributes AS a WHERE a.the_value = 'soure' AND a.id IN (?, ?)"
+    ) == "SELECT a.id FROM attributes AS a WHERE a.the_value = ? AND a.id IN (?...)"
+    assert normalize_statement(
+        "SELECT id FROM entities WHERE id IN (%(id_1_1)s, %(id_1_2)s) LIMIT 10"
+    ) == normalize_statement("SELECT id FROM entities WHERE id IN (%(id_1_1)s) LIMIT 20")
+
+
+@pytest.mark.parametrize("dbsystem", test_set, indirect=True)
+def test_profile_n_plus_one(dbsystem):
+    """A query in a loop is an N+1 pattern, a single query for all is not"""
+    with dbsystem.session() as session, dbsystem.profile() as loop:
+        for pid in PERSONS:
+            session.get(Entity, pid)
+    assert loop.count == len(PERSONS)
+    assert [stats.count for stats in loop.n_plus_one()] == [len(PERSONS)]
+
+    with dbsystem.session() as session, dbsystem.profile() as single:
+        session.scalars(select(Entity).where(Entity.id.in_(PERSONS))).all()
+    assert single.count == 1
+    assert single.n_plus_one() == []
+    assert "1 statements" in single.report()
+
+
+@pytest.mark.parametrize("dbsystem", test_set, indirect=True)
+def test_profile_decorator_threads(dbsystem):
+    """As a decorator counts add up, other threads are not counted"""
+    profiler = dbsystem.profile()
+
+    @profiler
+    def get_person(pid):
+        with dbsystem.session() as session:
+            session.get(Entity, pid)
+
+    def other_thread():
+        with dbsystem.session() as session:
+            session.get(Entity, PERSONS[0])
+
+    get_person(PERSONS[0])
+    with profiler:
+        thread = threading.Thread(target=other_thread)
+        thread.start()
+        thread.join()
+    get_person(PERSONS[1])
+    assert profiler.count == 2
+    assert profiler.n_plus_one() == []
+
+
+@pytest.mark.parametrize("dbsystem", test_set, indirect=True)
+def test_profile_slow_explain(dbsystem, caplog):
+    """Slow statements are logged with their query plan"""
+    with dbsystem.session() as session:
+        with dbsystem.profile(slow_seconds=0, explain=True) as profiler:
+            session.get(Entity, PERSONS[0])
+    statement, parameters, seconds, plan = profiler.slow[0]
+    assert statement.startswith("SELECT")
+    # SEARCH ... USING INDEX in SQLite, Index Scan or Seq Scan in PostgreSQL
+    assert ("SEARCH" if dbsystem.db_type == "sqlite" else "Scan") in plan
+    assert "Slow statement" in caplog.text
+
+
+@pytest.mark.parametrize("dbsystem", test_set, indirect=True)
+def test_profile_failed_explain(dbsystem):
+    """A statement that cannot be explained leaves the transaction usable"""
+    with dbsystem.session() as session, dbsystem.profile(explain=True) as profiler:
+        connection = session.connection()
+        assert profiler._explain(connection, "SELECT * FROM no_such_table", {}) is None
+        assert session.scalars(select(Entity).limit(1)).first() is not None
+
+
+@pytest.mark.parametrize("dbsystem", test_set, indirect=True)
+def test_profile_shared_engine(dbsystem, tmp_path):
+    """Database objects with the same url share the engine and the profile"""
+    same_url = TimelinkDatabase(db_url=dbsystem.db_url, db_type=dbsystem.db_type)
+    other = TimelinkDatabase("profile_other", "sqlite", db_path=tmp_path)
+    assert same_url.engine is dbsystem.engine
+    with dbsystem.profile() as profiler:
+        with same_url.session() as session:
+            session.get(Entity, PERSONS[0])
+        with other.session() as session:
+            session.scalars(select(Entity)).all()
+    assert profiler.count == 1
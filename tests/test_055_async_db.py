@@ -0,0 +1,162 @@
+"""Test async sessions and the system endpoints of the web app.
+
+Imports local xml files, no Kleio Server needed.
+Async tests are skipped if the async extra (greenlet and the driver)
+is not installed.
+"""
+
+# pylint: disable=import-error
+import asyncio
+from pathlib import Path
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy.engine import make_url
+
+from tests import TEST_DIR, skip_on_github_actions
+from timelink.api import crud
+from timelink.api import database_engine
+from timelink.api.database import TimelinkDatabase
+from timelink.api.database_engine import (
+    ASYNC_DRIVERS,
+    async_database_url,
+    dispose_async_engines,
+)
+from timelink.api.database_metadata import SCHEMA_FINGERPRINT
+from timelink.app.backend.timelink_webapp import TimelinkWebApp
+from timelink.app.models.project import Project
+from timelink.app.system import router as system_router
+from timelink.kleio.importer import import_from_xml
+from timelink.kleio.kleio_server import KleioServer
+
+pytestmark = skip_on_github_actions
+
+db_path = Path(TEST_DIR, "sqlite")
+TEST_DB = "async_db"
+test_set = [("sqlite", TEST_DB), ("postgres", TEST_DB)]
+xml_file = Path(TEST_DIR, "xml_data", "dehergne-a.xml")
+
+
+@pytest.fixture(scope="module")
+def dbsystem(request):
+    """Create a database with the dehergne-a sample"""
+    db_type, db_name = request.param
+    database = TimelinkDatabase(db_name, db_type, db_path=db_path, drop_if_exists=True)
+    with database.session() as session:
+        import_from_xml(xml_file, session=session, options={"mode": "TL"})
+    try:
+        yield database
+    finally:
+        database.drop_db()
+
+
+def skip_without_async_driver(database):
+    pytest.importorskip("greenlet")
+    pytest.importorskip(ASYNC_DRIVERS[make_url(database.db_url).get_backend_name()])
+
+
+@pytest.fixture
+def client(dbsystem, tmp_path):
+    """A web app with the system endpoints and a project on the test database"""
+    # not contacted, the endpoints only use the database
+    kserver = KleioServer(url="http://localhost:8088", token="none", kleio_home=str(tmp_path))
+    webapp = TimelinkWebApp(
+        timelink_home=str(tmp_path),
+        kleio_server=kserver,
+        users_db_name="async_db_users.sqlite",
+        sqlite_dir=str(tmp_path),
+    )
+    with webapp.users_db.session() as session:
+        session.add(Project(name="async", databaseURL=dbsystem.db_url))
+        session.commit()
+    webapp.update_projects()
+    app = FastAPI()
+    app.state.webapp = webapp
+    app.include_router(system_router)
+
+    @app.on_event("shutdown")
+    async def shutdown():
+        await dispose_async_engines()
+
+    try:
+        with TestClient(app) as test_client:
+            yield test_client
+    finally:
+        webapp.shutdown()
+
+
+def test_async_database_url():
+    assert (
+        async_database_url("sqlite:////tmp/db/timelink.sqlite")
+        == "sqlite+aiosqlite:////tmp/db/timelink.sqlite"
+    )
+    assert (
+        async_database_url("postgresql+psycopg2://u:p@localhost/timelink")
+        == "postgresql+asyncpg://u:p@localhost/timelink"
+    )
+    with pytest.raises(ValueError):
+        async_database_url("mysql://u:p@localhost/timelink")
+
+
+def test_async_engine_without_extra(monkeypatch):
+    """Without the driver, the error tells how to install it"""
+
+    def no_module(name):
+        raise ImportError(f"No module named {name}")
+
+    monkeypatch.setattr(database_engine.importlib, "import_module", no_module)
+    with pytest.raises(ImportError, match=r"timelink\[async\]"):
+        database_engine.get_async_engine("sqlite:////tmp/no_async.sqlite")
+
+
+@pytest.mark.parametrize("dbsystem", test_set, indirect=True)
+def test_async_session_read(dbsystem):
+    """Read functions of crud with an async session"""
+    skip_without_async_driver(dbsystem)
+
+    async def read():
+        async with dbsystem.async_session() as session:
+            entity = await crud.get_async(session, "deh-antonio-de-andrade")
+            syspars = await crud.get_syspar_async(session, [SCHEMA_FINGERPRINT])
+        await dispose_async_engines()
+        return entity, syspars
+
+    entity, syspars = asyncio.run(read())
+    assert entity.id == "deh-antonio-de-andrade"
+    assert [p.pname for p in syspars] == [SCHEMA_FINGERPRINT]
+
+
+@pytest.mark.parametrize("dbsystem", test_set, indirect=True)
+def test_async_endpoint(dbsystem, client):
+    """An async endpoint reads the project database through get_async_db"""
+    skip_without_async_driver(dbsystem)
+    response = client.get("/syspar/", params={"project": "async", "q": SCHEMA_FINGERPRINT})
+    assert response.status_code == 200, response.text
+    assert [p["pname"] for p in response.json()] == [SCHEMA_FINGERPRINT]
+
+    response = client.get("/syspar/", params={"project": "unknown"})
+    assert response.status_code == 404
+
+
+@pytest.mark.parametrize("dbsystem", test_set, indirect=True)
+def test_write_endpoints(dbsystem, client):
+    """Endpoints that write use a session from get_session"""
+    syspar = {"pname": "test_055", "pvalue": "1", "ptype": "string", "obs": "first"}
+    response = client.post("/syspar/", params={"project": "async"}, json=syspar)
+    assert response.status_code == 200, response.text
+    assert response.json()["pvalue"] == "1"
+    # an existing parameter is updated
+    syspar.update(pvalue="2", obs="second")
+    response = client.post("/syspar/", params={"project": "async"}, json=syspar)
+    assert response.status_code == 200, response.text
+
+    log = {"level": "info", "origin": "test_055", "message": "written by the endpoint"}
+    response = client.post("/syslog", params={"project": "async"}, json=log)
+    assert response.status_code == 200, response.text
+    assert response.json()["message"] == log["message"]
+
+    with dbsystem.session() as session:
+        assert [(p.pvalue, p.obs) for p in crud.get_syspar(session, "test_055")] == [
+            ("2", "second")
+        ]
+        assert crud.get_syslog(session, 1)[0].origin == "test_055"
@@ -0,0 +1,70 @@
+"""Test the content hash of translations and the skip of unchanged files.
+
+Imports a local xml file, no Kleio Server needed.
+"""
+
+# pylint: disable=import-error
+import re
+from pathlib import Path
+
+import pytest
+from sqlalchemy import select
+
+from tests import TEST_DIR, skip_on_github_actions
+from timelink.api.database import TimelinkDatabase
+from timelink.api.models import KleioImportedFile
+from timelink.kleio.importer import import_from_xml
+from timelink.kleio.schemas import KleioFile
+from timelink.kleio.xml_source import ContentHash, xml_content_hash
+
+pytestmark = skip_on_github_actions
+
+db_path = Path(TEST_DIR, "sqlite")
+TEST_DB = "content_hash"
+test_set = [("sqlite", TEST_DB), ("postgres", TEST_DB)]
+xml_file = Path(TEST_DIR, "xml_data", "dehergne-a.xml")
+
+
+@pytest.fixture(scope="module")
+def dbsystem(request):
+    """Create a database with the dehergne-a sample"""
+    db_type, db_name = request.param
+    database = TimelinkDatabase(db_name, db_type, db_path=db_path, drop_if_exists=True)
+    with database.session() as session:
+        import_from_xml(xml_file, session=session, options={"mode": "TL"})
+    try:
+        yield database
+    finally:
+        database.drop_db()
+
+
+def test_content_hash_ignores_translation_date():
+    """Translations that differ only in the date have the same hash"""
+    xml = xml_file.read_bytes()
+    retranslated = re.sub(rb'WHEN="[^"]*"', b'WHEN="2030-1-1 0:0:0"', xml, count=1)
+    assert retranslated != xml
+    assert xml_content_hash(retranslated) == xml_content_hash(xml)
+    assert xml_content_hash(xml.replace(b"Andrade", b"Andrada")) != xml_content_hash(xml)
+
+    content_hash = ContentHash()
+    for i in range(0, len(xml), 7):
+        content_hash.update(xml[i:i + 7])
+    assert content_hash.hexdigest() == xml_content_hash(xml)
+
+
+@pytest.mark.parametrize("dbsystem", test_set, indirect=True)
+def test_content_hash_stored_and_skip(dbsystem):
+    """The import stores the content hash, unchanged files are skipped"""
+    xml_hash = xml_content_hash(xml_file.read_bytes())
+    with dbsystem.session() as session:
+        imported = session.scalars(select(KleioImportedFile)).one()
+        assert imported.content_hash == xml_hash
+        name, previous_import = imported.name, imported.imported
+
+    kfile = KleioFile.model_construct(name=name, path=f"x/{name}")
+    assert not dbsystem.skip_if_unchanged(kfile, "0" * 64)
+    assert dbsystem.skip_if_unchanged(kfile, xml_hash)
+    with dbsystem.session() as session:
+        imported = session.scalars(select(KleioImportedFile)).one()
+        assert imported.imported > previous_import
+    assert not dbsystem.skip_if_unchanged(kfile, xml_hash, match_path=True)
@@ -3,19 +3,34 @@
 https://github.com/time-link/timelink-kleio-server
 """
 
+import asyncio
+import gzip
+import json
 import re
+import threading
 import time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from pathlib import Path
+from xml.sax import make_parser
+from xml.sax.handler import ContentHandler
+
+import pytest
+import requests
 
 #  import pdb
 from tests import TEST_DIR, skip_if_local
+from timelink.api.database_kleio import DatabaseKleioMixin
+from timelink.kleio.async_kleio_server import AsyncKleioServer
 from timelink.kleio.kleio_server import (
     KleioServer,
+    KleioServerException,
     KleioServerForbidenException,
     is_project_directory,
     is_timelink_home_directory,
 )
 from timelink.kleio.schemas import KleioFile, TokenInfo
+from timelink.kleio.xml_source import XmlCache, parse_url, xml_cache_key
 
 KLEIO_ADMIN_TOKEN: str | None = None
 KLEIO_LIMITED_TOKEN: str | None = None
@@ -189,6 +204,19 @@ def test_translations_translate(kleio_server):
     assert translations is not None
 
 
+def test_translations_batch(kleio_server):
+    # Test translation status of several paths in one request"""
+    paths = [
+        "projects/test-project/sources/reference_sources/linked_data",
+        "projects/test-project/sources/reference_sources/rentities",
+    ]
+    kserver: KleioServer = kleio_server
+    batch = kserver.get_translations_batch(paths, recurse="yes")
+    for path in paths:
+        single = kserver.get_translations(path, recurse="yes")
+        assert [f.path for f in batch[path]] == [f.path for f in single]
+
+
 def test_translations_processing(kleio_server):
     # Test translations in process"""
     path: str = "projects/test_project/"
@@ -362,3 +390,261 @@ def test_start_stop_kleio_server():
     # running_server = KleioServer.get_server(kome)
     # assert running_server is None
     pass
+
+
+class FakeKleioHandler(BaseHTTPRequestHandler):
+    """Minimal JSON-RPC server: "echo" returns params["x"], "forbid" fails"""
+
+    protocol_version = "HTTP/1.1"  # keep-alive
+    client_ports = set()
+    posts = []
+    # number of requests answered with 503 before the normal answers
+    unavailable = 0
+
+    def log_message(self, *args):
+        pass
+
+    def _answer(self, status, body: bytes, content_type="application/json"):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _answer_xml(self):
+        body = f"<xml><path>{self.path}</path></xml>".encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/xml")
+        if "gzip" in self.headers.get("Accept-Encoding", ""):
+            body = gzip.compress(body)
+            self.send_header("Content-Encoding", "gzip")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        self.client_ports.add(self.client_address[1])
+        self.paths.append(self.path)
+        if "missing" in self.path:
+            self._answer(404, b"not found", "text/plain")
+        elif self.path.endswith(".xml"):
+            self._answer_xml()
+        else:
+            self._answer(200, "página".encode("utf-8"), "text/plain")
+
+    def do_POST(self):
+        self.client_ports.add(self.client_address[1])
+        payload = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        self.posts.append(payload)
+        if self.unavailable > 0:
+            FakeKleioHandler.unavailable -= 1
+            self._answer(503, b"unavailable", "text/plain")
+            return
+
+        def answer(rpc):
+            if rpc["method"] in ("echo", "translations_get", "translations_translate"):
+                return {"jsonrpc": "2.0", "result": rpc["params"]["x"], "id": rpc["id"]}
+            return {
+                "jsonrpc": "2.0",
+                "error": {"code": -32006, "message": "forbidden", "data": None},
+                "id": rpc["id"],
+            }
+
+        if isinstance(payload, list):
+            # batch answers may come in any order
+            content = [answer(rpc) for rpc in reversed(payload)]
+        else:
+            content = answer(payload)
+        self._answer(200, json.dumps(content).encode("utf-8"))
+
+
+@pytest.fixture
+def fake_kleio_server():
+    FakeKleioHandler.client_ports = set()
+    FakeKleioHandler.paths = []
+    FakeKleioHandler.posts = []
+    FakeKleioHandler.unavailable = 0
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), FakeKleioHandler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    kserver = KleioServer(
+        url=f"http://127.0.0.1:{httpd.server_address[1]}",
+        token="token",
+        kleio_home=".",
+        call_timeout=5,
+    )
+    yield kserver
+    kserver.close()
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def test_call_reuses_connection(fake_kleio_server):
+    # Test calls and downloads share a keep-alive connection"""
+    kserver = fake_kleio_server
+    for i in range(5):
+        assert kserver.call("echo", {"x": i}) == i
+    assert kserver.get_url_content(f"{kserver.get_url()}/rpt") == "página"
+    assert len(FakeKleioHandler.client_ports) == 1
+    with pytest.raises(KleioServerForbidenException):
+        kserver.call("forbid", {})
+
+
+def test_call_batch(fake_kleio_server):
+    # Test several calls in one JSON-RPC batch request"""
+    kserver = fake_kleio_server
+    results = kserver.call_batch([("echo", {"x": i}) for i in range(4)])
+    assert results == [0, 1, 2, 3]
+    assert kserver.call_batch([]) == []
+
+    calls = [("echo", {"x": "a"}), ("forbid", {}), ("echo", {"x": "b"})]
+    with pytest.raises(KleioServerForbidenException):
+        kserver.call_batch(calls)
+    results = kserver.call_batch(calls, raise_errors=False)
+    assert results[0] == "a" and results[2] == "b"
+    assert isinstance(results[1], KleioServerException)
+
+
+def test_call_retries_reads_only(fake_kleio_server):
+    # Test calls that read are retried on 503, calls that write are not"""
+    kserver = fake_kleio_server
+    FakeKleioHandler.unavailable = 1
+    assert kserver.call("translations_get", {"x": 1}) == 1
+    assert len(FakeKleioHandler.posts) == 2
+
+    FakeKleioHandler.posts = []
+    FakeKleioHandler.unavailable = 1
+    with pytest.raises(ValueError):  # the 503 answer is not json
+        kserver.call("translations_translate", {"x": 1})
+    assert len(FakeKleioHandler.posts) == 1
+
+    FakeKleioHandler.posts = []
+    FakeKleioHandler.unavailable = 1
+    with pytest.raises(ValueError):
+        kserver.call_batch([("translations_get", {"x": 1}), ("translations_translate", {"x": 2})])
+    assert len(FakeKleioHandler.posts) == 1
+
+
+def test_async_calls(fake_kleio_server):
+    # Test the async client against the same server"""
+    kserver = fake_kleio_server
+
+    async def run():
+        async with AsyncKleioServer.from_server(kserver, max_concurrency=3) as aks:
+            results = await asyncio.gather(*[aks.call("echo", {"x": i}) for i in range(10)])
+            reports = await aks.get_reports(["/rpt/a.rpt", None, "rpt/b.rpt"])
+            with pytest.raises(KleioServerForbidenException):
+                await aks.call("forbid", {})
+            return results, reports
+
+    results, reports = asyncio.run(run())
+    assert results == list(range(10))
+    assert reports == ["página", None, "página"]
+    # connections are limited by max_concurrency and reused
+    assert len(FakeKleioHandler.client_ports) <= 3
+
+
+def test_prefetch_xml(fake_kleio_server):
+    # Test xml files are downloaded ahead, in order, with errors reported"""
+    db = DatabaseKleioMixin()
+    db.kserver = fake_kleio_server
+    paths = ["/xml/a.xml", "/xml/missing.xml", "/xml/b.xml", "/xml/c.xml"]
+    kfiles = [KleioFile.model_construct(path=p, xml_url=p) for p in paths]
+
+    results = list(db.prefetch_xml(kfiles, max_concurrency=2))
+    assert [kfile.path for kfile, _ in results] == paths
+    assert results[0][1] == b"<xml><path>/xml/a.xml</path></xml>"
+    assert isinstance(results[1][1], Exception)
+    assert results[3][1] == b"<xml><path>/xml/c.xml</path></xml>"
+
+    # the consumer can stop early
+    downloads = db.prefetch_xml(kfiles * 5, max_concurrency=2)
+    assert next(downloads)[1] == b"<xml><path>/xml/a.xml</path></xml>"
+    downloads.close()
+
+
+def test_prefetch_xml_cache(fake_kleio_server, tmp_path):
+    # Test prefetched files are taken from the cache"""
+    db = DatabaseKleioMixin()
+    db.kserver = fake_kleio_server
+    kfiles = [KleioFile.model_construct(path=p, xml_url=p) for p in ["/x/a.xml", "/x/b.xml"]]
+    first = list(db.prefetch_xml(kfiles, xml_cache=tmp_path))
+    FakeKleioHandler.paths.clear()
+    second = list(db.prefetch_xml(kfiles, xml_cache=tmp_path))
+    assert first == second
+    assert FakeKleioHandler.paths == []
+
+
+def test_skip_unchanged_needs_prefetch():
+    # Test files streamed to the importer cannot be skipped by content hash"""
+    db = DatabaseKleioMixin()
+    with pytest.raises(ValueError, match="prefetch"):
+        db.update_from_sources(prefetch=0, skip_unchanged=True)
+
+
+class TextCollector(ContentHandler):
+    def __init__(self, fail=False):
+        super().__init__()
+        self.text = ""
+        self.fail = fail
+
+    def startElement(self, name, attrs):
+        if self.fail:
+            raise ValueError("import failed")
+
+    def characters(self, content):
+        self.text += content
+
+
+def parser_for(handler):
+    parser = make_parser()
+    parser.setContentHandler(handler)
+    return parser
+
+
+def test_parse_url_streaming_and_cache(fake_kleio_server, tmp_path):
+    # Test gzip download parsed in chunks, failed parse kept in the cache"""
+    url = f"{fake_kleio_server.get_url()}/xml/a.xml"
+    handler = TextCollector()
+    assert parse_url(parser_for(handler), url, token="t", chunk_size=8) is False
+    assert handler.text == "/xml/a.xml"
+
+    cache = XmlCache(tmp_path / "cache")
+    with pytest.raises(ValueError):
+        parse_url(parser_for(TextCollector(fail=True)), url, cache=cache, cache_key="a@1")
+    assert cache.get("a@1").read_bytes() == b"<xml><path>/xml/a.xml</path></xml>"
+
+    # the retry does not download again
+    FakeKleioHandler.paths.clear()
+    handler = TextCollector()
+    assert parse_url(parser_for(handler), url, cache=cache, cache_key="a@1") is True
+    assert handler.text == "/xml/a.xml"
+    assert FakeKleioHandler.paths == []
+
+    # same content under another key is stored once
+    parse_url(parser_for(TextCollector()), url, cache=cache, cache_key="a@2")
+    assert cache.get("a@1") == cache.get("a@2")
+    cache.discard("a@1")
+    assert cache.get("a@1") is None
+
+    with pytest.raises(requests.HTTPError):
+        parse_url(parser_for(TextCollector()), f"{url}/missing", cache=cache, cache_key="m@1")
+    assert not list(cache.directory.glob("*.part"))
+
+    # the url is the same after a new translation, it is not a key
+    with pytest.raises(ValueError, match="cache_key"):
+        parse_url(parser_for(TextCollector()), url, cache=cache)
+
+
+def test_xml_cache_key(tmp_path):
+    # Test the cache key changes when a file is translated again"""
+    kfile = KleioFile.model_construct(
+        path="/x/a.cli", xml_url="/x/a.xml", translated=datetime(2024, 1, 1)
+    )
+    key = xml_cache_key(kfile)
+    kfile.translated = datetime(2024, 1, 2)
+    assert xml_cache_key(kfile) != key
+
+    db = DatabaseKleioMixin()
+    with pytest.raises(ValueError, match="KleioFile"):
+        db.import_from_xml("/x/a.xml", xml_cache=tmp_path)
@@ -2,13 +2,39 @@
 
 """Tests for `timelink-py` package."""
 
+import os
 import random
+import threading
+
 import pytest
 from typer.testing import CliRunner
+from timelink import cli
 from timelink.cli import app, create_db_index, avoid_db_patterns
 from tests import mhk_absent, TEST_DIR, skip_on_github_actions
 
 
+@pytest.fixture(autouse=True)
+def db_index_cache(tmp_path, monkeypatch):
+    """Keep the database discovery cache out of ~/.timelink"""
+    cache_file = tmp_path / "db_index.json"
+    monkeypatch.setattr(cli, "DB_INDEX_CACHE", str(cache_file))
+    return cache_file
+
+
+@pytest.fixture
+def sqlite_database(tmp_path, monkeypatch):
+    """A sqlite database in the directory searched by the db commands"""
+    from timelink.api.database import TimelinkDatabase
+
+    db_dir = tmp_path / "databases"
+    database = TimelinkDatabase("cli_test", "sqlite", db_path=str(db_dir))
+    monkeypatch.setattr(cli, "current_working_directory", str(db_dir))
+    try:
+        yield database
+    finally:
+        database.drop_db()
+
+
 @pytest.fixture
 def response():
     """Sample pytest fixture.
@@ -62,7 +88,7 @@ def test_db_list():
 
 
 @skip_on_github_actions
-def test_db_current():
+def test_db_current(sqlite_database):
     """Test the CLI."""
     runner = CliRunner()
     db_list = create_db_index(avoid_patterns=avoid_db_patterns)
@@ -76,7 +102,7 @@ def test_db_current():
 
 
 @skip_on_github_actions
-def test_db_upgrade():
+def test_db_upgrade(sqlite_database):
     """Test the CLI."""
     runner = CliRunner()
     db_list = create_db_index(avoid_patterns=avoid_db_patterns)
@@ -92,7 +118,7 @@ def test_db_upgrade():
 
 
 @skip_on_github_actions
-def test_db_heads():
+def test_db_heads(sqlite_database):
     runner = CliRunner()
     db_list = create_db_index(avoid_patterns=avoid_db_patterns)
     # choose a random db
@@ -117,6 +143,109 @@ def test_create_db():
     # assert "Usage" in result.output
 
 
+def test_db_index_cache(tmp_path, monkeypatch):
+    """Database discovery reuses the cache while directories are unchanged"""
+    sources = tmp_path / "project"
+    (sources / "sub").mkdir(parents=True)
+    (sources / "a.sqlite").touch()
+    (sources / "sub" / "b.db").touch()
+    (sources / "notes.txt").touch()
+    cache_file = tmp_path / "cache" / "db_index.json"
+    monkeypatch.setattr(cli, "DB_INDEX_CACHE", str(cache_file))
+
+    cache = {}
+    found = cli.find_sqlite_databases(str(sources), cache)
+    assert sorted(os.path.basename(db) for db in found) == ["a.sqlite", "b.db"]
+    cli.write_db_index_cache({"sqlite": cache})
+    assert cache_file.exists()
+
+    cache = cli.read_db_index_cache()["sqlite"]
+    entry = cache[str(sources)]
+    entry["databases"] = ["cached.db"]  # marker to detect reuse
+    assert cli.find_sqlite_databases(str(sources), cache) == ["cached.db"]
+
+    # new file in a subdirectory invalidates the cache
+    (sources / "sub" / "c.db").touch()
+    found = cli.find_sqlite_databases(str(sources), cache)
+    assert sorted(os.path.basename(db) for db in found) == ["a.sqlite", "b.db", "c.db"]
+
+    cli.clear_db_index_cache()
+    assert not cache_file.exists()
+    assert cli.read_db_index_cache() == {}
+
+
+def test_postgres_db_index_cache(tmp_path, monkeypatch):
+    """A recent PostgreSQL listing is used without contacting docker"""
+    import time
+    from types import SimpleNamespace
+
+    import timelink.api.database as database
+
+    calls = []
+    container = SimpleNamespace(id="c1")
+
+    def docker_call(name, result):
+        def call(*args):
+            calls.append(name)
+            return result
+        return call
+
+    monkeypatch.setattr(database, "is_postgres_running", docker_call("running", True))
+    monkeypatch.setattr(database, "get_postgres_container", lambda: container)
+    monkeypatch.setattr(database, "get_postgres_dbnames", docker_call("dbnames", ["new"]))
+    monkeypatch.setattr(database, "get_postgres_url", docker_call("url", "postgresql://u:p@h/"))
+    monkeypatch.setattr(cli, "current_working_directory", str(tmp_path))
+    cli.write_db_index_cache({
+        "postgres": {
+            "container": "c1",
+            "url": "postgresql://cached@h/",
+            "time": time.time(),
+            "databases": ["cached"],
+        }
+    })
+    db_index = cli.create_db_index()
+    assert calls == []
+    assert list(db_index.values()) == [("postgres", "cached", "postgresql://cached@h/cached")]
+
+    # expired, same container: listed again with the cached url
+    cache = cli.read_db_index_cache()["postgres"]
+    cache["time"] -= cli.DB_INDEX_POSTGRES_MAX_AGE
+    assert cli.find_postgres_databases(cache) == ["new"]
+    assert calls == ["running", "dbnames"]
+    assert cache["url"] == "postgresql://cached@h/"
+
+    # expired, new container: the url is fetched again
+    calls.clear()
+    cache["time"] -= cli.DB_INDEX_POSTGRES_MAX_AGE
+    container.id = "c2"
+    cli.find_postgres_databases(cache)
+    assert calls == ["running", "dbnames", "url"]
+    assert cache == {
+        "container": "c2",
+        "url": "postgresql://u:p@h/",
+        "time": cache["time"],
+        "databases": ["new"],
+    }
+
+
+def test_create_db_index_source_timeout(tmp_path, monkeypatch):
+    """A slow source is skipped and the others are listed"""
+    (tmp_path / "a.sqlite").touch()
+    monkeypatch.setattr(cli, "current_working_directory", str(tmp_path))
+    release = threading.Event()
+
+    def slow_postgres(postgres_cache):
+        release.wait(10)
+        return ["never"]
+
+    monkeypatch.setattr(cli, "find_postgres_databases", slow_postgres)
+    with pytest.warns(UserWarning, match="postgres databases timed out"):
+        db_index = cli.create_db_index(timeout=0.5)
+    release.set()
+    assert [db[1] for db in db_index.values()] == ["a.sqlite"]
+    assert "postgres" not in cli.read_db_index_cache()
+
+
 def test_get_latest_version():
     from timelink import get_latest_version
 
@@ -10,12 +10,17 @@ information collected from historical sources.
 
 
 """
-import requests
+import importlib
 
-from .api import models  # noqa: F401
-from .api import database  # noqa: F401
-from .api import views  # noqa: F401
-from .api import schemas  # noqa: F401
+# Submodules available as attributes of the package, imported on first use
+# (PEP 562) so that "import timelink" does not load sqlalchemy, pandas,
+# docker or alembic.
+_lazy_modules = {
+    "models": "timelink.api.models",
+    "database": "timelink.api.database",
+    "views": "timelink.api.views",
+    "schemas": "timelink.api.schemas",
+}
 
 
 __author__ = """Joaquim Ramos de Carvalho"""
@@ -25,8 +30,22 @@ __version__ = '1.1.33'
 version = __version__
 
 
+def __getattr__(name):
+    if name in _lazy_modules:
+        module = importlib.import_module(_lazy_modules[name])
+        globals()[name] = module
+        return module
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__():
+    return sorted(list(globals()) + list(_lazy_modules))
+
+
 def get_latest_version(package_name="timelink"):
     """Get the latest version of a package from PyPI."""
+    import requests
+
     # Step 1: Fetch the package information from PyPI
     url = f'https://pypi.org/pypi/{package_name}/json'
     response = requests.get(url)
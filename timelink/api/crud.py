@@ -2,12 +2,23 @@
 
 This module provides basic Create, Read, Update, and Delete operations for
 Timelink system models, including system parameters, logs, and general entities.
+
+Read operations have async versions (suffix _async) that take an AsyncSession,
+see :attr:`timelink.api.database.TimelinkDatabase.async_session`.
 """
 
 from datetime import datetime
+from typing import TYPE_CHECKING
+
+from sqlalchemy import select  # pylint: disable=import-error
 from sqlalchemy.orm import Session  # pylint: disable=import-error
 from timelink.api import models
-from timelink.api.schemas import EntityAttrRelSchema
+from timelink.api.models.person_name import similar_names_select
+from timelink.api.schemas import EntityAttrRelSchema, SearchRequest, SearchResults
+
+if TYPE_CHECKING:
+    # the asyncio extension needs greenlet, only the async functions use it
+    from sqlalchemy.ext.asyncio import AsyncSession
 
 
 def get_syspar(db: Session, q: list[str] | None = None):
@@ -40,8 +51,8 @@ def set_syspar(
     Returns:
         SysPar: The created or updated system parameter object.
     """
-    db_syspar = get_syspar(db, syspar.pname)
-    if db_syspar:
+    db_syspar = next(iter(get_syspar(db, syspar.pname)), None)
+    if db_syspar is not None:
         db_syspar.pvalue = syspar.pvalue
         db_syspar.ptype = syspar.ptype
         db_syspar.obs = syspar.obs
@@ -129,3 +140,64 @@ def get(db: Session, id: str) -> EntityAttrRelSchema:  # pylint: disable=invalid
     #       and contains
 
     return pentity
+
+
+def search_names(db: Session, search_request: SearchRequest) -> list[SearchResults]:
+    """Search persons with names similar to the query string.
+
+    Uses the normalized name index, see :func:`timelink.api.models.person_name.similar_names_select`.
+
+    Args:
+        db (Session): Database session.
+        search_request (SearchRequest): query string and pagination.
+
+    Returns:
+        list[SearchResults]: matching persons ordered by name.
+    """
+    persons = models.Person.__table__
+    entities = models.Entity.__table__
+    similar = similar_names_select(search_request.q, db.get_bind().dialect.name)
+    stmt = (
+        select(persons.c.id, entities.c["class"], persons.c.name)
+        .join(entities, entities.c.id == persons.c.id)
+        .where(persons.c.id.in_(similar))
+        .order_by(persons.c.name, persons.c.id)
+        .offset(search_request.skip)
+        .limit(search_request.limit)
+    )
+    return [
+        SearchResults(id=row.id, the_class=row[1], description=row.name)
+        for row in db.execute(stmt)
+    ]
+
+
+async def get_syspar_async(db: "AsyncSession", q: list[str] | None = None):
+    """Retrieve system parameters, async version of get_syspar()."""
+    stmt = select(models.SysPar)
+    if q:
+        if isinstance(q, str):
+            q = [q]
+        stmt = stmt.where(models.SysPar.pname.in_(q))
+    return (await db.scalars(stmt)).all()
+
+
+async def get_syslog_async(db: "AsyncSession", nlogs: int) -> list[models.SysLog]:
+    """Retrieve the last n system logs, async version of get_syslog()."""
+    stmt = select(models.SysLog).order_by(models.SysLog.seq.desc()).limit(nlogs)
+    return (await db.scalars(stmt)).all()
+
+
+async def get_async(db: "AsyncSession", id: str) -> EntityAttrRelSchema:  # pylint: disable=invalid-name
+    """Get entity by id, async version of get().
+
+    Runs get() with run_sync(), so that the lazy loading of
+    relationships done by get() is awaited.
+    """
+    return await db.run_sync(get, id)
+
+
+async def search_names_async(
+    db: "AsyncSession", search_request: SearchRequest
+) -> list[SearchResults]:
+    """Search persons with names similar to the query string, async version of search_names()."""
+    return await db.run_sync(search_names, search_request)
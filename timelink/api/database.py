@@ -11,13 +11,18 @@ import os
 import warnings
 from collections import defaultdict
 
-from sqlalchemy import create_engine, select, text
+from sqlalchemy import MetaData, select, text
 from sqlalchemy.orm import sessionmaker  # pylint: disable=import-error
 from sqlalchemy_utils import create_database, database_exists, drop_database
 
 from timelink import models  # pylint: disable=unused-import
 from timelink import migrations
-from timelink.api.models import Entity, PomSomMapper, pom_som_base_mappings
+from timelink.api.models import Entity, GroupClass, PomSomMapper, pom_som_base_mappings
+from timelink.api.models.group_class import (
+    NO_GROUP,
+    clear_group_class_cache,
+    register_group_class,
+)
 from timelink.api.models.base_class import Base
 from timelink.kleio import KleioFile, KleioServer, import_status_enum
 from timelink.kleio.importer import import_from_xml
@@ -26,6 +31,7 @@ from timelink.mhk import utilities
 from . import views  # see https://github.com/sqlalchemy/sqlalchemy/wiki/Views
 from .database_kleio import DatabaseKleioMixin
 from .database_metadata import DatabaseMetadataMixin
+from .database_profile import DatabaseProfileMixin, QueryProfiler
 from .database_postgres import (
     get_postgres_container,
     get_postgres_container_pwd,
@@ -36,16 +42,33 @@ from .database_postgres import (
     is_valid_postgres_db_name,
     start_postgres_server,
 )
+from .database_engine import (
+    ENGINE_PRESETS,
+    dispose_engine,
+    dispose_engines,
+    engine_settings,
+    get_async_engine,
+    get_engine,
+)
 from .database_query import DatabaseQueryMixin, TimelinkDatabaseSchema
-from .database_sqlite import get_sqlite_databases, get_sqlite_url
+from .database_sqlite import (
+    get_sqlite_databases,
+    get_sqlite_url,
+    scan_sqlite_databases,
+    sqlite_directories_unchanged,
+)
 from .database_utils import get_db_password, get_import_status, random_password
-from .database_views import DatabaseViewsMixin
+from .database_views import MATERIALIZED_PREFIX, DatabaseViewsMixin
 
 __all__ = [
     "TimelinkDatabase",
     "TimelinkDatabaseSchema",
+    "QueryProfiler",
     "KleioServer",
     "KleioFile",
+    "ENGINE_PRESETS",
+    "dispose_engines",
+    "get_engine",
     "import_status_enum",
     "import_from_xml",
     "get_postgres_container",
@@ -58,6 +81,8 @@ __all__ = [
     "start_postgres_server",
     "get_sqlite_databases",
     "get_sqlite_url",
+    "scan_sqlite_databases",
+    "sqlite_directories_unchanged",
     "get_db_password",
     "get_import_status",
     "random_password",
@@ -69,6 +94,7 @@ class TimelinkDatabase(
     DatabaseMetadataMixin,
     DatabaseKleioMixin,
     DatabaseQueryMixin,
+    DatabaseProfileMixin,
 ):
     """Database connection and setup
 
@@ -87,6 +113,7 @@ class TimelinkDatabase(
     - DatabaseMetadataMixin: Inspection of database metadata and ORM models.
     - DatabaseKleioMixin: Integration with Kleio server for data imports.
     - DatabaseQueryMixin: High-level data access and querying methods.
+    - DatabaseProfileMixin: Statement counts and slow queries, see profile().
 
     Attributes:
         db_url (str): database sqlalchemy url
@@ -126,6 +153,10 @@ class TimelinkDatabase(
         postgres_version=None,
         stop_duplicates=True,
         echo=False,
+        fast_open=True,
+        engine_preset=None,
+        engine_options=None,
+        sqlite_pragmas=None,
         **connect_args,
     ):
         """Initialize the database connection and setup
@@ -156,6 +187,18 @@ class TimelinkDatabase(
             postgres_image (str, optional): postgres docker image; defaults to None.
             postgres_version (str, optional): postgres version; defaults to None.
             echo (bool, optional): if True, the Engine will log all statements; defaults to False.
+            fast_open (bool, optional): if True and the schema fingerprint stored in the
+                           database matches the current one, skip migrations, view rebuilds
+                           and reflection when opening an existing database; defaults to True.
+            engine_preset (str, optional): connection pool and SQLite settings for a
+                           type of workload, "interactive" or "bulk",
+                           see :mod:`timelink.api.database_engine`; defaults to None.
+            engine_options (dict, optional): extra arguments to sqlalchemy create_engine
+                           (pool_size, max_overflow, pool_pre_ping, pool_recycle,
+                           query_cache_size...), override the preset; defaults to None.
+            sqlite_pragmas (dict, optional): pragmas set on each new SQLite connection,
+                           e.g. {"journal_mode": "WAL"}, override the preset;
+                           defaults to None.
             connect_args (dict, optional): extra arguments to sqlalchemy and
                            :func:`timelink.kleio.KleioServer.start`
         """
@@ -165,6 +208,8 @@ class TimelinkDatabase(
         self.db_type = db_type
 
         self.views = dict()
+        self.materialized_views = dict()
+        self.materialized_metadata = MetaData()
         self.kserver = None
         self.base_tables_names = []
 
@@ -234,8 +279,19 @@ class TimelinkDatabase(
             else:
                 raise ValueError(f"Unknown database type: {db_type}")
 
-        self.engine = create_engine(self.db_url, echo=echo, connect_args=connect_args)
+        engine_options, self.sqlite_pragmas = engine_settings(
+            self.db_url, engine_preset, engine_options, sqlite_pragmas
+        )
+        # engines are shared by all objects with the same url and options
+        self.engine = get_engine(
+            self.db_url,
+            echo=echo,
+            connect_args=connect_args,
+            sqlite_pragmas=self.sqlite_pragmas,
+            **engine_options,
+        )
         self.session = sessionmaker(autocommit=False, autoflush=False, bind=self.engine)
+        self._async_session = None  # created on first use, see async_session
 
         self.metadata = Base.metadata
         self.registry = Base.registry
@@ -248,7 +304,18 @@ class TimelinkDatabase(
         # create an empty database if it does not exist
         if drop_if_exists:
             if database_exists(self.engine.url):
+                # pooled connections of the shared engine would
+                # still point to the dropped database
+                dispose_engine(self.engine)
                 drop_database(self.engine.url)
+                self.engine = get_engine(
+                    self.db_url,
+                    echo=echo,
+                    connect_args=connect_args,
+                    sqlite_pragmas=self.sqlite_pragmas,
+                    **engine_options,
+                )
+                self.session.configure(bind=self.engine)
         if (
             not database_exists(self.engine.url) or db_url == "sqlite:///:memory:"
         ):  # noqa
@@ -260,17 +327,35 @@ class TimelinkDatabase(
                 raise Exception("Error while creating database") from exc
         else:
             try:
-
-                self.check_db()  # health check to the database
-                migrations.upgrade(self.db_url)
-                with self.session() as session:
-                    self._ensure_all_mappings(
-                        session
-                    )  # this will cache the pomsom mapper objects
-                # ensure views
-                self._update_views()
-                # get any extra table or views inspecting metadata
-                self.metadata.reflect(bind=self.engine)
+                self._define_views()
+                stored_fingerprint = self.get_schema_fingerprint() if fast_open else None
+                if (
+                    stored_fingerprint is not None
+                    and stored_fingerprint == self.schema_fingerprint()
+                ):
+                    # nothing changed since last open: tables missing from
+                    # metadata are reflected on demand by get_table()
+                    logging.debug("Schema unchanged, skipping database checks")
+                    with self.session() as session:
+                        self._ensure_all_mappings(session)
+                    self._load_materialized_views()
+                else:
+                    self.check_db()  # health check to the database
+                    migrations.upgrade(self.db_url)
+                    with self.session() as session:
+                        self._ensure_all_mappings(
+                            session
+                        )  # this will cache the pomsom mapper objects
+                    # ensure views
+                    self._update_views()
+                    # get any extra table or views inspecting metadata
+                    # shadow tables of materialized views are kept apart
+                    self.metadata.reflect(
+                        bind=self.engine,
+                        only=lambda name, _: not name.startswith(MATERIALIZED_PREFIX),
+                    )
+                    self.store_schema_fingerprint()
+                    self._load_materialized_views()
 
             except Exception as exc:
                 logging.error(exc)
@@ -289,6 +374,33 @@ class TimelinkDatabase(
                     stop_duplicates=stop_duplicates,
                 )
 
+    @property
+    def async_session(self):
+        """Factory of asyncio sessions for this database
+
+        Uses the SQLAlchemy asyncio extension with the aiosqlite or asyncpg
+        driver, see :func:`timelink.api.database_engine.get_async_engine`.
+        Intended for read only access from async code, like the
+        FastAPI endpoints; imports and other writes use :attr:`session`.
+
+        Example::
+
+            async with db.async_session() as session:
+                result = await session.execute(select(Person).limit(10))
+
+        Returns:
+            async_sessionmaker: factory of AsyncSession objects
+        """
+        if self._async_session is None:
+            from sqlalchemy.ext.asyncio import async_sessionmaker
+
+            self._async_session = async_sessionmaker(
+                get_async_engine(self.db_url, sqlite_pragmas=self.sqlite_pragmas),
+                autoflush=False,
+                expire_on_commit=False,
+            )
+        return self._async_session
+
     def create_db(self):
         """Create the database tables, views, and mappings.
 
@@ -308,6 +420,7 @@ class TimelinkDatabase(
         # Clean caches of Mappings and ORM classes
         PomSomMapper.reset_cache()
         Entity.reset_cache()
+        clear_group_class_cache(self.engine)
 
         # remove dynamic tables from metadata
         for dtable in self.db_dynamic_tables():
@@ -336,6 +449,10 @@ class TimelinkDatabase(
         except Exception as exc:
             logging.error(exc)
             raise Exception("Error while updating database views") from exc
+        try:
+            self.store_schema_fingerprint()
+        except Exception as exc:
+            logging.error(f"Error storing schema fingerprint: {exc}")
 
     def check_db(self):
         """Check the database health and integrity.
@@ -491,6 +608,26 @@ class TimelinkDatabase(
                 session.rollback()
                 logging.error(f"Error dropping view {view_name}: {exc}")
 
+    def _define_views(self):
+        """Define the standard views in self.views, without creating them.
+
+        Views are defined only once per database object; the definitions
+        do not depend on the contents of the database.
+        """
+        if self.views:
+            return
+        # Create named_entities first since other views depend on it
+        view = self._create_named_entity_view()
+        self.views[view.name] = view
+        view = self._create_nattributes_view()
+        self.views[view.name] = view
+        view = self._create_eattribute_view()
+        self.views[view.name] = view
+        view = self._create_nfunction_view()
+        self.views[view.name] = view
+        view = self._create_nrelations_view()
+        self.views[view.name] = view
+
     def _create_views(self):
         """Create standard database views for common queries.
 
@@ -509,17 +646,7 @@ class TimelinkDatabase(
         See Also:
             Issue #63 in the project repository for more details on view requirements.
         """
-        # Create named_entities first since other views depend on it
-        view = self._create_named_entity_view()
-        self.views[view.name] = view
-        view = self._create_nattributes_view()
-        self.views[view.name] = view
-        view = self._create_eattribute_view()
-        self.views[view.name] = view
-        view = self._create_nfunction_view()
-        self.views[view.name] = view
-        view = self._create_nrelations_view()
-        self.views[view.name] = view
+        self._define_views()
 
         try:
             self.metadata.create_all(self.engine)
@@ -527,15 +654,6 @@ class TimelinkDatabase(
         except Exception as exc:
             logging.error(f"Error creating views: {exc}")
 
-    def _update_views(self):
-        """Drop and recreate all database views.
-
-        This method ensures that views reflect the current state of the database
-        schema by dropping existing views and recreating them.
-        """
-        self._drop_views()
-        self._create_views()
-
     def has_active_connections(self):
         """Check if there are active connections in the engine pool."""
         if hasattr(self.engine, "pool"):
@@ -578,7 +696,7 @@ class TimelinkDatabase(
                                 ),
                                 {"dbname": self.db_name},
                             )
-                self.engine.dispose()
+                dispose_engine(self.engine)
                 drop_database(self.db_url)
             return
 
@@ -596,6 +714,10 @@ class TimelinkDatabase(
         except Exception as exc:
             logging.error(f"Error during database drop: {exc}")
             session.rollback()
+        try:
+            self.drop_materialized_views()
+        except Exception as exc:
+            warnings.warn("Dropping materialized views problem " + str(exc), stacklevel=2)
         try:
             with self.engine.begin() as con:
                 dynamic_tables = self.db_dynamic_tables()
@@ -605,6 +727,7 @@ class TimelinkDatabase(
                 self.metadata.drop_all(con)
         except Exception as exc:
             warnings.warn("Dropping tables problem " + str(exc), stacklevel=2)
+        clear_group_class_cache(self.engine)
 
     def _load_database_classes(self, session):
         """Populate the database with core Timelink classes and mappings.
@@ -638,6 +761,8 @@ class TimelinkDatabase(
             if k not in available_mappings:
                 data = pom_som_base_mappings[k]
                 session.bulk_save_objects(data)
+                # bulk saves do not fire the event that updates the catalog
+                register_group_class(session.connection(), NO_GROUP, "class")
         # this will cache the pomsom mapper objects
         session.commit()
 
@@ -691,16 +816,12 @@ class TimelinkDatabase(
         # in one programme.
         Entity.clear_group_models_cache()
 
-        # now introspect the database for group/class combinations
-        stmt = select(Entity.pom_class, Entity.groupname).distinct()
+        # now get the group/class combinations from the catalog
+        # maintained during import, see timelink.api.models.group_class
+        stmt = select(GroupClass.pom_class, GroupClass.groupname)
         results = session.execute(stmt).all()
         for pom_class, groupname in results:
-            if groupname is not None:
-                gname = groupname
-            else:
-                gname = "class"
-
-            Entity.set_orm_for_group(gname, Entity.get_orm_for_pom_class(pom_class))
+            Entity.set_orm_for_group(groupname, Entity.get_orm_for_pom_class(pom_class))
 
     def __enter__(self):
         return self.session()
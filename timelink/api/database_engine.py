@@ -0,0 +1,374 @@
+"""Engine and connection pool configuration for Timelink databases.
+
+This module builds the arguments passed to :func:`sqlalchemy.create_engine`
+and sets SQLite pragmas on each new connection.
+
+Presets group settings for typical workloads:
+
+    * "interactive": notebooks and the web app, many short queries.
+      Connections are checked before use and recycled, SQLite uses
+      WAL so readers are not blocked by a writer.
+    * "bulk": imports, few connections doing many writes. SQLite uses a
+      larger page cache and keeps temporary tables in memory.
+
+Example::
+
+    db = TimelinkDatabase("mydb", engine_preset="bulk")
+    db = TimelinkDatabase(
+        "mydb",
+        engine_options={"pool_size": 10, "pool_pre_ping": True},
+        sqlite_pragmas={"cache_size": -200000},
+    )
+
+Engines are shared: all the database objects of a process that use the
+same url and options (TimelinkDatabase, UserDatabase and the project
+databases of the web app) get the same engine and connection pool from
+:func:`get_engine`. The engines are disposed at exit, or explicitly
+with :func:`dispose_engines`.
+
+Functions:
+    engine_settings(db_url, preset, engine_options, sqlite_pragmas) -> tuple[dict, dict]:
+        Combine a preset with explicit options.
+
+    set_sqlite_pragmas(engine, pragmas):
+        Set SQLite pragmas on every new connection of an engine.
+
+    get_engine(db_url, echo, connect_args, sqlite_pragmas, **engine_options) -> Engine:
+        Return the shared engine for a url and options, creating it if needed.
+
+    dispose_engine(engine):
+        Close the connections of a shared engine and remove it from the registry.
+
+    dispose_engines():
+        Close the connections of all shared engines and empty the registry.
+
+    shared_engines() -> list[Engine]:
+        Return the engines currently in the registry.
+
+    async_database_url(db_url) -> str:
+        Url of the asyncio driver (aiosqlite, asyncpg) for a database url.
+
+    get_async_engine(db_url, sqlite_pragmas, **engine_options) -> AsyncEngine:
+        Return the shared asyncio engine for a url and options.
+
+    dispose_async_engines():
+        Coroutine, close the connections of all shared asyncio engines.
+"""
+
+import atexit
+import importlib
+import re
+import threading
+from typing import TYPE_CHECKING
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine, make_url
+
+if TYPE_CHECKING:
+    from sqlalchemy.ext.asyncio import AsyncEngine
+
+# Pragmas that are useful for performance. WAL and synchronous=NORMAL
+# are safe together: a power failure may lose the last transactions
+# but does not corrupt the database.
+SQLITE_PERFORMANCE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "cache_size": -65536,  # negative is KiB, 64MB
+    "mmap_size": 268435456,  # 256MB
+    "temp_store": "MEMORY",
+}
+
+ENGINE_PRESETS = {
+    "interactive": {
+        "engine_options": {
+            "pool_size": 5,
+            "max_overflow": 10,
+            "pool_pre_ping": True,
+            "pool_recycle": 3600,
+            "query_cache_size": 1200,
+        },
+        "sqlite_pragmas": SQLITE_PERFORMANCE_PRAGMAS,
+    },
+    "bulk": {
+        "engine_options": {
+            "pool_size": 2,
+            "max_overflow": 2,
+            "pool_pre_ping": False,
+        },
+        "sqlite_pragmas": {
+            **SQLITE_PERFORMANCE_PRAGMAS,
+            "cache_size": -262144,  # 256MB
+        },
+    },
+}
+
+# options of create_engine that configure a QueuePool,
+# not accepted by the pools used for in-memory SQLite
+QUEUE_POOL_OPTIONS = ("pool_size", "max_overflow", "pool_timeout")
+
+# shared engines, key is the url and options, see _engine_key()
+_engines: dict[tuple, Engine] = {}
+_async_engines: dict[tuple, "AsyncEngine"] = {}
+_engines_lock = threading.Lock()
+
+_pragma_name = re.compile(r"^[a-z_]+$")
+_pragma_value = re.compile(r"^(-?\d+|[A-Za-z_]+)$")
+
+
+def engine_settings(
+    db_url: str,
+    preset: str | None = None,
+    engine_options: dict | None = None,
+    sqlite_pragmas: dict | None = None,
+) -> tuple[dict, dict]:
+    """Combine a preset with explicit engine options and pragmas.
+
+    Explicit values override those of the preset. Pool size and overflow
+    from the preset are dropped for in-memory SQLite databases, which
+    do not use a connection queue.
+
+    Args:
+        db_url (str): database url.
+        preset (str, optional): name of a preset in ENGINE_PRESETS.
+        engine_options (dict, optional): extra arguments to create_engine,
+            e.g. pool_size, max_overflow, pool_pre_ping, pool_recycle,
+            query_cache_size.
+        sqlite_pragmas (dict, optional): pragmas to set on each SQLite
+            connection, ignored for other databases.
+
+    Returns:
+        tuple[dict, dict]: arguments for create_engine and SQLite pragmas.
+
+    Raises:
+        ValueError: if the preset is unknown.
+    """
+    if preset is None:
+        settings = {"engine_options": {}, "sqlite_pragmas": {}}
+    elif preset in ENGINE_PRESETS:
+        settings = ENGINE_PRESETS[preset]
+    else:
+        raise ValueError(
+            f"Unknown engine preset: {preset}, use one of {list(ENGINE_PRESETS)}"
+        )
+    options = dict(settings["engine_options"])
+    pragmas = dict(settings["sqlite_pragmas"])
+
+    url = make_url(db_url)
+    if url.get_backend_name() == "sqlite":
+        if url.database in (None, "", ":memory:"):
+            for option in QUEUE_POOL_OPTIONS:
+                options.pop(option, None)
+    else:
+        pragmas = {}
+    options.update(engine_options or {})
+    if url.get_backend_name() == "sqlite":
+        pragmas.update(sqlite_pragmas or {})
+    return options, pragmas
+
+
+def set_sqlite_pragmas(engine: Engine, pragmas: dict):
+    """Set SQLite pragmas on every new connection of an engine.
+
+    Args:
+        engine (Engine): SQLite engine.
+        pragmas (dict): pragma name: value, e.g. {"journal_mode": "WAL"}.
+
+    Raises:
+        ValueError: if a pragma name or value is not valid.
+    """
+    for name, value in pragmas.items():
+        if not _pragma_name.match(name) or not _pragma_value.match(str(value)):
+            raise ValueError(f"Invalid SQLite pragma: {name}={value}")
+    if not pragmas:
+        return
+
+    @event.listens_for(engine, "connect")
+    def _set_pragmas(dbapi_connection, _connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas.items():
+                cursor.execute(f"PRAGMA {name}={value}")
+        finally:
+            cursor.close()
+
+
+def _engine_key(db_url, echo, connect_args, sqlite_pragmas, engine_options) -> tuple:
+    # repr makes options with unhashable values (dicts, lists) usable as keys
+    return (
+        make_url(db_url).render_as_string(hide_password=False),
+        echo,
+        repr(sorted((connect_args or {}).items())),
+        repr(sorted((sqlite_pragmas or {}).items())),
+        repr(sorted(engine_options.items())),
+    )
+
+
+def get_engine(
+    db_url: str,
+    echo: bool = False,
+    connect_args: dict | None = None,
+    sqlite_pragmas: dict | None = None,
+    **engine_options,
+) -> Engine:
+    """Return the shared engine for a url and options.
+
+    The engine is created on the first call and reused by later calls with
+    the same url and options, so that database objects opened on the same
+    database share a connection pool and the dialect is initialized once.
+    In-memory SQLite engines are not shared: each one is a different database.
+
+    Args:
+        db_url (str): database url.
+        echo (bool): log all statements.
+        connect_args (dict, optional): arguments for the DBAPI connect().
+        sqlite_pragmas (dict, optional): pragmas set on each new SQLite connection.
+        **engine_options: extra arguments to create_engine.
+
+    Returns:
+        Engine: the shared engine.
+    """
+    url = make_url(db_url)
+    if url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:"):
+        return _new_engine(db_url, echo, connect_args, sqlite_pragmas, engine_options)
+
+    key = _engine_key(db_url, echo, connect_args, sqlite_pragmas, engine_options)
+    with _engines_lock:
+        engine = _engines.get(key)
+        if engine is None:
+            engine = _new_engine(db_url, echo, connect_args, sqlite_pragmas, engine_options)
+            _engines[key] = engine
+    return engine
+
+
+def _new_engine(db_url, echo, connect_args, sqlite_pragmas, engine_options) -> Engine:
+    engine = create_engine(
+        db_url, echo=echo, connect_args=connect_args or {}, **engine_options
+    )
+    set_sqlite_pragmas(engine, sqlite_pragmas or {})
+    return engine
+
+
+def dispose_engine(engine: Engine):
+    """Close the connections of a shared engine and remove it from the registry.
+
+    Needed before dropping a database, so that later calls to get_engine()
+    do not reuse connections to the dropped database.
+    Connections checked out by other users are not affected.
+
+    Args:
+        engine (Engine): engine to dispose, registered or not.
+    """
+    with _engines_lock:
+        for key in [k for k, e in _engines.items() if e is engine]:
+            del _engines[key]
+    engine.dispose()
+
+
+def dispose_engines():
+    """Close the connections of all shared engines and empty the registry.
+
+    Called at exit and when the web app shuts down.
+    """
+    with _engines_lock:
+        engines = list(_engines.values())
+        _engines.clear()
+    for engine in engines:
+        engine.dispose()
+
+
+def shared_engines() -> list[Engine]:
+    """Return the engines currently in the registry"""
+    with _engines_lock:
+        return list(_engines.values())
+
+
+# drivers for the asyncio extension of SQLAlchemy
+ASYNC_DRIVERS = {
+    "sqlite": "aiosqlite",
+    "postgresql": "asyncpg",
+}
+
+
+def async_database_url(db_url: str) -> str:
+    """Url of the asyncio driver for a database url.
+
+    Example::
+
+        async_database_url("sqlite:///db/timelink.sqlite")
+        -> "sqlite+aiosqlite:///db/timelink.sqlite"
+
+    Args:
+        db_url (str): database url, with or without a driver.
+
+    Raises:
+        ValueError: if there is no asyncio driver for the database.
+    """
+    url = make_url(db_url)
+    backend = url.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"No asyncio driver for {backend} databases")
+    return url.set(drivername=f"{backend}+{ASYNC_DRIVERS[backend]}").render_as_string(
+        hide_password=False
+    )
+
+
+def get_async_engine(
+    db_url: str, sqlite_pragmas: dict | None = None, **engine_options
+) -> "AsyncEngine":
+    """Return the shared asyncio engine for a url and options.
+
+    The url is converted to the asyncio driver, see async_database_url().
+    Needs the SQLAlchemy asyncio extension (greenlet) and the driver
+    (aiosqlite or asyncpg), installed with the ``async`` extra:
+    ``pip install timelink[async]``.
+
+    Args:
+        db_url (str): database url.
+        sqlite_pragmas (dict, optional): pragmas set on each new SQLite connection.
+        **engine_options: extra arguments to create_async_engine.
+
+    Returns:
+        AsyncEngine: the shared asyncio engine.
+
+    Raises:
+        ImportError: if the ``async`` extra is not installed.
+    """
+    async_url = async_database_url(db_url)
+    driver = ASYNC_DRIVERS[make_url(db_url).get_backend_name()]
+    # imported here, the asyncio extension and drivers are optional
+    try:
+        import greenlet  # noqa: F401
+        from sqlalchemy.ext.asyncio import create_async_engine
+
+        importlib.import_module(driver)
+    except ImportError as exc:
+        raise ImportError(
+            f"Async sessions require greenlet and {driver}. "
+            "Install them with 'pip install timelink[async]'."
+        ) from exc
+
+    key = _engine_key(async_url, False, None, sqlite_pragmas, engine_options)
+    with _engines_lock:
+        engine = _async_engines.get(key)
+        if engine is None:
+            engine = create_async_engine(async_url, **engine_options)
+            # connect events are set on the synchronous proxy
+            set_sqlite_pragmas(engine.sync_engine, sqlite_pragmas or {})
+            _async_engines[key] = engine
+    return engine
+
+
+async def dispose_async_engines():
+    """Close the connections of all shared asyncio engines.
+
+    Must be awaited in the event loop that used the engines,
+    e.g. when the web app shuts down.
+    """
+    with _engines_lock:
+        engines = list(_async_engines.values())
+        _async_engines.clear()
+    for engine in engines:
+        await engine.dispose()
+
+
+atexit.register(dispose_engines)
@@ -5,8 +5,14 @@ integrating a Timelink database with a Kleio server. It handles file imports,
 translation tracking, and synchronization between source files and the database.
 """
 
+import asyncio
+import io
 import logging
+import queue
+import threading
 import time
+from functools import partial
+from datetime import datetime, timezone
 from typing import List
 
 from pydantic import TypeAdapter
@@ -15,10 +21,16 @@ from timelink.api.models import KleioImportedFile
 from timelink.api.models.system import KleioImportedFileSchema
 from timelink.kleio import KleioFile, KleioServer, import_status_enum
 from timelink.kleio.importer import import_from_xml
+from timelink.kleio.kleio_handler import ImportCancelled
+from timelink.kleio.xml_source import XmlCache, xml_cache_key, xml_content_hash
 
 from .database_utils import get_import_status
 
 
+def _import_progress(progress, files_done, files_total, file_progress):
+    progress({"stage": "import", "files_done": files_done, "files_total": files_total, **file_progress})
+
+
 class DatabaseKleioMixin:
     """Methods for interaction with Kleio Server and file imports.
 
@@ -167,6 +179,41 @@ class DatabaseKleioMixin:
                 s = "No import report found"
         return s
 
+    def skip_if_unchanged(self, kfile: KleioFile, content_hash: str, match_path=False) -> bool:
+        """Mark a file as imported if its content did not change since the last import.
+
+        A new translation that produces the same xml, apart from the date of
+        translation, does not need to be imported again. The date of import
+        of the file is updated so that it is no longer reported as updated.
+
+        Args:
+            kfile (KleioFile): the file translated again.
+            content_hash (str): hash of the new xml, see
+                :func:`timelink.kleio.xml_source.xml_content_hash`.
+            match_path (bool, optional): If True, match by the full path stored
+                in the database. If False, match by filename only. Defaults to False.
+
+        Returns:
+            bool: True if the content is unchanged and the import can be skipped.
+        """
+        with self.session() as session:
+            if match_path:
+                condition = KleioImportedFile.path == kfile.path
+            else:
+                condition = KleioImportedFile.name == kfile.name
+            imported = session.query(KleioImportedFile).filter(condition).first()
+            if (
+                imported is None
+                or imported.imported is None  # noqa: W503
+                or imported.content_hash != content_hash  # noqa: W503
+            ):
+                return False
+            now = datetime.now(timezone.utc)
+            imported.imported = now
+            imported.imported_string = now.strftime("%Y-%m-%d %H:%M:%S %Z")
+            session.commit()
+        return True
+
     def update_from_sources(
         self,
         path=None,
@@ -177,6 +224,12 @@ class DatabaseKleioMixin:
         with_import_warnings=False,
         force=False,
         match_path=False,
+        prefetch=4,
+        xml_cache=None,
+        skip_unchanged=None,
+        incremental=False,
+        progress=None,
+        cancel_event=None,
     ):
         """Synchronize the database with source files using an attached Kleio server.
 
@@ -201,10 +254,37 @@ class DatabaseKleioMixin:
                 current status. Defaults to False.
             match_path (bool, optional): If True, match files by full path instead of
                 just filename. Defaults to False.
+            prefetch (int, optional): number of xml files downloaded concurrently,
+                ahead of the file being imported, see :meth:`prefetch_xml`.
+                If 0 each file is downloaded by the importer. Defaults to 4.
+            xml_cache (XmlCache | str, optional): cache, or cache directory, of
+                downloaded xml files, so that imports that fail can be retried
+                without downloading again. Defaults to None, no cache.
+            skip_unchanged (bool, optional): If True, files translated again whose
+                xml has the same content hash as the last import are not imported,
+                see :meth:`skip_if_unchanged`. Needs prefetch > 0: the importer
+                stores groups as it downloads a file, before its hash is known.
+                Defaults to None, True if prefetch > 0.
+            incremental (bool, optional): If True, sources already in the database
+                are updated entity by entity instead of deleted and inserted again,
+                keeping links of unchanged entities. Defaults to False.
+            progress (callable, optional): called with a dict with the stage
+                ("translate" or "import"), the files processing and queued
+                for translation or the files imported, and the progress of
+                the file being imported, see :meth:`KleioHandler.get_progress`.
+            cancel_event (threading.Event, optional): if set, the update stops
+                with ImportCancelled before the next file; files already
+                imported, and the file being imported, are kept.
 
         Raises:
-            ValueError: If no Kleio server is attached to the database.
+            ValueError: If no Kleio server is attached to the database,
+                or skip_unchanged is True with prefetch=0.
+            ImportCancelled: If cancel_event is set.
         """
+        if skip_unchanged is None:
+            skip_unchanged = prefetch > 0
+        elif skip_unchanged and prefetch <= 0:
+            raise ValueError("skip_unchanged needs prefetch > 0")
         logging.debug("Updating from sources")
         if self.kserver is None:
             raise ValueError("No kleio server attached to this database")
@@ -228,6 +308,12 @@ class DatabaseKleioMixin:
             qfiles = self.kserver.get_translations(path=path, recurse="yes", status="Q")
             # TODO: change to import as each translation finishes
             while len(pfiles) > 0 or len(qfiles) > 0:
+                if cancel_event is not None and cancel_event.is_set():
+                    raise ImportCancelled("Update from sources cancelled")
+                if progress is not None:
+                    progress(
+                        {"stage": "translate", "processing": len(pfiles), "queued": len(qfiles)}
+                    )
                 time.sleep(1)
 
                 pfiles = self.kserver.get_translations(path="", recurse="yes", status="P")
@@ -249,41 +335,195 @@ class DatabaseKleioMixin:
                     match_path=match_path,
                 )
 
-            for kfile in import_needed:
+            if prefetch > 0:
+                downloads = self.prefetch_xml(
+                    import_needed, max_concurrency=prefetch, xml_cache=xml_cache
+                )
+            else:
+                downloads = ((kfile, None) for kfile in import_needed)
+            for nfile, (kfile, xml) in enumerate(downloads):
                 kfile: KleioFile
+                if cancel_event is not None and cancel_event.is_set():
+                    raise ImportCancelled("Update from sources cancelled")
+                if progress is not None:
+                    file_progress = partial(
+                        _import_progress, progress, nfile, len(import_needed)
+                    )
+                    file_progress({"file": kfile.path})
+                else:
+                    file_progress = None
+                if (
+                    skip_unchanged
+                    and not force  # noqa: W503
+                    and isinstance(xml, bytes)  # noqa: W503
+                    and kfile.import_status == import_status_enum.U  # noqa: W503
+                    and self.skip_if_unchanged(  # noqa: W503
+                        kfile, xml_content_hash(xml), match_path=match_path
+                    )
+                ):
+                    logging.info("Skipping %s, content unchanged", kfile.path)
+                    continue
                 with self.session() as session:
                     try:
                         logging.info("Importing %s", kfile.path)
-                        stats = import_from_xml(
-                            kfile.xml_url,
-                            session=session,
-                            options={
+                        if isinstance(xml, Exception):
+                            raise xml
+                        if xml is not None:
+                            source = io.BytesIO(xml)
+                            options = {
+                                "return_stats": True,
+                                "mode": "TL",
+                                "incremental": incremental,
+                                "progress": file_progress,
+                                "cancel_event": cancel_event,
+                            }
+                        else:
+                            source = kfile.xml_url
+                            options = {
                                 "return_stats": True,
                                 "kleio_token": self.kserver.get_token(),
                                 "kleio_url": self.kserver.get_url(),
                                 "mode": "TL",
-                            },
-                        )
+                                "xml_cache": xml_cache,
+                                "cache_key": xml_cache_key(kfile),
+                                "incremental": incremental,
+                                "progress": file_progress,
+                                "cancel_event": cancel_event,
+                            }
+                        stats = import_from_xml(source, session=session, options=options)
                         logging.debug("Imported %s: %s", kfile.path, stats)
-                        time.sleep(1)
+                        if xml is None:
+                            # pause between downloads from the Kleio server,
+                            # prefetched files were downloaded already
+                            time.sleep(1)
+                    except ImportCancelled:
+                        session.rollback()
+                        raise
                     except Exception as e:
                         session.rollback()
                         logging.error("Unexpected error:")
                         logging.error("Error: %s", e)
                         continue
+            # refresh the sources just imported in materialized views
+            self.refresh_materialized_views()
+
+    def prefetch_xml(
+        self, kfiles: List[KleioFile], max_concurrency=4, kserver=None, xml_cache=None
+    ):
+        """Download the xml of Kleio files ahead of their use
+
+        Downloads run concurrently in a background thread with an
+        :class:`timelink.kleio.AsyncKleioServer`, so that network transfers
+        overlap with the processing of the files already downloaded.
+        At most 2 * max_concurrency files are kept in memory.
+
+        Args:
+            kfiles (List[KleioFile]): files to download
+            max_concurrency (int): maximum number of downloads in flight
+            kserver (KleioServer, optional): defaults to the attached server
+            xml_cache (XmlCache | str, optional): files found in the cache are
+                not downloaded, downloaded files are added to it
+
+        Yields:
+            tuple[KleioFile, bytes | Exception]: each file, in the order given,
+                with its xml or the exception raised downloading it
+        """
+        from timelink.kleio.async_kleio_server import AsyncKleioServer
 
-    def import_from_xml(self, file: str | KleioFile, kserver=None, return_stats=True):
+        if kserver is None:
+            kserver = self.kserver
+        if xml_cache is not None and not isinstance(xml_cache, XmlCache):
+            xml_cache = XmlCache(xml_cache)
+        # files downloaded, waiting for the consumer
+        downloaded = queue.Queue(maxsize=max_concurrency)
+        stop = threading.Event()
+
+        async def download_all():
+            async with AsyncKleioServer.from_server(
+                kserver, max_concurrency=max_concurrency
+            ) as aks:
+
+                async def download(kfile):
+                    try:
+                        if xml_cache is None:
+                            return await aks.get_xml(kfile)
+                        key = xml_cache_key(kfile)
+                        cached = xml_cache.get(key)
+                        if cached is not None:
+                            return await asyncio.to_thread(cached.read_bytes)
+                        xml = await aks.get_xml(kfile)
+                        await asyncio.to_thread(xml_cache.put, key, xml)
+                        return xml
+                    except Exception as exc:  # reported to the consumer
+                        return exc
+
+                pending = []
+                for kfile in kfiles:
+                    pending.append((kfile, asyncio.ensure_future(download(kfile))))
+                    # keep a window of downloads in flight
+                    if len(pending) >= max_concurrency:
+                        if not await put(*pending.pop(0)):
+                            return
+                for kfile, task in pending:
+                    if not await put(kfile, task):
+                        return
+
+        async def put(kfile, task) -> bool:
+            result = await task
+            while not stop.is_set():
+                try:
+                    downloaded.put_nowait((kfile, result))
+                    return True
+                except queue.Full:
+                    # consumer is busy, other downloads go on meanwhile
+                    await asyncio.sleep(0.05)
+            return False
+
+        def run():
+            try:
+                asyncio.run(download_all())
+            finally:
+                downloaded.put(None)
+
+        thread = threading.Thread(target=run, daemon=True, name="timelink-prefetch")
+        thread.start()
+        try:
+            while True:
+                item = downloaded.get()
+                if item is None:
+                    break
+                yield item
+        finally:
+            stop.set()
+            # unblock the producer if the consumer stopped early
+            while thread.is_alive():
+                try:
+                    downloaded.get(timeout=0.1)
+                except queue.Empty:
+                    pass
+
+    def import_from_xml(
+        self,
+        file: str | KleioFile,
+        kserver=None,
+        return_stats=True,
+        xml_cache=None,
+        incremental=False,
+    ):
         """Import one file
 
         Args:
            file (str | KleioFile): path to xml file or KleioFile object
             kserver (KleioServer, optional): Kleio server to use for import. Defaults to None.
             return_stats (bool, optional): Return import stats. Defaults to True.
+            xml_cache (XmlCache | str, optional): cache of downloaded xml files,
+                only for a KleioFile. Defaults to None.
+            incremental (bool, optional): write only new, changed and removed
+                entities of sources already imported. Defaults to False.
         """
-        if isinstance(file, KleioFile):
-            path = file.xml_url
-        else:
-            path = file
+        if xml_cache is not None and not isinstance(file, KleioFile):
+            # the cached copy is kept by translation date, see xml_cache_key()
+            raise ValueError("xml_cache requires a KleioFile, not a path")
 
         if kserver is None:
             kserver = self.kserver
@@ -294,16 +534,19 @@ class DatabaseKleioMixin:
         with self.session() as session:
             try:
                 stats = import_from_xml(
-                    path,
+                    file,
                     session=session,
                     options={
                         "return_stats": return_stats,
                         "kleio_token": kserver.get_token(),
                         "kleio_url": kserver.get_url(),
                         "mode": "TL",
+                        "xml_cache": xml_cache,
+                        "incremental": incremental,
                     },
                 )
             except Exception as e:
                 session.rollback()
                 logging.error(f"Error importing XML: {e}")
+        self.refresh_materialized_views()
         return stats
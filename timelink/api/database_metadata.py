@@ -5,7 +5,10 @@ inspecting database structure, metadata, and SQLAlchemy ORM models. It includes
 utilities for listing tables, views, and columns, as well as mapping between
 database tables and ORM classes.
 """
+import hashlib
+import logging
 from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
 from typing import List
 
 from sqlalchemy import (
@@ -18,12 +21,20 @@ from sqlalchemy import (
 from sqlalchemy.orm import aliased
 from sqlalchemy.sql.selectable import TableClause
 
+from timelink import migrations
 from timelink.api.models import (
     Entity,
+    PomClassAttributes,
+    PomSomMapper,
+    SysPar,
     pom_som_base_mappings,
 )
 from timelink.api.models.base_class import Base, get_all_base_subclasses
 
+from . import views
+
+SCHEMA_FINGERPRINT = "schema_fingerprint"
+
 
 class DatabaseMetadataMixin:
     """Methods for database inspection and metadata management.
@@ -45,6 +56,72 @@ class DatabaseMetadataMixin:
             version = result.scalar()
         return version
 
+    def schema_fingerprint(self, session=None) -> str:
+        """Compute a fingerprint of the database schema.
+
+        The fingerprint combines the most recent migration available,
+        the classes and class attributes stored in the database, and the
+        SQL of the views defined in self.views. If it matches the stored
+        fingerprint, opening the database can skip migrations, view
+        rebuilds and reflection.
+
+        Args:
+            session (Session, optional): session to use; a new one if None.
+
+        Returns:
+            str: hex digest
+        """
+        if session is None:
+            with self.session() as session:
+                return self.schema_fingerprint(session)
+
+        classes = PomSomMapper.__table__
+        class_attributes = PomClassAttributes.__table__
+        digest = hashlib.sha256()
+        digest.update(str(migrations.head_revision()).encode())
+        for row in session.execute(select(classes).order_by(classes.c.id)):
+            digest.update(repr(tuple(row)).encode())
+        for row in session.execute(
+            select(class_attributes).order_by(
+                class_attributes.c.the_class, class_attributes.c.name
+            )
+        ):
+            digest.update(repr(tuple(row)).encode())
+        for view_name in sorted(self.views):
+            sql = views.view_sql(self.views[view_name], self.engine.dialect)
+            digest.update(sql.encode())
+        return digest.hexdigest()
+
+    def get_schema_fingerprint(self) -> str | None:
+        """Return the schema fingerprint stored in the database, or None"""
+        try:
+            with self.session() as session:
+                syspar = session.get(SysPar, SCHEMA_FINGERPRINT)
+                return None if syspar is None else syspar.pvalue
+        except Exception as exc:
+            logging.debug(f"Could not read schema fingerprint: {exc}")
+            return None
+
+    def store_schema_fingerprint(self, fingerprint: str | None = None):
+        """Store the current schema fingerprint in the syspar table
+
+        Args:
+            fingerprint (str, optional): fingerprint to store; computed if None.
+        """
+        with self.session() as session:
+            if fingerprint is None:
+                fingerprint = self.schema_fingerprint(session)
+            session.merge(
+                SysPar(
+                    pname=SCHEMA_FINGERPRINT,
+                    pvalue=fingerprint,
+                    ptype="string",
+                    obs="Hash of migrations, classes and views, see schema_fingerprint()",
+                )
+            )
+            session.commit()
+        return fingerprint
+
     def db_table_names(self):
         """Return the names of all tables currently present in the database.
 
@@ -126,7 +203,13 @@ class DatabaseMetadataMixin:
         return inspector.get_view_names()
 
     def get_view(self, view_name: str):
-        """Get a view by name"""
+        """Get a view by name
+
+        If the view is materialized (see materialize_views()),
+        its shadow table is returned instead.
+        """
+        if view_name in self.materialized_views:
+            return self.get_materialized_view(view_name)
         return self.views[view_name]
 
     def get_view_columns(self, view_name: str):
@@ -134,25 +217,101 @@ class DatabaseMetadataMixin:
         view = self.get_view(view_name)
         return list(view.columns)
 
-    def table_row_count(self) -> List[tuple[str, int]]:
+    def table_row_count(
+        self, estimate: bool = False, parallel: bool = False, max_workers: int = 4
+    ) -> List[tuple[str, int]]:
         """Count the number of rows in each table in the database.
 
+        Exact counts scan every table. With estimate=True the counts are
+        taken from the statistics kept by the database: pg_class.reltuples
+        in PostgreSQL, sqlite_stat1 in SQLite (updated by ANALYZE).
+        Tables without statistics are counted exactly.
+
+        Args:
+            estimate (bool): use the database statistics instead of counting.
+            parallel (bool): run exact counts concurrently, each in its own
+                connection from the engine pool. Ignored for in-memory SQLite.
+            max_workers (int): maximum number of concurrent counts; should not
+                exceed the size of the connection pool.
+
         Returns:
             List[tuple[str, int]]: A list of tuples containing (table_name, row_count).
         """
 
         tables_names = self.db_table_names()
 
-        row_count = []
-        with self.session() as session:
-            for table in tables_names:
-                length = session.scalar(
-                    select(func.count()).select_from(  # pylint: disable=not-callable
-                        text(table)
-                    )  # pylint: disable=not-callable
-                )  # pylint: disable=not-callable
-                row_count.append((table, length))
-        return row_count
+        counts = {}
+        if estimate:
+            with self.engine.connect() as connection:
+                counts = self._estimated_row_counts(connection)
+            counts = {t: c for t, c in counts.items() if t in tables_names}
+
+        to_count = [table for table in tables_names if table not in counts]
+        in_memory = self.engine.url.database in (None, "", ":memory:")
+        if parallel and len(to_count) > 1 and not in_memory:
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                exact = executor.map(self._count_table_rows, to_count)
+                counts.update(zip(to_count, exact))
+        elif to_count:
+            with self.engine.connect() as connection:
+                for table in to_count:
+                    counts[table] = self._count_rows(connection, table)
+
+        return [(table, counts[table]) for table in tables_names]
+
+    def _count_table_rows(self, table_name: str) -> int:
+        """Count the rows of a table in a new connection"""
+        with self.engine.connect() as connection:
+            return self._count_rows(connection, table_name)
+
+    @staticmethod
+    def _count_rows(connection, table_name: str) -> int:
+        return connection.scalar(
+            select(func.count()).select_from(  # pylint: disable=not-callable
+                text(table_name)
+            )
+        )
+
+    @staticmethod
+    def _estimated_row_counts(connection) -> dict:
+        """Estimated row counts from the database statistics
+
+        Returns:
+            dict: table name: estimated rows, only for tables with statistics
+        """
+        dialect_name = connection.dialect.name
+        if dialect_name == "postgresql":
+            # reltuples is -1 for tables never vacuumed or analyzed
+            rows = connection.execute(
+                text(
+                    "SELECT c.relname, c.reltuples::bigint FROM pg_class c "
+                    "JOIN pg_namespace n ON n.oid = c.relnamespace "
+                    "WHERE n.nspname = current_schema() "
+                    "AND c.relkind IN ('r', 'p') AND c.reltuples >= 0"
+                )
+            )
+            return {name: count for name, count in rows}
+        if dialect_name == "sqlite":
+            has_stats = connection.scalar(
+                text(
+                    "SELECT count(*) FROM sqlite_master "
+                    "WHERE type = 'table' AND name = 'sqlite_stat1'"
+                )
+            )
+            if not has_stats:
+                return {}
+            counts = {}
+            # one row per index of the table (idx is NULL for tables without
+            # indexes), stat starts with the number of rows in the index;
+            # partial indexes have fewer rows, keep the largest
+            for table_name, stat in connection.execute(
+                text("SELECT tbl, stat FROM sqlite_stat1")
+            ):
+                if stat:
+                    rows = int(stat.split()[0])
+                    counts[table_name] = max(rows, counts.get(table_name, 0))
+            return counts
+        return {}
 
     def get_models_ids(self):
         """Get the ORM model classes as a list of ids
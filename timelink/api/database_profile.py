@@ -0,0 +1,322 @@
+"""Statement counts and slow queries of a block of code.
+
+This module provides the DatabaseProfileMixin class, with the method
+``profile()`` of TimelinkDatabase, and the QueryProfiler it returns.
+The profiler listens to the cursor events of the database engine and
+aggregates the statements executed by normalized statement: parameter
+values, literals and the expanded lists of IN clauses are replaced by
+placeholders, so that the same query with different values counts as
+one statement.
+
+A statement executed many times with different parameters is usually
+a query inside a loop, e.g. loading related objects one by one (N+1);
+these are reported by :meth:`QueryProfiler.n_plus_one`. Statements
+slower than a threshold are logged, optionally with their query plan.
+
+Example::
+
+    with db.profile(slow_seconds=0.5, explain=True) as p:
+        df = entities_with_attribute("residencia", db=db)
+    print(p.report())
+
+    @db.profile()
+    def load(...):
+        ...
+
+By default only the statements of the thread that entered the profiler
+are counted, so that a web request is not mixed with the others served
+by the same engine.
+
+The profiler listens to the engine, not to a database object. Database
+objects with the same url share the engine (see
+:mod:`timelink.api.database_engine`), so the statements of all of them
+executed in the profiled thread are counted.
+"""
+
+import logging
+import re
+import threading
+import time
+from contextlib import ContextDecorator
+from dataclasses import dataclass, field
+
+from sqlalchemy import event
+
+# statements repeated this number of times with different parameters
+# are reported as N+1
+N_PLUS_ONE_THRESHOLD = 10
+
+_WHITESPACE = re.compile(r"\s+")
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"(?<![\w.$])-?\d+(?:\.\d+)?\b")
+# placeholders of the drivers: ?, %s, %(name)s, :name, $1
+_PLACEHOLDER = r"(?:\?|%s|%\(\w+\)s|:\w+|\$\d+)"
+_PLACEHOLDER_LIST = re.compile(rf"\(\s*{_PLACEHOLDER}(?:\s*,\s*{_PLACEHOLDER})*\s*\)")
+_PARAMETER_NAME = re.compile(r"%\((\w+?)(?:_\d+)*\)s")
+
+
+def normalize_statement(statement: str) -> str:
+    """Replace literals and lists of placeholders, collapse whitespace
+
+    Example::
+
+        >>> normalize_statement("SELECT * FROM entities WHERE id IN (?, ?, ?) LIMIT 10")
+        'SELECT * FROM entities WHERE id IN (?...) LIMIT ?'
+    """
+    statement = _WHITESPACE.sub(" ", statement).strip()
+    statement = _STRING_LITERAL.sub("?", statement)
+    statement = _NUMBER_LITERAL.sub("?", statement)
+    # expanded IN parameters are numbered, e.g. %(id_1_1)s, %(id_1_2)s
+    statement = _PARAMETER_NAME.sub(r"%(\1)s", statement)
+    return _PLACEHOLDER_LIST.sub("(?...)", statement)
+
+
+@dataclass
+class StatementStats:
+    """Executions of a normalized statement"""
+
+    statement: str
+    count: int = 0
+    seconds: float = 0.0
+    max_seconds: float = 0.0
+    # distinct parameters, up to the N+1 threshold
+    parameters: set = field(default_factory=set)
+
+    def as_dict(self) -> dict:
+        return {
+            "statement": self.statement,
+            "count": self.count,
+            "seconds": self.seconds,
+            "max_seconds": self.max_seconds,
+            "distinct_parameters": len(self.parameters),
+        }
+
+
+class QueryProfiler(ContextDecorator):
+    """Count and time the statements executed by an engine
+
+    Use as a context manager or as a decorator; statements of all the
+    blocks profiled with the same profiler add up.
+
+    Args:
+        engine (Engine): the engine to profile
+        slow_seconds (float): statements slower than this are logged
+            and kept in ``slow``, None for no limit
+        explain (bool): log the query plan of slow SELECT statements
+        n_plus_one (int): repetitions with different parameters that make
+            a statement an N+1 pattern
+        all_threads (bool): count the statements of all threads, not only
+            of the thread that entered the profiler
+        log_report (bool): log the report when the profiler exits
+
+    Attributes:
+        statements (dict): StatementStats by normalized statement
+        slow (list): (statement, parameters, seconds, plan) of the slow
+            statements, plan is None unless explain is True
+    """
+
+    def __init__(
+        self,
+        engine,
+        slow_seconds: float | None = None,
+        explain: bool = False,
+        n_plus_one: int = N_PLUS_ONE_THRESHOLD,
+        all_threads: bool = False,
+        log_report: bool = False,
+    ):
+        self.engine = engine
+        self.slow_seconds = slow_seconds
+        self.explain = explain
+        self.n_plus_one_threshold = n_plus_one
+        self.all_threads = all_threads
+        self.log_report = log_report
+        self.statements: dict[str, StatementStats] = {}
+        self.slow: list[tuple] = []
+        self._lock = threading.Lock()
+        self._depth = 0
+        self._thread = None
+
+    def __enter__(self):
+        with self._lock:
+            self._depth += 1
+            if self._depth == 1:
+                self._thread = threading.get_ident()
+                event.listen(self.engine, "before_cursor_execute", self._before_execute)
+                event.listen(self.engine, "after_cursor_execute", self._after_execute)
+        return self
+
+    def __exit__(self, *exc):
+        with self._lock:
+            self._depth -= 1
+            done = self._depth == 0
+            if done:
+                event.remove(self.engine, "before_cursor_execute", self._before_execute)
+                event.remove(self.engine, "after_cursor_execute", self._after_execute)
+        if done and self.log_report:
+            logging.info(self.report())
+        return False
+
+    def _profiled(self) -> bool:
+        return self.all_threads or threading.get_ident() == self._thread
+
+    def _before_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if self._profiled():
+            conn.info.setdefault("timelink_profile_start", []).append(time.perf_counter())
+
+    def _after_execute(self, conn, cursor, statement, parameters, context, executemany):
+        starts = conn.info.get("timelink_profile_start")
+        if not self._profiled() or not starts:
+            return
+        seconds = time.perf_counter() - starts.pop()
+        normalized = normalize_statement(statement)
+        with self._lock:
+            stats = self.statements.get(normalized)
+            if stats is None:
+                stats = self.statements[normalized] = StatementStats(normalized)
+            stats.count += 1
+            stats.seconds += seconds
+            stats.max_seconds = max(stats.max_seconds, seconds)
+            if len(stats.parameters) < self.n_plus_one_threshold:
+                stats.parameters.add(repr(parameters))
+        if self.slow_seconds is not None and seconds >= self.slow_seconds:
+            plan = None
+            if self.explain and not executemany:
+                plan = self._explain(conn, statement, parameters)
+            with self._lock:
+                self.slow.append((statement, parameters, seconds, plan))
+            logging.warning(
+                f"Slow statement ({seconds:.3f}s): {normalized}"
+                + (f"\nPlan:\n{plan}" if plan else "")
+            )
+
+    def _explain(self, conn, statement, parameters) -> str | None:
+        """Query plan of a SELECT statement, None for other statements"""
+        if not statement.lstrip().upper().startswith(("SELECT", "WITH")):
+            return None
+        if conn.dialect.name == "sqlite":
+            explain = "EXPLAIN QUERY PLAN "
+        elif conn.dialect.name == "postgresql":
+            explain = "EXPLAIN "
+        else:
+            return None
+        # in PostgreSQL a failed statement aborts the transaction of the
+        # caller, the plan is asked inside a savepoint
+        savepoint = conn.dialect.name == "postgresql" and not getattr(
+            conn.connection.dbapi_connection, "autocommit", False
+        )
+        # the dbapi cursor does not fire the engine events
+        cursor = conn.connection.cursor()
+        try:
+            if savepoint:
+                cursor.execute("SAVEPOINT timelink_explain")
+            try:
+                cursor.execute(explain + statement, parameters)
+                rows = cursor.fetchall()
+            except Exception as exc:  # the plan is informative, never fail the query
+                logging.debug(f"Could not explain statement: {exc}")
+                if savepoint:
+                    cursor.execute("ROLLBACK TO SAVEPOINT timelink_explain")
+                return None
+            finally:
+                if savepoint:
+                    cursor.execute("RELEASE SAVEPOINT timelink_explain")
+        finally:
+            cursor.close()
+        return "\n".join(" ".join(str(column) for column in row) for row in rows)
+
+    @property
+    def count(self) -> int:
+        """Statements executed"""
+        return sum(stats.count for stats in self.statements.values())
+
+    @property
+    def seconds(self) -> float:
+        """Time spent executing statements"""
+        return sum(stats.seconds for stats in self.statements.values())
+
+    def n_plus_one(self) -> list[StatementStats]:
+        """Statements repeated with different parameters, most executed first"""
+        return sorted(
+            (
+                stats
+                for stats in self.statements.values()
+                if stats.count >= self.n_plus_one_threshold
+                and len(stats.parameters) > 1  # noqa: W503
+            ),
+            key=lambda stats: stats.count,
+            reverse=True,
+        )
+
+    def top(self, n: int = 10) -> list[StatementStats]:
+        """The n statements with more time spent executing them"""
+        return sorted(self.statements.values(), key=lambda stats: stats.seconds, reverse=True)[:n]
+
+    def reset(self):
+        """Forget the statements profiled so far"""
+        with self._lock:
+            self.statements = {}
+            self.slow = []
+
+    def as_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "seconds": self.seconds,
+            "statements": [stats.as_dict() for stats in self.top(len(self.statements))],
+            "n_plus_one": [stats.statement for stats in self.n_plus_one()],
+            "slow": len(self.slow),
+        }
+
+    def report(self, top: int = 10) -> str:
+        """Summary of the statements executed, as text"""
+        lines = [f"{self.count} statements in {self.seconds:.3f}s"]
+        for stats in self.top(top):
+            lines.append(
+                f"{stats.count:>6} {stats.seconds:>9.3f}s  max {stats.max_seconds:.3f}s  "
+                f"{stats.statement[:200]}"
+            )
+        for stats in self.n_plus_one():
+            lines.append(f"N+1: {stats.count} executions of {stats.statement[:200]}")
+        if self.slow:
+            lines.append(f"{len(self.slow)} slow statements")
+        return "\n".join(lines)
+
+
+class DatabaseProfileMixin:
+    """Profiling of the statements executed on the database."""
+
+    def profile(
+        self,
+        slow_seconds: float | None = None,
+        explain: bool = False,
+        n_plus_one: int = N_PLUS_ONE_THRESHOLD,
+        all_threads: bool = False,
+        log_report: bool = False,
+    ) -> QueryProfiler:
+        """Count and time the statements executed in a block or function
+
+        Returns a :class:`QueryProfiler`, to use as a context manager
+        or decorator::
+
+            with db.profile() as p:
+                db.get_entity("deh-jose-soares")
+            print(p.count, p.n_plus_one())
+
+        Statements are counted by engine: those of other database objects
+        with the same url, which share the engine, are counted too.
+
+        Args:
+            slow_seconds (float): log statements slower than this
+            explain (bool): also log the query plan of slow SELECT statements
+            n_plus_one (int): repetitions with different parameters
+                reported as N+1, default 10
+            all_threads (bool): profile statements of all threads
+            log_report (bool): log the report at the end of the block
+        """
+        return QueryProfiler(
+            self.engine,
+            slow_seconds=slow_seconds,
+            explain=explain,
+            n_plus_one=n_plus_one,
+            all_threads=all_threads,
+            log_report=log_report,
+        )
@@ -8,7 +8,6 @@ Kleio format.
 import logging
 from typing import List
 
-import pandas as pd
 from pydantic import BaseModel
 from sqlalchemy import (
     select,
@@ -67,6 +66,9 @@ class DatabaseQueryMixin:
                 "sql must be a Select statement or a string with a valid select statement"
             )
 
+        if as_dataframe:
+            import pandas as pd
+
         if session is None:
             with self.session() as session:
                 try:
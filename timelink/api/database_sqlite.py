@@ -8,6 +8,9 @@ Functions:
     get_sqlite_databases(directory_path: str, relative_path: bool = True) -> list[str]:
         Search for and list SQLite databases in a specified directory.
 
+    scan_sqlite_databases(directory_path: str) -> tuple[list[str], dict[str, int]]:
+        List SQLite databases and the modification time of the directories scanned.
+
     get_sqlite_url(db_path: str) -> str:
         Construct an SQLAlchemy SQLite connection URL for a given file path.
 """
@@ -30,18 +33,68 @@ def get_sqlite_databases(directory_path: str, relative_path=True) -> list[str]:
         list[str]: List of SQLite database file paths.
     """
     cd = os.getcwd()
-    sqlite_databases = []
-    for root, _dirs, files in os.walk(directory_path):
-        for file_name in files:
-            if file_name.endswith(".sqlite") or file_name.endswith(".db"):
-                db_path = os.path.join(root, file_name)
-                # path relative to cd
-                if relative_path:
-                    db_path = os.path.relpath(db_path, cd)
-                sqlite_databases.append(db_path)
+    sqlite_databases, _directories = scan_sqlite_databases(directory_path)
+    if relative_path:
+        # path relative to cd
+        sqlite_databases = [os.path.relpath(db, cd) for db in sqlite_databases]
     return sqlite_databases
 
 
+def scan_sqlite_databases(directory_path: str) -> tuple[list[str], dict[str, int]]:
+    """List SQLite database files and the directories scanned.
+
+    Besides the database files, returns the modification time of each
+    directory in the tree. Adding, removing or renaming a file or
+    subdirectory changes the modification time of the directory that
+    contains it, so the list is still valid while those times are
+    unchanged, which can be checked without listing the directories.
+
+    Args:
+        directory_path (str): Directory path to search for SQLite databases.
+
+    Returns:
+        tuple[list[str], dict[str, int]]: paths of the SQLite database files
+            and a dictionary with the modification time in nanoseconds of each
+            directory scanned.
+    """
+    sqlite_databases = []
+    directories = {}
+    pending = [directory_path]
+    while pending:
+        current = pending.pop()
+        try:
+            # modification time before listing, a change during the
+            # listing will show as a different time later
+            directories[current] = os.stat(current).st_mtime_ns
+            entries = list(os.scandir(current))
+        except OSError:
+            continue
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                pending.append(entry.path)
+            elif entry.name.endswith(".sqlite") or entry.name.endswith(".db"):
+                sqlite_databases.append(entry.path)
+    return sqlite_databases, directories
+
+
+def sqlite_directories_unchanged(directories: dict[str, int]) -> bool:
+    """Check if directories returned by scan_sqlite_databases are unchanged.
+
+    Args:
+        directories (dict[str, int]): directory modification times,
+            as returned by scan_sqlite_databases.
+
+    Returns:
+        bool: True if all directories exist and have the same modification time.
+    """
+    try:
+        return all(
+            os.stat(path).st_mtime_ns == mtime for path, mtime in directories.items()
+        )
+    except OSError:
+        return False
+
+
 def get_sqlite_url(db_path: str) -> str:
     """Construct an SQLAlchemy SQLite connection URL for a given file path.
 
@@ -6,8 +6,20 @@ core tables to provide simplified access to complex relational data, such
 as attributes with entity names, functions in acts, and named entity relationships.
 """
 
+import hashlib
+import logging
+from datetime import datetime
+
 from sqlalchemy import (
+    Column,
+    Index,
     MetaData,
+    String,
+    Table,
+    delete,
+    func,
+    insert,
+    inspect,
     select,
     union,
 )
@@ -17,6 +29,7 @@ from timelink.api.models import (
     Attribute,
     Entity,
     Person,
+    SysPar,
 )
 from timelink.api.models.act import Act
 from timelink.api.models.geoentity import Geoentity
@@ -25,6 +38,26 @@ from timelink.mhk.models.relation import Relation
 
 from . import views
 
+# prefix of the syspar entries with the hash of the SQL of each view
+VIEW_HASH_PREFIX = "view_hash."
+
+# Views that can be materialized in shadow tables.
+# For each view: the column with the id of the entity whose source
+# the row belongs to, and the columns to index in the shadow table.
+MATERIALIZED_VIEWS = {
+    "named_entities": ("id", [["name"], ["groupname"], ["pom_class"]]),
+    "nattributes": ("attr_id", [["id"], ["the_type", "the_value"]]),
+    "eattributes": ("attr_id", [["entity"], ["the_type", "the_value"]]),
+    "nfunctions": ("id", [["id_act"]]),
+    "nrelations": (
+        "relation_id",
+        [["origin_id"], ["destination_id"], ["relation_type", "relation_value"]],
+    ),
+}
+MATERIALIZED_PREFIX = "mv_"
+# syspar entry with the most recent entities.updated in the shadow tables
+MATERIALIZED_REFRESHED = "materialized_views_refreshed"
+
 
 class DatabaseViewsMixin:
     """Methods for creating and managing database views.
@@ -33,6 +66,230 @@ class DatabaseViewsMixin:
     used within the Timelink information system.
     """
 
+    def view_hash(self, view_name: str) -> str:
+        """Return a hash of the SQL of a view compiled for this database"""
+        sql = views.view_sql(self.views[view_name], self.engine.dialect)
+        return hashlib.sha256(sql.encode()).hexdigest()
+
+    def get_view_hashes(self) -> dict:
+        """Return the view hashes stored in the database, keyed by view name"""
+        try:
+            with self.session() as session:
+                rows = session.scalars(
+                    select(SysPar).where(SysPar.pname.startswith(VIEW_HASH_PREFIX))
+                )
+                return {
+                    row.pname[len(VIEW_HASH_PREFIX):]: row.pvalue for row in rows
+                }
+        except Exception as exc:
+            logging.debug(f"Could not read view hashes: {exc}")
+            return {}
+
+    def _replace_view(self, view_name: str):
+        """Create or replace a view with its current definition
+
+        Uses CREATE OR REPLACE VIEW where available. If that fails
+        (PostgreSQL does not allow changing the columns of a view)
+        or is not supported, the view is dropped and created again.
+        On PostgreSQL dropping cascades to dependent views, which
+        must be recreated by the caller.
+
+        Returns:
+            bool: True if the view was dropped, False if it was replaced
+        """
+        view = self.views[view_name]
+        create = views.CreateView(view_name, view.definition, or_replace=True)
+        dialect_name = self.engine.dialect.name
+        if dialect_name in views.OR_REPLACE_DIALECTS:
+            try:
+                with self.engine.begin() as connection:
+                    connection.execute(create)
+                return False
+            except Exception as exc:
+                logging.info(f"Could not replace view {view_name}, recreating: {exc}")
+        with self.engine.begin() as connection:
+            dropped = view_name in inspect(connection).get_view_names()
+            if dropped:
+                connection.execute(views.DropView(view_name))
+            connection.execute(create)
+        return dropped
+
+    def _update_views(self):
+        """Create or replace the views whose SQL changed.
+
+        The hash of the SQL of each view is stored in syspar. Views
+        that exist in the database with an unchanged hash are left alone,
+        so opening a database with current views issues no DDL.
+        """
+        self._define_views()
+        stored = self.get_view_hashes()
+        changed = {}
+        existing = set(self.view_names())
+        dropped = False
+        # self.views is in dependency order, named_entities first
+        for view_name in self.views:
+            current = self.view_hash(view_name)
+            if view_name in existing and stored.get(view_name) == current:
+                continue
+            logging.debug(f"Updating view {view_name}")
+            dropped = self._replace_view(view_name) or dropped
+            existing.add(view_name)
+            changed[view_name] = current
+        if dropped:
+            # views dropped by a cascade must be recreated
+            existing = set(self.view_names())
+            for view_name in self.views:
+                if view_name not in existing:
+                    self._replace_view(view_name)
+                    changed[view_name] = self.view_hash(view_name)
+        if changed:
+            with self.session() as session:
+                for view_name, current in changed.items():
+                    session.merge(
+                        SysPar(
+                            pname=VIEW_HASH_PREFIX + view_name,
+                            pvalue=current,
+                            ptype="string",
+                            obs=f"Hash of the SQL of view {view_name}",
+                        )
+                    )
+                session.commit()
+
+    def _materialized_table(self, view_name: str) -> Table:
+        """Return the shadow table definition for a view"""
+        view = self.views[view_name]
+        key_column, indexes = MATERIALIZED_VIEWS[view_name]
+        table_name = MATERIALIZED_PREFIX + view_name
+        metadata = self.materialized_metadata
+        if table_name in metadata.tables:
+            return metadata.tables[table_name]
+        return Table(
+            table_name,
+            metadata,
+            *(Column(c.name, c.type) for c in view.columns),
+            Column("the_source", String),
+            Index(f"ix_{table_name}_{key_column}", key_column),
+            Index(f"ix_{table_name}_the_source", "the_source"),
+            *(Index(f"ix_{table_name}_{'_'.join(cols)}", *cols) for cols in indexes),
+        )
+
+    def _load_materialized_views(self):
+        """Use the shadow tables of views materialized in this database"""
+        self.materialized_views = dict()
+        existing = set(self.db_table_names())
+        for view_name in MATERIALIZED_VIEWS:
+            table = self._materialized_table(view_name)
+            if table.name in existing:
+                self.materialized_views[view_name] = table
+
+    def materialize_views(self, view_names: list[str] | None = None):
+        """Materialize views in shadow tables
+
+        Shadow tables are plain tables named mv_<view> with the rows of the view,
+        the source of each row and indexes for common filters. Once materialized,
+        get_view() returns the shadow table, so the helpers in timelink.pandas
+        and timelink.networks use it without changes.
+
+        Shadow tables are refreshed per source after imports made with
+        update_from_sources() and import_from_xml() of this class; after
+        other changes call refresh_materialized_views(). get_view() only
+        reads, it does not refresh. The choice is stored in the database.
+
+        Shadow tables are used instead of PostgreSQL materialized views
+        because those can only be refreshed as a whole.
+
+        Args:
+            view_names: views to materialize, default all in MATERIALIZED_VIEWS.
+        """
+        self._define_views()
+        if view_names is None:
+            view_names = list(MATERIALIZED_VIEWS)
+        for view_name in view_names:
+            if view_name not in MATERIALIZED_VIEWS:
+                raise ValueError(f"View {view_name} can not be materialized")
+            table = self._materialized_table(view_name)
+            table.create(self.engine, checkfirst=True)
+            self.materialized_views[view_name] = table
+        self.refresh_materialized_views(full=True)
+
+    def drop_materialized_views(self):
+        """Drop the shadow tables, get_view() returns the views again"""
+        for table in self.materialized_views.values():
+            table.drop(self.engine, checkfirst=True)
+        self.materialized_views = dict()
+        with self.session() as session:
+            syspar = session.get(SysPar, MATERIALIZED_REFRESHED)
+            if syspar is not None:
+                session.delete(syspar)
+            session.commit()
+
+    def refresh_materialized_views(self, sources: list[str] | None = None, full=False):
+        """Refresh the shadow tables of materialized views
+
+        Rows of each source are deleted and copied again from the views.
+
+        Args:
+            sources: ids of the sources to refresh; if None, the sources with
+                     entities updated since the last refresh.
+            full: if True copy all rows again.
+
+        Note:
+            Sources deleted from the database without being imported again
+            are only removed from the shadow tables by a full refresh.
+        """
+        if not self.materialized_views:
+            return
+        entity = Entity.__table__
+        with self.engine.begin() as connection:
+            last_updated = connection.scalar(select(func.max(entity.c.updated)))
+            if sources is None and not full:
+                refreshed = connection.scalar(
+                    select(SysPar.pvalue).where(SysPar.pname == MATERIALIZED_REFRESHED)
+                )
+                if refreshed is None:
+                    full = True
+                else:
+                    sources = connection.scalars(
+                        select(entity.c.the_source)
+                        .where(entity.c.updated > datetime.fromisoformat(refreshed))
+                        .distinct()
+                    ).all()
+            if not full and not sources:
+                return
+            for view_name, table in self.materialized_views.items():
+                view = self.views[view_name]
+                key_column = MATERIALIZED_VIEWS[view_name][0]
+                rows = select(*view.columns, entity.c.the_source).join(
+                    entity, entity.c.id == view.c[key_column]
+                )
+                if full:
+                    connection.execute(delete(table))
+                else:
+                    connection.execute(delete(table).where(table.c.the_source.in_(sources)))
+                    rows = rows.where(entity.c.the_source.in_(sources))
+                connection.execute(
+                    insert(table).from_select([c.name for c in table.columns], rows)
+                )
+            if last_updated is not None:
+                connection.execute(
+                    delete(SysPar.__table__).where(SysPar.pname == MATERIALIZED_REFRESHED)
+                )
+                connection.execute(
+                    insert(SysPar.__table__).values(
+                        pname=MATERIALIZED_REFRESHED,
+                        pvalue=last_updated.isoformat(),
+                        ptype="date",
+                        obs="Most recent entity update in materialized views",
+                    )
+                )
+
+    def get_materialized_view(self, view_name: str) -> Table:
+        """Return the shadow table of a view
+
+        The table is not refreshed, see refresh_materialized_views().
+        """
+        return self.materialized_views[view_name]
+
     def _create_nattributes_view(self):
         """Create the 'nattributes' view for named entity attributes.
 
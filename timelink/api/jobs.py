@@ -0,0 +1,360 @@
+"""Background jobs for long operations on a Timelink database.
+
+Imports, translations and synchronizations with a Kleio server can take
+minutes. A :class:`JobQueue` runs them in a pool of threads and records
+each job in the "jobs" table of the database, so that clients can submit
+a job, follow its progress and cancel it instead of waiting for a request
+to return.
+
+Kinds of jobs:
+
+    * "import": import a xml file, local or from a Kleio server,
+      see :func:`timelink.kleio.importer.import_from_xml`;
+    * "translate": translate sources in a Kleio server and wait for the
+      translations to finish;
+    * "sync": translate and import the sources that changed,
+      see :meth:`TimelinkDatabase.update_from_sources`.
+
+Example::
+
+    jobs = JobQueue(db)
+    job = jobs.submit_import("tests/xml_data/b1685.xml")
+    jobs.status(job.id).progress
+    {'file': 'b1685', 'groups_processed': 350, 'groups_per_second': 410.2, ...}
+    jobs.cancel(job.id)
+
+Progress is reported by the importer (see
+:meth:`timelink.kleio.kleio_handler.KleioHandler.get_progress`) and
+stored with the job. Jobs are cancelled between files, never in the
+middle of one: the importer commits as it goes and replaces the old
+version of a source when it starts, so stopping inside a file would
+leave a partial source. A cancelled import that already started
+finishes its file; a synchronization stops before the next file.
+
+Jobs run in the process that submitted them, recorded as the owner of
+the job (host:pid). When a queue is created, jobs left queued or running
+by a process of the same host that is no longer running were interrupted
+by a restart and are marked failed. Jobs of other processes, and of
+other hosts sharing the database, are left alone.
+"""
+
+import json
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime
+from typing import List
+
+from sqlalchemy import select, update
+
+from timelink.api.models.system import Job, JobSchema, JobStatus
+from timelink.kleio.importer import import_from_xml
+from timelink.kleio.kleio_handler import ImportCancelled
+
+JOB_KINDS = ("import", "translate", "sync")
+
+# status of jobs that have not finished
+ACTIVE_STATUS = (JobStatus.queued.value, JobStatus.running.value)
+
+
+def _process_running(pid: int) -> bool:
+    """True if a process with this pid is running on this host"""
+    if os.name == "nt":
+        # os.kill would terminate the process; assume it is running
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _jsonable(value):
+    """Convert stats and other results to values that can be stored as JSON"""
+    return json.loads(json.dumps(value, default=str))
+
+
+class JobQueue:
+    """Run imports, translations and synchronizations in background threads
+
+    Args:
+        db (TimelinkDatabase): database where the jobs are recorded and
+            the data is imported
+        max_workers (int): number of jobs running at the same time
+        progress_interval (float): minimum seconds between progress reports
+    """
+
+    def __init__(self, db, max_workers: int = 2, progress_interval: float = 1.0):
+        self.db = db
+        self.progress_interval = progress_interval
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="timelink-job"
+        )
+        self._futures: dict[str, Future] = {}
+        self._cancel_events: dict[str, threading.Event] = {}
+        self._lock = threading.Lock()
+        self.host = socket.gethostname()
+        self.owner = f"{self.host}:{os.getpid()}"
+        self._mark_interrupted()
+
+    def __repr__(self):
+        return f"JobQueue(db={self.db.db_url!r})"
+
+    def _interrupted(self, owner: str | None) -> bool:
+        """True if the owner of an active job is no longer running"""
+        if owner is None:  # jobs recorded before owners were
+            return True
+        host, _, pid = owner.rpartition(":")
+        if host != self.host or not pid.isdigit():
+            return False
+        return not _process_running(int(pid))
+
+    def _mark_interrupted(self):
+        with self.db.session() as session:
+            owners = session.scalars(
+                select(Job.owner).where(Job.status.in_(ACTIVE_STATUS)).distinct()
+            ).all()
+            for owner in owners:
+                if not self._interrupted(owner):
+                    continue
+                session.execute(
+                    update(Job)
+                    .where(Job.status.in_(ACTIVE_STATUS))
+                    .where(Job.owner.is_(None) if owner is None else Job.owner == owner)
+                    .values(
+                        status=JobStatus.failed.value,
+                        error="Interrupted",
+                        finished=datetime.now(),
+                    )
+                )
+            session.commit()
+
+    def _update(self, job_id: str, **values):
+        with self.db.session() as session:
+            session.execute(update(Job).where(Job.id == job_id).values(**values))
+            session.commit()
+
+    def submit(self, kind: str, path: str, kserver=None, **params) -> JobSchema:
+        """Add a job to the queue
+
+        Args:
+            kind (str): one of JOB_KINDS
+            path (str): file or directory for the job
+            kserver (KleioServer, optional): Kleio server for imports from
+                the server and translations
+            **params: options of the job, see submit_import, submit_translate
+                and submit_sync
+
+        Returns:
+            JobSchema: the job, with status queued
+        """
+        if kind not in JOB_KINDS:
+            raise ValueError(f"Unknown job kind: {kind}, use one of {JOB_KINDS}")
+        job = Job(
+            id=uuid.uuid4().hex,
+            kind=kind,
+            path=str(path),
+            status=JobStatus.queued.value,
+            params=_jsonable(params),
+            created=datetime.now(),
+            owner=self.owner,
+        )
+        with self.db.session() as session:
+            session.add(job)
+            session.commit()
+            job_schema = JobSchema.model_validate(job)
+        cancel_event = threading.Event()
+        with self._lock:
+            self._cancel_events[job_schema.id] = cancel_event
+            self._futures[job_schema.id] = self.executor.submit(
+                self._run, job_schema.id, kind, str(path), kserver, params, cancel_event
+            )
+        return job_schema
+
+    def submit_import(
+        self, path: str, kserver=None, incremental: bool = False, mode: str = "TL"
+    ) -> JobSchema:
+        """Import a xml file in the background
+
+        Args:
+            path (str): path or url of a xml file, or, with kserver,
+                the xml path in the Kleio server
+            kserver (KleioServer, optional): server to fetch the file from
+            incremental (bool): update sources already imported, see import_from_xml
+            mode (str): "TL" or "MHK"
+        """
+        return self.submit("import", path, kserver, incremental=incremental, mode=mode)
+
+    def submit_translate(
+        self, path: str, kserver, recurse: bool = True
+    ) -> JobSchema:
+        """Translate sources in a Kleio server in the background
+
+        The job finishes when no file under path is being translated.
+
+        Args:
+            path (str): file or directory in the sources of the server
+            kserver (KleioServer): the Kleio server
+            recurse (bool): translate files in subdirectories
+        """
+        if kserver is None:
+            raise ValueError("Translation jobs need a Kleio server")
+        return self.submit("translate", path, kserver, recurse=recurse)
+
+    def submit_sync(self, path: str = "", **params) -> JobSchema:
+        """Translate and import the sources that changed, in the background
+
+        Args:
+            path (str): directory in the sources of the attached Kleio server
+            **params: arguments of update_from_sources, e.g. recurse,
+                force, incremental
+        """
+        if self.db.get_kleio_server() is None:
+            raise ValueError("No kleio server attached to this database")
+        return self.submit("sync", path, **params)
+
+    def _run(self, job_id, kind, path, kserver, params, cancel_event):
+        if cancel_event.is_set():
+            self._finish(job_id, JobStatus.cancelled)
+            return
+        self._update(job_id, status=JobStatus.running.value, started=datetime.now())
+
+        def report(progress: dict):
+            self._update(job_id, progress=_jsonable(progress))
+
+        try:
+            if kind == "import":
+                result = self._run_import(path, kserver, params, report, cancel_event)
+            elif kind == "translate":
+                result = self._run_translate(path, kserver, params, report, cancel_event)
+            else:
+                self.db.update_from_sources(
+                    path, progress=report, cancel_event=cancel_event, **params
+                )
+                result = None
+        except ImportCancelled:
+            self._finish(job_id, JobStatus.cancelled)
+        except Exception as exc:
+            logging.exception("Job %s (%s %s) failed", job_id, kind, path)
+            self._finish(job_id, JobStatus.failed, error=f"{exc.__class__.__name__}: {exc}")
+        else:
+            self._finish(job_id, JobStatus.done, result=result)
+        finally:
+            with self._lock:
+                self._cancel_events.pop(job_id, None)
+                self._futures.pop(job_id, None)
+
+    def _finish(self, job_id, status: JobStatus, result=None, error=None):
+        self._update(
+            job_id,
+            status=status.value,
+            result=_jsonable(result) if result is not None else None,
+            error=error,
+            finished=datetime.now(),
+        )
+
+    def _run_import(self, path, kserver, params, report, cancel_event) -> dict:
+        options = {
+            "return_stats": True,
+            "mode": params.get("mode", "TL"),
+            "incremental": params.get("incremental", False),
+            "progress": report,
+            "progress_interval": self.progress_interval,
+            "cancel_event": cancel_event,
+        }
+        if kserver is not None:
+            options["kleio_url"] = kserver.get_url()
+            options["kleio_token"] = kserver.get_token()
+        with self.db.session() as session:
+            return import_from_xml(path, session, options)
+
+    def _run_translate(self, path, kserver, params, report, cancel_event) -> dict:
+        recurse = "yes" if params.get("recurse", True) else "no"
+        kserver.translate(path, recurse=recurse, spawn="no")
+        while True:
+            if cancel_event.is_set():
+                raise ImportCancelled(f"Translation of {path} cancelled")
+            processing = kserver.get_translations(path=path, recurse=recurse, status="P")
+            queued = kserver.get_translations(path=path, recurse=recurse, status="Q")
+            if not processing and not queued:
+                break
+            report({"stage": "translate", "processing": len(processing), "queued": len(queued)})
+            time.sleep(self.progress_interval)
+        counts = {}
+        for kfile in kserver.get_translations(path=path, recurse=recurse):
+            counts[kfile.status.value] = counts.get(kfile.status.value, 0) + 1
+        return {"translations": counts}
+
+    def status(self, job_id: str) -> JobSchema | None:
+        """Return a job, None if there is no job with this id"""
+        with self.db.session() as session:
+            job = session.get(Job, job_id)
+            return JobSchema.model_validate(job) if job is not None else None
+
+    def jobs(self, status: str | None = None, limit: int = 100) -> List[JobSchema]:
+        """Return the most recent jobs
+
+        Args:
+            status (str, optional): only jobs with this status
+            limit (int): maximum number of jobs
+        """
+        stmt = select(Job).order_by(Job.created.desc()).limit(limit)
+        if status is not None:
+            stmt = stmt.where(Job.status == JobStatus(status).value)
+        with self.db.session() as session:
+            return [JobSchema.model_validate(job) for job in session.scalars(stmt)]
+
+    def cancel(self, job_id: str) -> JobSchema | None:
+        """Cancel a job
+
+        Queued jobs are cancelled at once. Running jobs stop before the
+        next file or at the next check of the translations; an import that
+        started finishes its file and ends as done.
+
+        Returns:
+            JobSchema: the job, None if there is no job with this id
+        """
+        with self._lock:
+            cancel_event = self._cancel_events.get(job_id)
+            future = self._futures.get(job_id)
+        if cancel_event is not None:
+            cancel_event.set()
+            if future is not None and future.cancel():
+                # never started, _run will not clean up
+                with self._lock:
+                    self._cancel_events.pop(job_id, None)
+                    self._futures.pop(job_id, None)
+                self._finish(job_id, JobStatus.cancelled)
+        return self.status(job_id)
+
+    def wait(self, job_id: str, timeout: float | None = None) -> JobSchema | None:
+        """Wait for a job to finish and return it
+
+        Raises:
+            TimeoutError: if the job does not finish in timeout seconds
+        """
+        with self._lock:
+            future = self._futures.get(job_id)
+        if future is not None and not future.cancelled():
+            future.result(timeout=timeout)
+        return self.status(job_id)
+
+    def shutdown(self, cancel: bool = True):
+        """Stop the workers
+
+        Args:
+            cancel (bool): cancel the queued and running jobs, running
+                imports finish their file; otherwise wait for all jobs
+        """
+        if cancel:
+            with self._lock:
+                job_ids = list(self._cancel_events)
+            for job_id in job_ids:
+                self.cancel(job_id)
+        self.executor.shutdown(wait=True)
@@ -24,3 +24,10 @@ from .system import SysLog  # noqa pylint: disable=unused-import
 from .system import SysLogSchema  # noqa pylint: disable=unused-import
 from .system import SysLogCreateSchema  # noqa pylint: disable=unused-import
 from .system import KleioImportedFile  # noqa pylint: disable=unused-import
+from .system import Job  # noqa pylint: disable=unused-import
+from .system import JobSchema  # noqa pylint: disable=unused-import
+from .system import JobStatus  # noqa pylint: disable=unused-import
+from .person_name import PersonName  # noqa pylint: disable=unused-import
+from .person_name import PersonNameTrigram  # noqa pylint: disable=unused-import
+from .group_class import GroupClass  # noqa pylint: disable=unused-import
+from .entity_digest import EntityDigest  # noqa pylint: disable=unused-import
@@ -0,0 +1,117 @@
+"""Digest of the content of each imported entity
+
+The importer computes a digest of each Kleio group, from its elements,
+container and class definition, and stores it here. On incremental
+imports (see :class:`timelink.kleio.kleio_handler.KleioHandler`) the
+digests of the entities of a source are compared with those of the
+groups being imported, so that only changed entities are written.
+
+Digests are kept in a table of their own so that the entities table,
+and the queries and views built on it, are unchanged.
+"""
+
+from sqlalchemy import ForeignKey, String, delete, insert, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Mapped, mapped_column
+
+from .base_class import Base
+from .entity import Entity
+
+
+class EntityDigest(Base):
+    """Digest of the group an entity was imported from
+
+    Fields:
+        id: id of the entity
+        digest: sha256 of the content of the group
+    """
+
+    __tablename__ = "entity_digests"
+
+    id: Mapped[str] = mapped_column(
+        String, ForeignKey("entities.id", ondelete="CASCADE"), primary_key=True
+    )
+    digest: Mapped[str] = mapped_column(String(64), nullable=False)
+
+    def __repr__(self):
+        return f"EntityDigest(id={self.id!r}, digest={self.digest!r})"
+
+
+def store_entity_digests(session, digests: dict):
+    """Insert or replace the digests of entities
+
+    Args:
+        session: a database session
+        digests (dict): entity id: digest
+    """
+    if not digests:
+        return
+    table = EntityDigest.__table__
+    rows = [{"id": eid, "digest": digest} for eid, digest in digests.items()]
+    dialect_name = session.get_bind().dialect.name
+    if dialect_name == "postgresql":
+        stmt = postgresql.insert(table)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.id], set_={"digest": stmt.excluded.digest}
+        )
+    elif dialect_name == "sqlite":
+        stmt = sqlite.insert(table)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.id], set_={"digest": stmt.excluded.digest}
+        )
+    else:
+        delete_entity_digests(session, entity_ids=digests.keys())
+        stmt = insert(table)
+    session.execute(stmt, rows)
+
+
+def delete_entity_digests(session, entity_ids=None, source_id=None):
+    """Delete the digests of some entities, or of all entities of a source
+
+    Args:
+        session: a database session
+        entity_ids (list, optional): ids of entities
+        source_id (str, optional): id of a source
+    """
+    table = EntityDigest.__table__
+    if entity_ids is not None:
+        entity_ids = list(entity_ids)
+        # keep the number of parameters within database limits
+        for i in range(0, len(entity_ids), 500):
+            session.execute(delete(table).where(table.c.id.in_(entity_ids[i:i + 500])))
+    if source_id is not None:
+        entities = Entity.__table__
+        session.execute(
+            delete(table).where(
+                table.c.id.in_(
+                    select(entities.c.id).where(entities.c.the_source == source_id)
+                )
+            )
+        )
+
+
+def source_entity_digests(session, source_id: str) -> dict:
+    """Return the entities of a source with their position and digest
+
+    Args:
+        session: a database session
+        source_id (str): id of the source
+
+    Returns:
+        dict: entity id: (the_line, the_level, the_order, digest), digest is
+            None for entities imported before digests were stored
+    """
+    entities = Entity.__table__
+    table = EntityDigest.__table__
+    rows = session.execute(
+        select(
+            entities.c.id,
+            entities.c.the_line,
+            entities.c.the_level,
+            entities.c.the_order,
+            table.c.digest,
+        )
+        .outerjoin(table, table.c.id == entities.c.id)
+        .where(entities.c.the_source == source_id)
+    )
+    return {row.id: (row.the_line, row.the_level, row.the_order, row.digest) for row in rows}
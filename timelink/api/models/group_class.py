@@ -0,0 +1,125 @@
+"""Catalog of the (group, class) pairs present in the database
+
+Kleio groups with different names can be stored by the same class
+(e.g. "n", "pai", "mae" are all stored as "person"). The catalog keeps
+the pairs found in the entities table so that the group to ORM class
+map can be built when a database is opened without scanning the
+entities table.
+
+Entities without a group name (e.g. the class definitions, which
+are stored as entities) are cataloged under the group name "class",
+the key they were mapped under when the map was built from the
+entities table.
+
+The catalog is updated by an ORM event when entities are inserted,
+so imports keep it current without changes to the importer.
+Pairs are never removed when entities are deleted.
+"""
+
+import weakref
+
+from sqlalchemy import String, func, insert, literal, select
+from sqlalchemy import event
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Mapped, mapped_column
+
+from .base_class import Base
+from .entity import Entity
+
+# pairs known to be in the catalog, per engine
+_known_pairs: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+
+# group name of entities without one
+NO_GROUP = "class"
+
+
+class GroupClass(Base):
+    """A group name and the class used to store it
+
+    Fields:
+        groupname: name of the group in Kleio sources
+        pom_class: id of the class (PomSomMapper) of entities of this group
+    """
+
+    __tablename__ = "group_classes"
+
+    groupname: Mapped[str] = mapped_column(String, primary_key=True)
+    pom_class: Mapped[str] = mapped_column("class", String, primary_key=True)
+
+    def __repr__(self):
+        return f"GroupClass(groupname={self.groupname!r}, pom_class={self.pom_class!r})"
+
+
+def register_group_class(connection, groupname: str, pom_class: str):
+    """Add a (group, class) pair to the catalog if not there yet"""
+    engine = connection.engine
+    known = _known_pairs.get(engine)
+    if known is None:
+        known = _known_pairs[engine] = set()
+        if not event.contains(engine, "rollback", _connection_rolled_back):
+            event.listen(engine, "rollback", _connection_rolled_back)
+    if (groupname, pom_class) in known:
+        return
+    table = GroupClass.__table__
+    values = {"groupname": groupname, "class": pom_class}
+    dialect_name = connection.dialect.name
+    if dialect_name == "postgresql":
+        connection.execute(
+            postgresql.insert(table).values(values).on_conflict_do_nothing()
+        )
+    elif dialect_name == "sqlite":
+        connection.execute(sqlite.insert(table).values(values).on_conflict_do_nothing())
+    else:
+        exists = connection.execute(
+            select(table.c.groupname).where(
+                table.c.groupname == groupname, table.c["class"] == pom_class
+            )
+        ).first()
+        if exists is None:
+            connection.execute(insert(table).values(values))
+    known.add((groupname, pom_class))
+
+
+def clear_group_class_cache(engine=None):
+    """Forget the pairs known to be in the catalog
+
+    Must be called when the catalog table is emptied or recreated.
+
+    Args:
+        engine: engine to clear, if None clear all
+    """
+    if engine is None:
+        _known_pairs.clear()
+    else:
+        _known_pairs.pop(engine, None)
+
+
+def rebuild_group_classes(connection):
+    """Recompute the catalog from the entities table
+
+    Used to populate the catalog in existing databases.
+    """
+    table = GroupClass.__table__
+    entities = Entity.__table__
+    connection.execute(table.delete())
+    connection.execute(
+        insert(table).from_select(
+            ["groupname", "class"],
+            select(
+                func.coalesce(entities.c.groupname, literal(NO_GROUP)), entities.c["class"]
+            ).distinct(),
+        )
+    )
+    clear_group_class_cache(connection.engine)
+
+
+@event.listens_for(Entity, "after_insert", propagate=True)
+def _entity_inserted(mapper, connection, target):
+    if target.pom_class is not None:
+        register_group_class(connection, target.groupname or NO_GROUP, target.pom_class)
+
+
+def _connection_rolled_back(connection):
+    # pairs inserted in the rolled back transaction are gone,
+    # listens to the engines with a cache, see register_group_class()
+    clear_group_class_cache(connection.engine)
@@ -0,0 +1,235 @@
+"""Normalized person names for fast similar name search
+
+Tables defined here:
+
+    - person_names: normalized name of each person (lowercase, no accents,
+      no particles). Indexed with pg_trgm on PostgreSQL.
+    - person_name_trigrams: trigrams of the normalized names, used
+      as a trigram index on databases without pg_trgm (SQLite).
+
+Both tables are kept up to date by ORM events on Person, so they
+are maintained during import without changes to the importer.
+Databases created before these tables existed are populated
+by the corresponding migration (see :func:`rebuild_person_names`).
+"""
+
+import unicodedata
+
+from sqlalchemy import (
+    DDL,
+    ForeignKey,
+    Index,
+    String,
+    delete,
+    event,
+    func,
+    insert,
+    select,
+)
+from sqlalchemy.orm import Mapped, mapped_column
+
+from .base_class import Base
+from .person import Person
+
+NAME_PARTICLES = ("de", "da", "e", "das", "dos", "do")
+
+
+def normalize_name(name: str, particles=None) -> str:
+    """Normalize a name for searching
+
+    Lowercases, removes accents and punctuation, removes particles
+    and collapses white space.
+
+    Args:
+        name: name to normalize
+        particles: particles to remove, defaults to NAME_PARTICLES
+
+    Example:
+        normalize_name("João  de Sá-Pereira") -> "joao sa pereira"
+    """
+    if name is None:
+        return ""
+    if particles is None:
+        particles = NAME_PARTICLES
+    decomposed = unicodedata.normalize("NFKD", name.lower())
+    chars = [
+        c if c.isalnum() else " "
+        for c in decomposed
+        if not unicodedata.combining(c)
+    ]
+    return " ".join([n for n in "".join(chars).split() if n not in particles])
+
+
+def name_trigrams(normalized_name: str) -> set:
+    """Return the set of trigrams of the words in a normalized name
+
+    Words with less than three characters produce no trigrams.
+    """
+    trigrams = set()
+    for word in normalized_name.split():
+        for i in range(len(word) - 2):
+            trigrams.add(word[i:i + 3])
+    return trigrams
+
+
+class PersonName(Base):
+    """Normalized name of a person
+
+    Fields:
+        id: id of the person
+        norm_name: normalized name, see normalize_name()
+    """
+
+    __tablename__ = "person_names"
+
+    id: Mapped[str] = mapped_column(
+        String, ForeignKey("persons.id", ondelete="CASCADE"), primary_key=True
+    )
+    norm_name: Mapped[str] = mapped_column(String, index=True)
+
+    __table_args__ = (
+        Index(
+            "ix_person_names_trgm",
+            "norm_name",
+            postgresql_using="gin",
+            postgresql_ops={"norm_name": "gin_trgm_ops"},
+        ).ddl_if(dialect="postgresql"),
+    )
+
+    def __repr__(self):
+        return f"PersonName(id={self.id!r}, norm_name={self.norm_name!r})"
+
+
+class PersonNameTrigram(Base):
+    """Trigram of a normalized person name
+
+    Only maintained on databases without pg_trgm.
+
+    Fields:
+        trigram: three consecutive characters of a word in the name
+        id: id of the person
+    """
+
+    __tablename__ = "person_name_trigrams"
+
+    trigram: Mapped[str] = mapped_column(String(3), primary_key=True)
+    id: Mapped[str] = mapped_column(
+        String,
+        ForeignKey("person_names.id", ondelete="CASCADE"),
+        primary_key=True,
+        index=True,
+    )
+
+    def __repr__(self):
+        return f"PersonNameTrigram(trigram={self.trigram!r}, id={self.id!r})"
+
+
+event.listen(
+    PersonName.__table__,
+    "before_create",
+    DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm").execute_if(dialect="postgresql"),
+)
+
+
+def uses_pg_trgm(dialect_name: str) -> bool:
+    """True if name search relies on pg_trgm instead of the trigram table"""
+    return dialect_name == "postgresql"
+
+
+def _delete_person_name(connection, person_id):
+    if not uses_pg_trgm(connection.dialect.name):
+        connection.execute(
+            delete(PersonNameTrigram.__table__).where(
+                PersonNameTrigram.__table__.c.id == person_id
+            )
+        )
+    connection.execute(
+        delete(PersonName.__table__).where(PersonName.__table__.c.id == person_id)
+    )
+
+
+def _insert_person_names(connection, rows):
+    """Insert normalized names and trigrams for (id, name) rows"""
+    names = []
+    trigrams = []
+    for person_id, name in rows:
+        norm_name = normalize_name(name)
+        if norm_name == "":
+            continue
+        names.append({"id": person_id, "norm_name": norm_name})
+        trigrams.extend(
+            {"trigram": trigram, "id": person_id}
+            for trigram in name_trigrams(norm_name)
+        )
+    if names:
+        connection.execute(insert(PersonName.__table__), names)
+    if trigrams and not uses_pg_trgm(connection.dialect.name):
+        connection.execute(insert(PersonNameTrigram.__table__), trigrams)
+
+
+@event.listens_for(Person, "after_insert", propagate=True)
+def _person_inserted(mapper, connection, target):
+    _insert_person_names(connection, [(target.id, target.name)])
+
+
+@event.listens_for(Person, "after_update", propagate=True)
+def _person_updated(mapper, connection, target):
+    _delete_person_name(connection, target.id)
+    _insert_person_names(connection, [(target.id, target.name)])
+
+
+@event.listens_for(Person, "after_delete", propagate=True)
+def _person_deleted(mapper, connection, target):
+    _delete_person_name(connection, target.id)
+
+
+def rebuild_person_names(connection, chunk_size=5000):
+    """Recompute the normalized names of all persons
+
+    Used to populate the name search tables in existing databases
+    and to rebuild them if normalization rules change.
+    """
+    if not uses_pg_trgm(connection.dialect.name):
+        connection.execute(delete(PersonNameTrigram.__table__))
+    connection.execute(delete(PersonName.__table__))
+    persons = Person.__table__
+    result = connection.execution_options(yield_per=chunk_size).execute(
+        select(persons.c.id, persons.c.name)
+    )
+    for rows in result.partitions():
+        _insert_person_names(connection, rows)
+
+
+def similar_names_select(name: str, dialect_name: str):
+    """Return a select of ids of persons with names similar to name
+
+    The name is normalized and its words must appear, in order,
+    in the normalized person name, the first word at the start.
+    "joão pereira" matches "João Fernandes Pereira" and "Joana Pereira".
+
+    On PostgreSQL the LIKE is served by the pg_trgm index. On other
+    databases candidates are first selected with the trigram table.
+
+    The particles removed are NAME_PARTICLES, the same removed from the
+    stored names; other particles would not match the index.
+
+    Args:
+        name: name to search for
+        dialect_name: name of the SQLAlchemy dialect of the database
+    """
+    norm_name = normalize_name(name)
+    pattern = "%".join(norm_name.split()) + "%"
+    names = PersonName.__table__
+    stmt = select(names.c.id).where(names.c.norm_name.like(pattern))
+
+    trigrams = name_trigrams(norm_name)
+    if trigrams and not uses_pg_trgm(dialect_name):
+        trigram_table = PersonNameTrigram.__table__
+        candidates = (
+            select(trigram_table.c.id)
+            .where(trigram_table.c.trigram.in_(trigrams))
+            .group_by(trigram_table.c.id)
+            .having(func.count() == len(trigrams))
+        )
+        stmt = stmt.where(names.c.id.in_(candidates))
+    return stmt
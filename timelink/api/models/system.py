@@ -4,6 +4,8 @@ Tables defined here:
 
     - syspar: system parameters
     - syslog: system log
+    - kleiofiles: imported kleio files
+    - jobs: background jobs, see timelink.api.jobs
 
 """
 
@@ -13,7 +15,7 @@ from typing import Optional
 from datetime import datetime
 from pydantic import BaseModel, ConfigDict  # pylint: disable=import-error
 
-from sqlalchemy import Column, String, Integer, DateTime  # pylint: disable=import-error
+from sqlalchemy import JSON, Column, String, Integer, DateTime  # pylint: disable=import-error
 from sqlalchemy.sql import func  # pylint: disable=import-error
 from sqlalchemy.orm import mapped_column  # pylint: disable=import-error
 from sqlalchemy.orm import Mapped  # pylint: disable=import-error
@@ -152,7 +154,8 @@ class KleioImportedFile(Base):
         nerrors: number of errors
         nwarnings: number of warnings
         error_rpt: error report
-        warning_rpt: warning report"""
+        warning_rpt: warning report
+        content_hash: hash of the xml, ignoring the translation date"""
 
     __tablename__ = "kleiofiles"
 
@@ -171,6 +174,8 @@ class KleioImportedFile(Base):
     imported: Mapped[datetime] = mapped_column(DateTime, nullable=True)
     # set to null at start of import
     imported_string: Mapped[str] = mapped_column(String(255), nullable=True)
+    # see timelink.kleio.xml_source.ContentHash
+    content_hash: Mapped[Optional[str]] = mapped_column(String(64), nullable=True)
 
     def __str__(self):
         return f"{self.name} ({self.path})"
@@ -182,7 +187,8 @@ class KleioImportedFile(Base):
             f"translation_date={self.translation_date!r}, nerrors={self.nerrors!r}, "
             f"nwarnings={self.nwarnings!r}, error_rpt={self.error_rpt!r}, "
             f"warning_rpt={self.warning_rpt!r}, imported={self.imported!r}, "
-            f"imported_string={self.imported_string!r})"
+            f"imported_string={self.imported_string!r}, "
+            f"content_hash={self.content_hash!r})"
         )
 
 
@@ -214,5 +220,84 @@ class KleioImportedFileSchema(BaseModel):
     imported: Optional[datetime]
     """imported_string: str date of import as string"""
     imported_string: Optional[str]
+    """content_hash: str hash of the xml, ignoring the translation date"""
+    content_hash: Optional[str] = None
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+class JobStatus(str, Enum):
+    """Status of a background job
+
+    Fields:
+        queued: waiting for a worker
+        running: being processed
+        done: finished
+        failed: finished with an error
+        cancelled: cancelled before finishing
+    """
+
+    queued = "queued"
+    running = "running"
+    done = "done"
+    failed = "failed"
+    cancelled = "cancelled"
+
+
+class Job(Base):
+    """A background job: import, translation or synchronization of sources
+
+    Fields:
+        id: job id
+        kind: import, translate or sync
+        path: file or directory the job works on
+        status: see JobStatus
+        params: parameters of the job
+        progress: last progress report of the job
+        result: result of the job, e.g. import stats
+        error: error message of failed jobs
+        created: time the job was submitted
+        started: time the job started running
+        finished: time the job finished
+        owner: host and process id of the process running the job
+    """
+
+    __tablename__ = "jobs"
+
+    id: Mapped[str] = mapped_column(String(32), primary_key=True)
+    kind: Mapped[str] = mapped_column(String(32), nullable=False)
+    path: Mapped[str] = mapped_column(String(1024), nullable=False)
+    status: Mapped[str] = mapped_column(String(16), nullable=False, index=True)
+    params: Mapped[Optional[dict]] = mapped_column(JSON, nullable=True)
+    progress: Mapped[Optional[dict]] = mapped_column(JSON, nullable=True)
+    result: Mapped[Optional[dict]] = mapped_column(JSON, nullable=True)
+    error: Mapped[Optional[str]] = mapped_column(String, nullable=True)
+    created: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+    started: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
+    finished: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
+    owner: Mapped[Optional[str]] = mapped_column(String(128), nullable=True)
+
+    def __repr__(self):
+        return (
+            f"Job(id={self.id!r}, kind={self.kind!r}, path={self.path!r}, "
+            f"status={self.status!r})"
+        )
+
+
+class JobSchema(BaseModel):
+    """A background job, see Job"""
+
+    id: str
+    kind: str
+    path: str
+    status: JobStatus
+    params: Optional[dict] = None
+    progress: Optional[dict] = None
+    result: Optional[dict] = None
+    error: Optional[str] = None
+    created: datetime
+    started: Optional[datetime] = None
+    finished: Optional[datetime] = None
+    owner: Optional[str] = None
 
     model_config = ConfigDict(from_attributes=True)
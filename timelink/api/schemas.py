@@ -213,8 +213,8 @@ class SearchResults(BaseModel):
     id: str
     the_class: str
     description: str
-    start_date: date
-    end_date: date
+    start_date: date | None = None
+    end_date: date | None = None
 
 
 class ImportStats(BaseModel):
@@ -231,6 +231,9 @@ class ImportStats(BaseModel):
         person_rate (float): Persons processed per second.
         nerrors (int): Total number of errors encountered.
         errors (List[str]): List of specific error messages.
+        stages (dict): Seconds and calls of each stage of the import.
+        group_counts (dict): Number of groups stored, by class.
+        slow_groups (List[dict]): Groups that were slow to store.
     """
 
     datetime: date
@@ -243,3 +246,6 @@ class ImportStats(BaseModel):
     person_rate: float
     nerrors: int
     errors: List[str]
+    stages: Optional[dict] = None
+    group_counts: Optional[dict] = None
+    slow_groups: Optional[List[dict]] = None
@@ -19,10 +19,14 @@ class CreateView(DDLElement):
     Args:
         name (str): The name of the view to create.
         selectable (Select): The SQLAlchemy select statement that defines the view.
+        or_replace (bool): Emit CREATE OR REPLACE VIEW in dialects that support it
+            (see :data:`OR_REPLACE_DIALECTS`). Other dialects get a plain CREATE VIEW
+            and the existing view must be dropped first.
     """
-    def __init__(self, name, selectable):
+    def __init__(self, name, selectable, or_replace=False):
         self.name = name
         self.selectable = selectable
+        self.or_replace = or_replace
 
 
 class DropView(DDLElement):
@@ -35,10 +39,19 @@ class DropView(DDLElement):
         self.name = name
 
 
+# dialects that support CREATE OR REPLACE VIEW
+OR_REPLACE_DIALECTS = ("postgresql", "mysql")
+
+
 @compiler.compiles(CreateView)
 def _create_view(element, compiler, **kw):
     """Compile the CREATE VIEW statement."""
-    return "CREATE VIEW %s AS %s" % (
+    if element.or_replace and compiler.dialect.name in OR_REPLACE_DIALECTS:
+        create = "CREATE OR REPLACE VIEW"
+    else:
+        create = "CREATE VIEW"
+    return "%s %s AS %s" % (
+        create,
         element.name,
         compiler.sql_compiler.process(element.selectable, literal_binds=True),
     )
@@ -72,7 +85,8 @@ def view(name, metadata, selectable):
     This function creates a Table object that represents the view, allowing
     it to be used in SQLAlchemy queries just like a regular table. It also
     registers listeners to automatically create the view after tables are created
-    and drop it before tables are dropped.
+    and drop it before tables are dropped. The select statement is kept
+    in the ``definition`` attribute of the returned object.
 
     Args:
         name (str): The name of the view.
@@ -91,6 +105,7 @@ def view(name, metadata, selectable):
         ),
     )
     t.primary_key.update(c for c in t.c if c.primary_key)
+    t.definition = selectable
 
     sa.event.listen(
         metadata,
@@ -103,3 +118,13 @@ def view(name, metadata, selectable):
         DropView(name).execute_if(callable_=view_exists),
     )
     return t
+
+
+def view_sql(view_table, dialect) -> str:
+    """Return the CREATE VIEW statement of a view compiled for a dialect.
+
+    Args:
+        view_table (TableClause): a view returned by :func:`view`.
+        dialect (Dialect): the SQLAlchemy dialect to compile for.
+    """
+    return str(CreateView(view_table.name, view_table.definition).compile(dialect=dialect))
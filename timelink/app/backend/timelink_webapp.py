@@ -2,6 +2,7 @@
 
 import os
 import json
+from concurrent.futures import ThreadPoolExecutor
 from typing import List
 
 import pandas
@@ -10,7 +11,13 @@ from sqlalchemy.orm import selectinload
 from sqlalchemy.engine.url import make_url
 
 import timelink
-from timelink.api.database import get_postgres_dbnames, get_sqlite_databases
+from timelink.api.database import (
+    TimelinkDatabase,
+    dispose_engines,
+    get_postgres_dbnames,
+    get_sqlite_databases,
+)
+from timelink.api.jobs import JobQueue
 from timelink.app.schemas.project import ProjectSchema
 from timelink.kleio.kleio_server import KleioServer
 from timelink.app.models import UserDatabase, User, UserProperty  # noqa
@@ -70,6 +77,7 @@ class TimelinkWebApp:
         sqlite_dir=None,
         stop_duplicates=True,  # kleio server duplicates
         initial_users: list[User] = None,
+        import_workers: int = 2,
         **connection_args,
     ):
         """Create a TimelinkWebApp instance
@@ -96,6 +104,8 @@ class TimelinkWebApp:
             sqlite_dir: directory where the sqlite databases are located
             initial_users: list of initial users (deprecated)
             stop_duplicates: if True, stop duplicates
+            import_workers: number of threads for imports and other long
+                            operations, which run outside the event loop
             **connection_args: extra arguments to pass to the TimelinkDatabase
 
         Returns:
@@ -120,6 +130,15 @@ class TimelinkWebApp:
         self.kleio_token = kleio_token
         self.kleio_update = kleio_update
         self.projects: List[ProjectSchema] = []
+        # project databases opened, by url; engines are shared, see get_engine()
+        self.project_databases: dict[str, TimelinkDatabase] = {}
+        # blocking work (imports) is run here so that requests keep being served
+        self.import_executor = ThreadPoolExecutor(
+            max_workers=import_workers, thread_name_prefix="timelink-import"
+        )
+        self.import_workers = import_workers
+        # background jobs of each project database, by url
+        self.job_queues: dict[str, JobQueue] = {}
 
         if initial_users is None:
             self.initial_users = []
@@ -268,6 +287,48 @@ class TimelinkWebApp:
             session.commit()
         return self.projects
 
+    def get_project_database(self, database_url: str) -> TimelinkDatabase:
+        """Return the database of a project, opening it on first use
+
+        Args:
+            database_url: url of the project database
+
+        The database object is kept for later requests. Its engine is
+        shared with any other database object opened on the same url.
+        """
+        project_db = self.project_databases.get(database_url)
+        if project_db is None:
+            project_db = TimelinkDatabase(
+                db_url=database_url, kleio_server=self.kleio_server
+            )
+            self.project_databases[database_url] = project_db
+        return project_db
+
+    def get_job_queue(self, db: TimelinkDatabase) -> JobQueue:
+        """Return the queue of background jobs of a project database
+
+        See :class:`timelink.api.jobs.JobQueue`.
+        """
+        job_queue = self.job_queues.get(db.db_url)
+        if job_queue is None:
+            job_queue = JobQueue(db, max_workers=self.import_workers)
+            self.job_queues[db.db_url] = job_queue
+        return job_queue
+
+    def shutdown(self):
+        """Close the database connections of the web app
+
+        Waits for running imports, cancels background jobs, then disposes
+        the engines shared by the users database and the project databases.
+        Called when the application stops.
+        """
+        self.import_executor.shutdown(wait=True, cancel_futures=True)
+        for job_queue in self.job_queues.values():
+            job_queue.shutdown(cancel=True)
+        self.job_queues.clear()
+        self.project_databases.clear()
+        dispose_engines()
+
     def print_info(self):
         info_dict = self.get_info()
         print(json.dumps(info_dict, indent=4))
@@ -353,9 +414,16 @@ class TimelinkWebApp:
         """
         return get_postgres_dbnames()
 
-    def table_row_count_df(self):
-        """Return the row count of all tables in the database"""
-        tables = self.db.table_row_count()
+    def table_row_count_df(self, estimate=False, parallel=False):
+        """Return the row count of all tables in the database
+
+        Args:
+            estimate: use the database statistics instead of counting rows
+            parallel: count rows in several tables concurrently
+
+        See TimelinkDatabase.table_row_count()
+        """
+        tables = self.db.table_row_count(estimate=estimate, parallel=parallel)
         tables_df = pandas.DataFrame(tables, columns=["table", "count"])
         return tables_df
 
@@ -1,8 +1,7 @@
 from typing import Annotated
 from fastapi import Request
-from fastapi import Depends
+from fastapi import Depends, HTTPException, status
 from timelink.app.schemas import UserSchema
-from timelink.app.models.user import User
 
 
 async def get_current_user(request: Request):
@@ -34,14 +33,60 @@ def get_kleio_server(request: Request):
     return webapp.kleio_server
 
 
-def get_db(request: Request):
-    """Get the database request"""
+def get_db(request: Request, project: str | None = None):
+    """Get the database of the project of the request
+
+    Args:
+        project: name of the project, a query parameter. May be omitted
+            if only one project has a database.
+
+    The database is opened by TimelinkWebApp.get_project_database.
+    """
+    webapp = request.app.state.webapp
+    # Todo: Determine the user's project from the current user
+    projects = [p for p in webapp.projects if p.databaseURL]
+    if project is not None:
+        projects = [p for p in projects if p.name.upper() == project.upper()]
+        if not projects:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"No project {project} with a database",
+            )
+    if len(projects) != 1:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Specify the project with ?project=",
+        )
+    return webapp.get_project_database(projects[0].databaseURL)
+
+
+def get_job_queue(request: Request, db=Depends(get_db)):  # noqa: B008
+    """Get the queue of background jobs of the database of the request
+
+    See timelink.api.jobs.JobQueue
+    """
     webapp = request.app.state.webapp
-    user = Annotated[User, Depends(get_current_active_user)]
-    # Todo: Determine the user's project
-    # project = webapp.projects[user.name]
-    # project_db = project.db
-    return webapp.get_current_project_db(user)
+    return webapp.get_job_queue(db)
+
+
+def get_session(db=Depends(get_db)):  # noqa: B008
+    """Get a session on the database of the request
+
+    For endpoints that write, which are not async. The session is
+    closed after the response. See TimelinkDatabase.session
+    """
+    with db.session() as session:
+        yield session
+
+
+async def get_async_db(db=Depends(get_db)):  # noqa: B008
+    """Get an async session on the database of the request
+
+    For read only endpoints, the session is closed after the response.
+    See TimelinkDatabase.async_session
+    """
+    async with db.async_session() as session:
+        yield session
 
 
 def get_github_auth(request: Request):
@@ -0,0 +1,110 @@
+# flake8: noqa: B008
+"""Endpoints of the background jobs of a project database
+
+See :class:`timelink.api.jobs.JobQueue`. The project is given by the
+``project`` query parameter, see :func:`timelink.app.dependencies.get_db`.
+"""
+from typing import Annotated, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, status
+
+from timelink.api import models
+from timelink.api.jobs import JobQueue
+from timelink.app.dependencies import get_job_queue, get_kleio_server
+from timelink.kleio.kleio_server import KleioServer
+
+router = APIRouter(prefix="/jobs", tags=["jobs"])
+
+
+@router.post("/import/{file_path:path}", response_model=models.JobSchema)
+async def submit_import_job(
+    file_path: str,
+    jobs: Annotated[JobQueue, Depends(get_job_queue)],
+    incremental: bool = False,
+    from_kleio_server: bool = False,
+    kserver: KleioServer = Depends(get_kleio_server),  # noqa: B008
+):
+    """Import a xml file in the background
+
+    Args:
+        file_path (str): path of the xml file, or the xml path in the
+            kleio server if from_kleio_server is True.
+        incremental (bool): update only the entities that changed.
+        from_kleio_server (bool): fetch the file from the kleio server.
+
+    Follow the job with /jobs/{job_id}.
+    """
+    return jobs.submit_import(
+        file_path, kserver=kserver if from_kleio_server else None, incremental=incremental
+    )
+
+
+@router.post("/translate/{path:path}", response_model=models.JobSchema)
+async def submit_translate_job(
+    path: str,
+    jobs: Annotated[JobQueue, Depends(get_job_queue)],
+    recurse: bool = True,
+    kserver: KleioServer = Depends(get_kleio_server),  # noqa: B008
+):
+    """Translate sources in the kleio server in the background
+
+    Args:
+        path (str): path to the file or directory in sources.
+        recurse (bool): translate files in subdirectories.
+    """
+    return jobs.submit_translate(path, kserver, recurse=recurse)
+
+
+@router.post("/sync/{path:path}", response_model=models.JobSchema)
+async def submit_sync_job(
+    path: str,
+    jobs: Annotated[JobQueue, Depends(get_job_queue)],
+    recurse: bool = True,
+    force: bool = False,
+    incremental: bool = False,
+):
+    """Translate and import the sources that changed, in the background
+
+    Args:
+        path (str): path to the directory in sources.
+        recurse (bool): include subdirectories.
+        force (bool): translate and import all files.
+        incremental (bool): update only the entities that changed.
+    """
+    try:
+        return jobs.submit_sync(path, recurse=recurse, force=force, incremental=incremental)
+    except ValueError as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc))
+
+
+@router.get("", response_model=list[models.JobSchema])
+async def list_jobs(
+    jobs: Annotated[JobQueue, Depends(get_job_queue)],
+    job_status: Optional[models.JobStatus] = None,
+    limit: int = 100,
+):
+    """List the most recent background jobs"""
+    return jobs.jobs(status=job_status, limit=limit)
+
+
+@router.get("/{job_id}", response_model=models.JobSchema)
+async def get_job(job_id: str, jobs: Annotated[JobQueue, Depends(get_job_queue)]):
+    """Status, progress and result of a background job"""
+    job = jobs.status(job_id)
+    if job is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Job not found")
+    return job
+
+
+@router.post("/{job_id}/cancel", response_model=models.JobSchema)
+async def cancel_job(job_id: str, jobs: Annotated[JobQueue, Depends(get_job_queue)]):
+    """Cancel a background job
+
+    Queued jobs do not start. Running jobs stop before the next file:
+    an import of a single file finishes, a synchronization keeps the
+    files already imported.
+    """
+    job = jobs.cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Job not found")
+    return job
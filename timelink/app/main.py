@@ -18,15 +18,17 @@ To debug
 
 """
 # Standard library imports
+import asyncio
 import logging
 import os
-from datetime import date, timedelta
+from datetime import timedelta
+from functools import partial
 from enum import Enum
 from typing import Annotated, List, Optional
 
 # Third-party imports
 from fastapi import FastAPI, Depends, Request, status
-from fastapi import HTTPException, Query
+from fastapi import HTTPException
 from fastapi.responses import HTMLResponse
 from fastapi.security import OAuth2PasswordBearer
 from fastapi.staticfiles import StaticFiles
@@ -45,13 +47,15 @@ from starlette_admin.views import Link
 from pydantic import BaseModel, Field
 
 from jinja2 import Environment, PackageLoader
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 import uvicorn
 
 # Local application/library specific imports
 from timelink import version
-from timelink.api import crud, models, schemas
+from timelink.api import crud, schemas
 from timelink.api.database import TimelinkDatabase, TimelinkDatabaseSchema, is_valid_postgres_db_name
+from timelink.api.database_engine import dispose_async_engines
 from timelink.api.schemas import EntityAttrRelSchema, ImportStats
 
 from timelink.app.backend.settings import Settings
@@ -69,7 +73,9 @@ from timelink.kleio import (
 from timelink.kleio.importer import import_from_xml
 from timelink.kleio.kleio_server import KleioServer
 from timelink.kleio.schemas import ApiPermissions, KleioFile, TokenInfo
-from timelink.app.dependencies import get_current_active_user, get_db
+from timelink.app.dependencies import get_async_db, get_current_active_user, get_db
+from timelink.app.jobs import router as jobs_router
+from timelink.app.system import router as system_router
 from timelink.app.schemas.user import UserSchema
 
 
@@ -103,6 +109,13 @@ if hasattr(app.state, "webapp") is False or app.state.webapp is None:
     app.state.webapp = webapp
     app.state.status = "Initialized"
 
+@app.on_event("shutdown")
+async def shutdown():
+    """Close the database connections of the web app"""
+    await dispose_async_engines()
+    app.state.webapp.shutdown()
+
+
 # startlette admin app see https://jowilf.github.io/starlette-admin/
 admin = Admin(webapp.users_db.engine,
               title="Timelink Admin",
@@ -115,6 +128,11 @@ admin.add_view(Link(label="Timelink web", icon="fa fa-link", url="/"))
 
 admin.mount_to(app)
 
+# background jobs, /jobs
+app.include_router(jobs_router)
+# system parameters and log, /syspar/ and /syslog
+app.include_router(system_router)
+
 app.mount("/static", StaticFiles(packages=[("timelink")]), name="static")
 
 # this is how to load the templates from inside the package
@@ -138,8 +156,12 @@ async def show_item(request: Request, id: str):
 
 
 @app.post("/web/search/", response_model=List[schemas.SearchResults])
-async def search(search_request: schemas.SearchRequest):
-    """Search for items in the database.
+async def search(search_request: schemas.SearchRequest,
+                 db: Annotated[AsyncSession, Depends(get_async_db)]):
+    """Search for persons by name in the database.
+
+    Names are compared normalized (lowercase, no accents, no particles),
+    see timelink.api.models.person_name.
 
     Args:
         search_request: SearchRequest object
@@ -147,107 +169,35 @@ async def search(search_request: schemas.SearchRequest):
     Returns:
         Search results
     """
-    result1 = schemas.SearchResults(
-        id="jrc",
-        the_class="person",
-        description="Joaquim Carvalho: " + repr(search_request),
-        start_date=date(1958, 5, 24),
-        end_date=date(2023, 1, 4),
-    )
-    result2 = schemas.SearchResults(
-        id="mag",
-        the_class="person",
-        description="Magda Carvalho: " + repr(search_request),
-        start_date=date(1960, 1, 1),
-        end_date=date(2023, 1, 4),
-    )
-    if search_request.q == "jrc":
-        return [result1]
-    if search_request.q == "mag":
-        return [result2]
-    if search_request.q == "both":
-        return [result1, result2]
-    return []
-
-
-@app.post("/syspar/", response_model=models.SysParSchema)
-async def set_syspar(
-    syspar: models.SysParSchema, db: Annotated[TimelinkDatabaseSchema, Depends(get_db)]
-):
-    """Set system parameters
-
-    Args:
-        syspar: SysPar object
-
-    Returns:
-        SysPar object
-    """
-    return crud.set_syspar(db, syspar)
-
-
-@app.get("/syspar/", response_model=list[models.SysParSchema])
-async def get_syspars(
-    db: Annotated[TimelinkDatabaseSchema, Depends(get_db)], # change to get_db
-    q: list[str] | None = Query(
-        default=None,
-        title="Name of system parameter",
-        description="Multiple values allowed," "if empty return all",
-    ),
-):
-    """Get system parameters
-
-    Args:
-        q: query string, multiple values allowed, if empty return all
-
-    """
-
-    return crud.get_syspar(db, q)
-
-
-@app.post("/syslog", response_model=models.SysLogSchema)
-async def set_syslog(syslog: models.SysLogCreateSchema,
-                     db: Annotated[TimelinkDatabaseSchema, Depends(get_db)]):
-    """Set a system log entry"""
-    return crud.set_syslog(db, syslog)
-
-
-@app.get("/syslog", response_model=list[models.SysLogSchema])
-async def get_syslog(
-    db: Annotated[TimelinkDatabaseSchema, Depends(get_db)],
-    nlines: int | None = Query(
-        default=10,
-        title="Get last N lines of log",
-        description="If number of lines not specified" "return last 10",
-    ),
-):
-    """Get log lines
-
-    Args:
-        nlines: number of most recent lines to return
-
-    TODO: add fitler since (minutes, seconds)
-    """
-    result = crud.get_syslog(db, nlines)
-    return result
+    return await crud.search_names_async(db, search_request)
 
 
 @app.get("/sources/import-file/{file_path:path}", response_model=ImportStats)
 async def import_file(file_path: str,
+                      request: Request,
                       db: Annotated[TimelinkDatabaseSchema, Depends(get_db)]):
-    """Import kleio data from xml file"""
-    result = import_from_xml(file_path, db, {"return_stats": True, "mode": "TL"})
+    """Import kleio data from xml file
+
+    The import runs in the worker pool of the web app,
+    other requests are served meanwhile.
+    """
+    webapp: TimelinkWebApp = request.app.state.webapp
+    result = await asyncio.get_running_loop().run_in_executor(
+        webapp.import_executor,
+        partial(import_from_xml, file_path, db, {"return_stats": True, "mode": "TL"}),
+    )
     response = ImportStats(**result)
 
     return response
 
 
 @app.get("/get/{id}", response_model=EntityAttrRelSchema)
-async def get(id: str, db: Annotated[TimelinkDatabaseSchema, Depends(get_db)]):
+async def get(id: str, db: Annotated[AsyncSession, Depends(get_async_db)]):
     """Get entity by id
 
     TODO: needs to check if id is real entity or normal id
     """
-    return crud.get(db, id)
+    return await crud.get_async(db, id)
 
 
 # Kleio server interface
@@ -2,11 +2,12 @@ import os
 import warnings
 from typing import Dict, List
 
-from sqlalchemy import create_engine, select
+from sqlalchemy import select
 from sqlalchemy.orm import sessionmaker, session
 from sqlalchemy_utils import database_exists, create_database
 
 from timelink.api import database
+from timelink.api.database_engine import get_engine
 from timelink import mhk
 from timelink.app.models.user import User, UserProperty, Base
 from timelink.app.models.project import ProjectAccess, Project
@@ -149,7 +150,8 @@ class UserDatabase:
             else:
                 raise ValueError(f"Unknown database type: {db_type}")
 
-        self.engine = create_engine(self.db_url, connect_args=connect_args)
+        # shared with other objects opened on the same database
+        self.engine = get_engine(self.db_url, connect_args=connect_args)
         if not database_exists(self.engine.url):
             create_database(self.engine.url)
         self.session = sessionmaker(autocommit=False, autoflush=False, bind=self.engine)
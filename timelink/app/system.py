@@ -0,0 +1,81 @@
+# flake8: noqa: B008
+"""Endpoints of the system parameters and log of a project database
+
+Endpoints that read are async, with a session from
+:func:`timelink.app.dependencies.get_async_db`; endpoints that write are
+not async, FastAPI runs them in a thread pool with a session from
+:func:`timelink.app.dependencies.get_session`. The project is given by
+the ``project`` query parameter, see :func:`timelink.app.dependencies.get_db`.
+"""
+from typing import Annotated
+
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from timelink.api import crud, models
+from timelink.app.dependencies import get_async_db, get_session
+
+router = APIRouter(tags=["system"])
+
+
+@router.post("/syspar/", response_model=models.SysParSchema)
+def set_syspar(
+    syspar: models.SysParSchema, db: Annotated[Session, Depends(get_session)]
+):
+    """Set system parameters
+
+    Args:
+        syspar: SysPar object
+
+    Returns:
+        SysPar object
+    """
+    return crud.set_syspar(db, syspar)
+
+
+@router.get("/syspar/", response_model=list[models.SysParSchema])
+async def get_syspars(
+    db: Annotated[AsyncSession, Depends(get_async_db)],
+    q: list[str] | None = Query(
+        default=None,
+        title="Name of system parameter",
+        description="Multiple values allowed," "if empty return all",
+    ),
+):
+    """Get system parameters
+
+    Args:
+        q: query string, multiple values allowed, if empty return all
+
+    """
+
+    return await crud.get_syspar_async(db, q)
+
+
+@router.post("/syslog", response_model=models.SysLogSchema)
+def set_syslog(
+    syslog: models.SysLogCreateSchema, db: Annotated[Session, Depends(get_session)]
+):
+    """Set a system log entry"""
+    return crud.set_syslog(db, syslog)
+
+
+@router.get("/syslog", response_model=list[models.SysLogSchema])
+async def get_syslog(
+    db: Annotated[AsyncSession, Depends(get_async_db)],
+    nlines: int | None = Query(
+        default=10,
+        title="Get last N lines of log",
+        description="If number of lines not specified" "return last 10",
+    ),
+):
+    """Get log lines
+
+    Args:
+        nlines: number of most recent lines to return
+
+    TODO: add fitler since (minutes, seconds)
+    """
+    result = await crud.get_syslog_async(db, nlines)
+    return result
@@ -32,7 +32,6 @@ from fastui import FastUI, AnyComponent, components as c
 from fastui.events import GoToEvent
 
 # from timelink.app.backend import settings
-from timelink.api.database import TimelinkDatabase
 from timelink.app.backend.timelink_webapp import TimelinkWebApp
 from timelink.app.models.project import Project, ProjectAccess
 from timelink.app.schemas.user import UserSchema
@@ -182,7 +181,7 @@ async def project_select(
         if access_level is None:
             raise ValueError(f"User {user.name} has no access to project {project_name}")
 
-        project_db = TimelinkDatabase(project.databaseURL)
+        project_db = webapp.get_project_database(project.databaseURL)
         user.current_project_db = project_db
 
     return [c.FireEvent(event=GoToEvent(url='/projects'))]
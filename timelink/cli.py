@@ -6,24 +6,22 @@ Run with  python -m timelink.cli
 
 """
 
+import json
 import os
 import platform
+import threading
+import time
+import warnings
 
-import docker
 import typer
-import uvicorn
 
 from timelink import migrations, version
-from timelink.api.database import (
-    TimelinkDatabase,
-    get_postgres_dbnames,
-    get_postgres_url,
-    get_sqlite_databases,
-    get_sqlite_url,
-)
 from timelink.mhk.utilities import get_mhk_info, is_mhk_installed
 
-server: uvicorn.Server = None  # uvicorn server instance
+# docker, uvicorn and the database module are imported by the
+# commands that use them, to keep the cli start up fast.
+
+server = None  # uvicorn server instance
 
 # get the current directory
 # this is used to find the alembic.ini file
@@ -53,6 +51,8 @@ def cli_header():
 @app.command("start")
 def start():
     """Starts timelink with uvicorn"""
+    import uvicorn
+
     typer.echo("Starting Timelink")
     config = uvicorn.Config("timelink.app.main:app", port=8008, reload=True)
 
@@ -72,12 +72,175 @@ db_index = {}
 db_url = {}
 avoid_db_patterns = ["_users"]
 
+# Database discovery runs the PostgreSQL and SQLite searches concurrently.
+# Results are kept in a small index file so that repeated commands do
+# not need to contact docker or walk the file system again:
+#  - SQLite files are cached with the modification time of each directory
+#    scanned, and reused while none of them changed;
+#  - PostgreSQL database names are cached with the url of the server and
+#    the id of its container, and reused without contacting docker for
+#    DB_INDEX_POSTGRES_MAX_AGE seconds. After that the names are listed
+#    again; the url is kept if the container is the same.
+DB_INDEX_CACHE = os.path.join(os.path.expanduser("~"), ".timelink", "db_index.json")
+DB_INDEX_TIMEOUT = 30  # seconds to wait for each source of databases
+DB_INDEX_POSTGRES_MAX_AGE = 300  # seconds
+
+
+def read_db_index_cache(cache_file=None) -> dict:
+    """Read the database discovery cache, empty if missing or invalid"""
+    if cache_file is None:
+        cache_file = DB_INDEX_CACHE
+    try:
+        with open(cache_file, encoding="utf-8") as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(cache, dict):
+        return {}
+    return cache
+
+
+def write_db_index_cache(cache: dict, cache_file=None):
+    """Write the database discovery cache, errors are ignored"""
+    if cache_file is None:
+        cache_file = DB_INDEX_CACHE
+    try:
+        os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+        tmp_file = f"{cache_file}.{os.getpid()}.tmp"
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            json.dump(cache, f)
+        os.replace(tmp_file, cache_file)
+    except OSError as e:
+        warnings.warn(f"Could not write database index cache: {e}", stacklevel=2)
+
+
+def clear_db_index_cache(cache_file=None):
+    """Remove the database discovery cache"""
+    if cache_file is None:
+        cache_file = DB_INDEX_CACHE
+    try:
+        os.remove(cache_file)
+    except FileNotFoundError:
+        pass
+
+
+def find_sqlite_databases(directory: str, sqlite_cache: dict) -> list[str]:
+    """Find SQLite databases in directory, reusing the cache if still valid
+
+    Args:
+        directory: directory to search
+        sqlite_cache: the "sqlite" section of the cache, updated
+            with the new scan if needed
+    """
+    from timelink.api.database import (
+        scan_sqlite_databases,
+        sqlite_directories_unchanged,
+    )
+
+    directory = os.path.abspath(directory)
+    entry = sqlite_cache.get(directory)
+    if entry is not None and sqlite_directories_unchanged(entry["directories"]):
+        return entry["databases"]
+    databases, directories = scan_sqlite_databases(directory)
+    sqlite_cache[directory] = {"databases": databases, "directories": directories}
+    return databases
+
+
+def find_postgres_databases(postgres_cache: dict) -> list[str]:
+    """Find PostgreSQL databases, reusing the cache if still valid
+
+    For DB_INDEX_POSTGRES_MAX_AGE seconds the cached names are returned
+    without contacting docker. After that the names are listed again,
+    and the url of the server is kept if the container did not change.
+
+    Args:
+        postgres_cache: the "postgres" section of the cache, updated
+            with the new list, the url of the server ("url") and the
+            id of its container if needed
+    """
+    from timelink.api.database import (
+        get_postgres_container,
+        get_postgres_dbnames,
+        get_postgres_url,
+        is_postgres_running,
+    )
+
+    if postgres_cache and "url" in postgres_cache:
+        age = time.time() - postgres_cache["time"]
+        if age < DB_INDEX_POSTGRES_MAX_AGE:
+            return postgres_cache["databases"]
+    server_url = None
+    if postgres_cache and is_postgres_running():
+        if postgres_cache.get("container") == get_postgres_container().id:
+            server_url = postgres_cache.get("url")
+    # starts the server if needed
+    dbnames = get_postgres_dbnames()
+    if server_url is None:
+        # user and password are fetched once, not for every database
+        server_url = get_postgres_url("")
+    postgres_cache.update({
+        "container": get_postgres_container().id,
+        "url": server_url,
+        "time": time.time(),
+        "databases": dbnames,
+    })
+    return dbnames
+
+
+def _run_with_timeout(jobs: dict, timeout: float) -> dict:
+    """Run functions concurrently, return results of those finished in time
 
-def create_db_index(avoid_patterns=None):
+    Args:
+        jobs: dictionary of name: function without arguments
+        timeout: seconds to wait for all functions
+
+    Returns:
+        dict: name: result for the functions that finished without error
+
+    Jobs that fail or time out are reported with a warning.
+    Threads are daemons, a job that times out does not
+    prevent the command from exiting.
+    """
+    results = {}
+    errors = {}
+
+    def run(name, func):
+        try:
+            results[name] = func()
+        except Exception as e:  # pylint: disable=broad-except
+            errors[name] = e
+
+    threads = [
+        threading.Thread(target=run, args=(name, func), daemon=True)
+        for name, func in jobs.items()
+    ]
+    for thread in threads:
+        thread.start()
+    deadline = time.monotonic() + timeout
+    for thread in threads:
+        thread.join(max(0, deadline - time.monotonic()))
+    for name in jobs:
+        if name in errors:
+            warnings.warn(f"Could not list {name} databases: {errors[name]}", stacklevel=3)
+        elif name not in results:
+            warnings.warn(
+                f"Listing {name} databases timed out after {timeout} seconds", stacklevel=3
+            )
+    return {name: results[name] for name in jobs if name in results}
+
+
+def create_db_index(avoid_patterns=None, timeout=DB_INDEX_TIMEOUT, use_cache=True):
     """Create a dictionary of databases
 
+    PostgreSQL and SQLite databases are searched concurrently.
+    A source that fails or does not answer in timeout seconds is
+    skipped with a warning.
+
     Args:
         avoid_patterns (list): list of patterns to avoid in the database name
+        timeout (float): seconds to wait for each source of databases
+        use_cache (bool): reuse results of previous calls if still valid,
+                    see DB_INDEX_CACHE
 
     Returns:
         dict: dictionary of databases, key is an integer,
@@ -85,13 +248,36 @@ def create_db_index(avoid_patterns=None):
                     (db_type, db_name, db_url)
 
     """
-    pgsql_dbs = get_postgres_dbnames()
-    postgres_list = [("postgres", db, get_postgres_url(db)) for db in sorted(pgsql_dbs)]
+    from timelink.api.database import get_sqlite_url
+
+    cache = read_db_index_cache() if use_cache else {}
+    # each job updates its own copy, a job that times out
+    # may still be running when the cache is written
+    sections = {
+        "postgres": dict(cache.get("postgres", {})),
+        "sqlite": dict(cache.get("sqlite", {})),
+    }
+    found = _run_with_timeout(
+        {
+            "postgres": lambda: find_postgres_databases(sections["postgres"]),
+            "sqlite": lambda: find_sqlite_databases(
+                current_working_directory, sections["sqlite"]
+            ),
+        },
+        timeout,
+    )
+    if use_cache:
+        cache.update({name: sections[name] for name in found})
+        write_db_index_cache(cache)
+
+    postgres_list = []
+    pgsql_dbs = found.get("postgres", [])
+    if pgsql_dbs:
+        server_url = sections["postgres"]["url"]
+        postgres_list = [("postgres", db, f"{server_url}{db}") for db in sorted(pgsql_dbs)]
     sqlite_list = [
         ("sqlite", os.path.basename(db), get_sqlite_url(db))
-        for db in sorted(
-            get_sqlite_databases(current_working_directory, relative_path=False)
-        )
+        for db in sorted(found.get("sqlite", []))
     ]
     all_dbs = postgres_list + sqlite_list
     if avoid_patterns:
@@ -156,6 +342,8 @@ def db_current_cmd(
 @db_app.command("upgrade")
 def db_upgrade_cmd(db_url: str, revision: str = "heads"):
     """Update database to (most recent) revision"""
+    from timelink.api.database import TimelinkDatabase
+
     db_url = parse_db_url(db_url)
     TimelinkDatabase(db_url=db_url)
     migrations.upgrade(db_url, revision)
@@ -165,7 +353,10 @@ def db_upgrade_cmd(db_url: str, revision: str = "heads"):
 @db_app.command("create")
 def db_create_cmd(db_url: str = typer.Argument(..., help="Database URL")):  # noqa: B008
     """Create a new database"""
+    from timelink.api.database import TimelinkDatabase
+
     TimelinkDatabase(db_url=db_url)
+    clear_db_index_cache()
     typer.echo(f"Database {db_url} created")
 
 
@@ -228,6 +419,8 @@ def mhk_version():
     Demonstrates how to access MHK installation files and
     usage of Docker API
     """
+    import docker
+
     if is_mhk_installed():
         mhk_info = get_mhk_info()
 
@@ -257,6 +450,8 @@ def mhk_version():
 @mhk_app.command(name="status")
 def mhk_status():
     """shows docker status information"""
+    import docker
+
     client = docker.from_env()
     dinfo = client.info()
     typer.echo(
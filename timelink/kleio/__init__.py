@@ -1,6 +1,6 @@
 # flake8: noqa: F401
+import importlib
 from typing import List
-from .kleio_server import KleioServer
 from .schemas import KleioFile
 from .schemas import ApiPermissions, TokenInfo
 from .schemas import translation_status_enum
@@ -24,3 +24,19 @@ token_info_normal: TokenInfo = TokenInfo(
     structures="structures/reference_sources",
     sources="sources/reference_sources",
 )
+
+# imported on first use, kleio_server loads docker and requests,
+# async_kleio_server loads httpx
+_lazy_attributes = {
+    "KleioServer": ".kleio_server",
+    "AsyncKleioServer": ".async_kleio_server",
+}
+
+
+def __getattr__(name):
+    if name in _lazy_attributes:
+        module = importlib.import_module(_lazy_attributes[name], __name__)
+        value = getattr(module, name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,231 @@
+"""Asyncio client for the Kleio Server.
+
+AsyncKleioServer mirrors the request methods of
+:class:`timelink.kleio.kleio_server.KleioServer` as coroutines, so that
+many translations, reports and sources can be requested concurrently.
+It does not manage docker containers: start or attach to a server with
+KleioServer and use :meth:`AsyncKleioServer.from_server`.
+
+Example::
+
+    kserver = KleioServer.start(kleio_home=...)
+    async with AsyncKleioServer.from_server(kserver) as aks:
+        files = await aks.get_translations("projects/p/sources", status="V")
+        reports = await aks.get_reports(files)
+
+The number of requests in flight is limited by max_concurrency.
+An instance must be used in a single event loop.
+"""
+
+import asyncio
+
+import httpx
+from jsonrpcclient import Error, Ok, parse, request
+
+from .kleio_server import KleioServer, KleioServerException, rpc_exception
+from .schemas import KleioFile
+
+
+class AsyncKleioServer:
+    """Asyncio interface to the JSON-RPC api and files of a Kleio Server
+
+    Args:
+        url (str): kleio server url
+        token (str): kleio server token
+        kleio_home (str, optional): kleio server home directory
+        call_timeout (int | float): default request timeout in seconds
+        max_concurrency (int): maximum number of requests in flight
+        retries (int): retries of requests that failed to connect
+    """
+
+    def __init__(
+        self,
+        url: str,
+        token: str,
+        kleio_home: str | None = None,
+        call_timeout: int | float = 60,
+        max_concurrency: int = 8,
+        retries: int = 3,
+    ):
+        self.url = url
+        self.kleio_admin_token = token
+        self.kleio_home = kleio_home
+        self.call_timeout = call_timeout
+        self.max_concurrency = max_concurrency
+        self.retries = retries
+        self._client: httpx.AsyncClient | None = None
+        self._semaphore: asyncio.Semaphore | None = None
+
+    @classmethod
+    def from_server(cls, kserver: KleioServer, **kwargs) -> "AsyncKleioServer":
+        """Create an async client for the server of a KleioServer object
+
+        Args:
+            kserver (KleioServer): a started or attached Kleio Server
+            **kwargs: max_concurrency, retries, call_timeout
+        """
+        kwargs.setdefault("call_timeout", kserver.call_timeout)
+        return cls(
+            kserver.get_url(), kserver.get_token(), kserver.get_kleio_home(), **kwargs
+        )
+
+    def __str__(self):
+        return f"AsyncKleioServer(url={self.url}, kleio_home={self.kleio_home})"
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.aclose()
+
+    async def aclose(self):
+        """Close the connections to the Kleio Server"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            limits = httpx.Limits(
+                max_connections=self.max_concurrency,
+                max_keepalive_connections=self.max_concurrency,
+            )
+            self._client = httpx.AsyncClient(
+                transport=httpx.AsyncHTTPTransport(retries=self.retries, limits=limits),
+                timeout=self.call_timeout,
+            )
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._client
+
+    def _headers(self, token: str | None) -> dict:
+        if token is None:
+            token = self.kleio_admin_token
+        return {"Authorization": f"Bearer {token}"}
+
+    async def call(
+        self,
+        method: str,
+        params: dict,
+        token: str | None = None,
+        timeout: int | float | None = None,
+    ):
+        """Call kleio server API, see :meth:`KleioServer.call`"""
+        if token is None:
+            token = self.kleio_admin_token
+        rpc = request(method, params={**params, "token": token})
+        if timeout is None:
+            timeout = self.call_timeout
+        client = self._get_client()
+        async with self._semaphore:
+            response = await client.post(
+                f"{self.url}/json/",
+                json=rpc,
+                headers=self._headers(token),
+                timeout=timeout,
+            )
+        parsed = parse(response.json())
+        if isinstance(parsed, Ok):
+            return parsed.result
+        if isinstance(parsed, Error):
+            raise rpc_exception(parsed)
+        raise KleioServerException(f"Unexpected answer to {method}: {response.text}")
+
+    async def get_translations(
+        self,
+        path: str,
+        recurse: str | bool = True,
+        status: str | None = None,
+        token: str | None = None,
+    ) -> list[KleioFile]:
+        """Get translation status, see :meth:`KleioServer.get_translations`"""
+        if recurse is True:
+            recurse = "yes"
+        elif recurse is False:
+            recurse = "no"
+        pars = {"path": "" if path is None else str(path), "recurse": recurse}
+        if status is not None:
+            pars["status"] = status
+        translations = await self.call("translations_get", pars, token=token)
+        return [KleioFile.model_validate(t) for t in translations]
+
+    async def translate(
+        self, path: str, recurse: str | bool = "yes", spawn: str = "yes", token=None
+    ):
+        """Translate sources, see :meth:`KleioServer.translate`"""
+        if recurse is True:
+            recurse = "yes"
+        elif recurse is False:
+            recurse = "no"
+        pars = {"path": path}
+        if recurse is not None:
+            pars["recurse"] = recurse
+        if spawn is not None:
+            pars["spawn"] = spawn
+        return await self.call("translations_translate", pars, token=token)
+
+    async def get_url_content(
+        self, server_url: str, token=None, timeout: int | float = 30
+    ) -> str:
+        """Get content from Kleio Server, see :meth:`KleioServer.get_url_content`"""
+        return (await self.get_url_bytes(server_url, token, timeout)).decode("utf-8")
+
+    async def get_url_bytes(
+        self, server_url: str, token=None, timeout: int | float = 30
+    ) -> bytes:
+        """Get content from Kleio Server without decoding, e.g. xml files"""
+        client = self._get_client()
+        async with self._semaphore:
+            response = await client.get(
+                server_url, headers=self._headers(token), timeout=timeout
+            )
+        response.raise_for_status()
+        return response.content
+
+    def _server_url(self, url: str) -> str:
+        if not url.startswith("/"):
+            url = f"/{url}"
+        return f"{self.url}{url}"
+
+    async def get_report(
+        self, rpt_url: str | KleioFile | None, token=None
+    ) -> str | None:
+        """Get report from kleio server, see :meth:`KleioServer.get_report`"""
+        if isinstance(rpt_url, KleioFile):
+            rpt_url = rpt_url.rpt_url
+        if rpt_url is None:
+            return None
+        return await self.get_url_content(self._server_url(rpt_url), token=token)
+
+    async def get_source(self, src: str | KleioFile, token=None) -> str:
+        """Get the text of a source, see :meth:`KleioServer.get_source`"""
+        url = src.source_url if isinstance(src, KleioFile) else src
+        return await self.get_url_content(self._server_url(url), token=token)
+
+    async def get_xml(self, kfile: str | KleioFile, token=None) -> bytes:
+        """Get the xml translation of a source"""
+        url = kfile.xml_url if isinstance(kfile, KleioFile) else kfile
+        return await self.get_url_bytes(self._server_url(url), token=token)
+
+    # Concurrent versions, results in the order of the arguments
+
+    async def translate_many(
+        self, paths: list[str], recurse: str | bool = "no", spawn: str = "no", token=None
+    ) -> list:
+        """Request the translation of several paths concurrently"""
+        return await asyncio.gather(
+            *[self.translate(p, recurse=recurse, spawn=spawn, token=token) for p in paths]
+        )
+
+    async def get_reports(
+        self, files: list[str | KleioFile], token=None
+    ) -> list[str | None]:
+        """Get the reports of several files concurrently"""
+        return await asyncio.gather(*[self.get_report(f, token=token) for f in files])
+
+    async def get_sources(self, files: list[str | KleioFile], token=None) -> list[str]:
+        """Get the text of several sources concurrently"""
+        return await asyncio.gather(*[self.get_source(f, token=token) for f in files])
+
+    async def get_url_contents(self, urls: list[str], token=None) -> list[str]:
+        """Get content of several urls concurrently"""
+        return await asyncio.gather(*[self.get_url_content(u, token=token) for u in urls])
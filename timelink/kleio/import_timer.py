@@ -0,0 +1,143 @@
+"""Time spent in each stage of an import.
+
+The :class:`KleioHandler` keeps an :class:`ImportTimer` and marks the
+stages of the import with it; the times end up in the stats returned by
+:func:`timelink.kleio.importer.import_from_xml`:
+
+    * parse: reading the xml, outside groups;
+    * group_build: reading the xml of groups into KGroup objects;
+    * new_group: finding the class mapping of each group;
+    * store_group: creating entities from groups (kgroup_to_entity)
+      and adding them to the session, including the queries to check
+      if they exist;
+    * flush and commit: writing to the database;
+    * new_class, save_source_context, end_source, same_as,
+      attach_to_rentity, postponed_relations, restore_source_context,
+      end_file: the other steps of the import.
+
+Stages nest and times are exclusive: a commit done while storing a group
+counts as commit, not as store_group, so that the times add up to the
+duration of the import.
+
+If a tracer is given, e.g. ``opentelemetry.trace.get_tracer("timelink")``,
+the import and its coarser stages are also reported as spans.
+"""
+
+import time
+from contextlib import contextmanager, nullcontext
+
+from sqlalchemy import event
+
+
+class ImportTimer:
+    """Exclusive time and number of calls of the stages of an import
+
+    Args:
+        tracer (optional): an OpenTelemetry tracer, or any object with a
+            ``start_as_current_span(name, attributes=...)`` context manager
+    """
+
+    def __init__(self, tracer=None):
+        self.tracer = tracer
+        self.seconds: dict[str, float] = {}
+        self.calls: dict[str, int] = {}
+        # stages running, innermost last: [name, time it (re)started]
+        self._stack: list[list] = []
+        self._session = None
+
+    def start(self, name: str):
+        """Start a stage, pausing the current one"""
+        now = time.perf_counter()
+        if self._stack:
+            self._add(self._stack[-1], now)
+        self._stack.append([name, now])
+        self.calls[name] = self.calls.get(name, 0) + 1
+
+    def stop(self, name: str):
+        """Stop the innermost stage with this name, and any stage inside it
+
+        Stages left open by an exception are closed by the stage that
+        contains them. Stopping a stage that is not running does nothing.
+        """
+        if not any(frame[0] == name for frame in self._stack):
+            return
+        now = time.perf_counter()
+        while self._stack:
+            frame = self._stack.pop()
+            self._add(frame, now)
+            if frame[0] == name:
+                break
+        if self._stack:
+            self._stack[-1][1] = now
+
+    def _add(self, frame, now):
+        name, started = frame
+        self.seconds[name] = self.seconds.get(name, 0.0) + now - started
+
+    @contextmanager
+    def stage(self, name: str, span: bool = False, **attributes):
+        """Time a block of code as a stage
+
+        Args:
+            name (str): name of the stage
+            span (bool): also report the block as a span to the tracer
+            **attributes: attributes of the span
+        """
+        span_context = self.span(f"timelink.import.{name}", **attributes) if span else nullcontext()
+        with span_context:
+            self.start(name)
+            try:
+                yield
+            finally:
+                self.stop(name)
+
+    def span(self, name: str, **attributes):
+        """Report a block of code as a span if there is a tracer, without timing it"""
+        if self.tracer is None:
+            return nullcontext()
+        return self.tracer.start_as_current_span(name, attributes=attributes)
+
+    def watch_session(self, session):
+        """Time the flushes and commits of a session as stages"""
+        self._session = session
+        event.listen(session, "before_flush", self._before_flush)
+        event.listen(session, "after_flush_postexec", self._after_flush)
+        event.listen(session, "before_commit", self._before_commit)
+        event.listen(session, "after_commit", self._after_commit)
+        event.listen(session, "after_rollback", self._after_rollback)
+
+    def unwatch_session(self):
+        """Stop timing the session given to watch_session"""
+        session, self._session = self._session, None
+        if session is None:
+            return
+        event.remove(session, "before_flush", self._before_flush)
+        event.remove(session, "after_flush_postexec", self._after_flush)
+        event.remove(session, "before_commit", self._before_commit)
+        event.remove(session, "after_commit", self._after_commit)
+        event.remove(session, "after_rollback", self._after_rollback)
+
+    def _before_flush(self, session, flush_context, instances):
+        self.start("flush")
+
+    def _after_flush(self, session, flush_context):
+        self.stop("flush")
+
+    def _before_commit(self, session):
+        self.start("commit")
+
+    def _after_commit(self, session):
+        self.stop("commit")
+
+    def _after_rollback(self, session):
+        self.stop("commit")
+        self.stop("flush")
+
+    def as_dict(self) -> dict:
+        """Return {stage: {"seconds": float, "calls": int}}, slowest first"""
+        return {
+            name: {"seconds": seconds, "calls": self.calls.get(name, 0)}
+            for name, seconds in sorted(
+                self.seconds.items(), key=lambda item: item[1], reverse=True
+            )
+        }
@@ -6,18 +6,25 @@ from datetime import datetime
 from pathlib import Path
 from typing import Union
 import platform
-import urllib.request
 
 from sqlalchemy.orm import Session
-from sqlalchemy import func
 from xml.sax import make_parser
 
 from .sax_handler import SaxHandler
-from .kleio_handler import KleioHandler
+from .kleio_handler import ImportCancelled, KleioHandler
+from .schemas import KleioFile
+from .xml_source import (
+    DEFAULT_CHUNK_SIZE,
+    DEFAULT_READ_TIMEOUT,
+    ContentHash,
+    XmlCache,
+    parse_url,
+    xml_cache_key,
+)
 
 
 def import_from_xml(
-    filespec: Union[str, Path], session: Session, options: dict = None
+    filespec: Union[str, Path, KleioFile], session: Session, options: dict = None
 ) -> dict:
     """Import data from file or url into a timelink-mhk database.
 
@@ -25,7 +32,9 @@ def import_from_xml(
     translator.
 
     Arguments:
-        filespec (str,Path): a file path, URL of a data file or path in a Kleio Server.
+        filespec (str,Path,KleioFile): a file path, URL of a data file or path in a Kleio Server.
+            A KleioFile is read from its xml_url, and cached with a key that
+            changes when it is translated again.
         session: a database session from TimelinkDatabase.session()
         options (dict): a dictionnary with options
 
@@ -33,12 +42,40 @@ def import_from_xml(
            - 'kleio_url':  the url of kleio server;
            - 'kleio_token':  the authorization token for the kleio server.
            - 'mode':  the mode of the import, either 'TL'(Timelink) or 'MHK'
+           - 'read_timeout': seconds to wait for data when downloading,
+             defaults to 60
+           - 'xml_cache': a XmlCache or directory where downloaded files
+             are kept, see :mod:`timelink.kleio.xml_source`
+           - 'cache_key': key of this version of the file in the cache,
+             required with xml_cache unless filespec is a KleioFile, see
+             :func:`timelink.kleio.xml_source.xml_cache_key`
+           - 'incremental': if True sources already in the database are
+             updated, not replaced: only new, changed and removed entities
+             are written, see :class:`KleioHandler`. Defaults to False.
+           - 'progress': a function called during the import with a dict
+             with the groups processed, groups per second, errors and
+             warnings, see :meth:`KleioHandler.get_progress`
+           - 'progress_interval': minimum seconds between calls to
+             progress, defaults to 1
+           - 'cancel_event': a threading.Event; if it is set before the
+             import starts, it raises :class:`ImportCancelled`. An import
+             that started is not interrupted, see :class:`KleioHandler`
+           - 'slow_group_seconds': groups that take longer to store are
+             logged, defaults to 1, None to disable
+           - 'tracer': an OpenTelemetry tracer; the import and its main
+             stages are reported as spans
 
         If kleio_url and kleio_token are specified the data will be fetched from
         a KleioServer and the filespec should contain the "xml_path" of the file
         in the server (e.g. /rest/exports/reference_sources/varia/vereacao.xml) and
         the kleio_token will be inserted in the header for autentication
 
+        Downloads are compressed and parsed as they arrive.
+
+        The content hash of the file, which ignores the date of translation,
+        is stored in KleioImportedFile.content_hash so that translations
+        that produce the same xml can be detected.
+
     Returns:
         If stats is True in options a dict with statistical information will be
         returned.
@@ -47,11 +84,19 @@ def import_from_xml(
             - 'machine':  local machine name
             - 'file': path to imported file or url
             - 'import_time_seconds':  elapsed time during import
-            - 'entities_processed': number of entities processed
+            - 'entities_processed': number of groups stored
             - 'entity_rate': number of entities processed per second
-            - 'person_rate': number of persons (entities of class 'person')
+            - 'person_rate': number of persons (groups of class 'person')
+              processed per second
             - 'nerrors': number of errors during import
             - 'errors': list of error messages
+            - 'content_hash': hash of the xml, see :class:`ContentHash`
+            - 'incremental': in incremental imports, number of entities
+              inserted, updated, unchanged and deleted
+            - 'stages': seconds and calls of each stage of the import,
+              see :mod:`timelink.kleio.import_timer`
+            - 'group_counts': number of groups stored, by class
+            - 'slow_groups': groups slower than slow_group_seconds
 
     Examples:
         Returned statistical information when stats=True
@@ -75,8 +120,6 @@ def import_from_xml(
     kleio_url = None
     kleio_token = None
     mode = "TL"  # determines the database model TL=Timelink, MHK=MHK
-    nentities_before = 0
-    npersons_before = 0
     now = datetime.now()
     if options is not None and options.get("return_stats", False):
         collect_stats = True
@@ -86,60 +129,154 @@ def import_from_xml(
         kleio_url = options.get("kleio_url")
     if options is not None and options.get("kleio_token", None) is not None:
         kleio_token = options.get("kleio_token")
+    if options is None:
+        options = {}
+    read_timeout = options.get("read_timeout", DEFAULT_READ_TIMEOUT)
+    xml_cache = options.get("xml_cache", None)
+    if xml_cache is not None and not isinstance(xml_cache, XmlCache):
+        xml_cache = XmlCache(xml_cache)
+    cache_key = options.get("cache_key", None)
+    if isinstance(filespec, KleioFile):
+        if cache_key is None:
+            cache_key = xml_cache_key(filespec)
+        filespec = filespec.xml_url
+
+    incremental = options.get("incremental", False)
 
-    kleio_handler = KleioHandler(session, mode=mode)
+    progress = options.get("progress", None)
+    cancel_event = options.get("cancel_event", None)
+    if cancel_event is not None and cancel_event.is_set():
+        raise ImportCancelled(f"Import of {filespec} cancelled")
+
+    kleio_handler = KleioHandler(
+        session,
+        mode=mode,
+        incremental=incremental,
+        progress=progress,
+        progress_interval=options.get("progress_interval", 1.0),
+        slow_group_seconds=options.get("slow_group_seconds", 1.0),
+        tracer=options.get("tracer", None),
+    )
     sax_handler = SaxHandler(kleio_handler)
     parser = make_parser()
     parser.setContentHandler(sax_handler)
+    content_hash = ContentHash()
     start = time.time()
-    if collect_stats:
-        nentities_before = session.query(
-            func.count(kleio_handler.entity_model.id)  # pylint: disable=not-callable
-        ).scalar()
-        npersons_before = session.query(
-            func.count(kleio_handler.person_model.id)  # pylint: disable=not-callable
-        ).scalar()
+    timer = kleio_handler.timer
+    timer.watch_session(session)
+    try:
+        with timer.span("timelink.import", file=str(filespec)):
+            timer.start("parse")
+            content_hash = _parse_source(
+                parser, filespec, kleio_url, kleio_token, xml_cache, cache_key,
+                read_timeout, content_hash,
+            )
+            timer.stop("parse")
 
-    if kleio_url is not None and kleio_token is not None:
-        headers = {"Authorization": f"Bearer {kleio_token}"}
-        server_url = f"{kleio_url}{filespec}"
-        req = urllib.request.Request(server_url, headers=headers)
-        with urllib.request.urlopen(req, timeout=30) as source:
-            parser.parse(source)
-    elif kleio_token is not None or kleio_url is not None:
-        # this means that one of the options is missing
-        raise ValueError(
-            "Both kleio_url and kleio_token must be specified to fetch from kleio server"
-        )
-    elif isinstance(filespec, os.PathLike):
-        source = os.fspath(filespec)
-        parser.parse(source)
-    else:
-        source = filespec
-        parser.parse(source)
+            if content_hash is not None and kleio_handler.kleio_file is not None:
+                imported_file = session.get(
+                    kleio_handler.kleio_file_model, kleio_handler.kleio_file
+                )
+                if imported_file is not None and hasattr(imported_file, "content_hash"):
+                    imported_file.content_hash = content_hash.hexdigest()
+                    session.commit()
+    finally:
+        timer.unwatch_session()
+
+    if progress is not None:
+        progress(kleio_handler.get_progress())
 
     end = time.time()
     if collect_stats:
         machine = platform.node()
-        nentities = session.query(func.count(kleio_handler.entity_model.id)).scalar()  # pylint: disable=not-callable
-        npersons = session.query(func.count(kleio_handler.person_model.id)).scalar()  # pylint: disable=not-callable
-        erate = (nentities - nentities_before) / (end - start)
-        prate = (npersons - npersons_before) / (end - start)
+        nentities = sum(kleio_handler.group_counts.values())
+        npersons = kleio_handler.group_counts.get("person", 0)
+        erate = nentities / (end - start)
+        prate = npersons / (end - start)
         stats = {
             "datetime": now.timestamp(),
             "machine": machine,
             "database": session.bind.url,
             "file": filespec,
             "import_time_seconds": end - start,
-            "entities_processed": nentities - nentities_before,
+            "entities_processed": nentities,
             "entity_rate": erate,
             "person_rate": prate,
             "nerrors": len(kleio_handler.errors),
             "errors": kleio_handler.errors,
+            "content_hash": content_hash.hexdigest() if content_hash else None,
+            "stages": timer.as_dict(),
+            "group_counts": dict(kleio_handler.group_counts),
+            "slow_groups": list(kleio_handler.slow_groups),
         }
+        if kleio_handler.incremental:
+            stats["incremental"] = dict(kleio_handler.import_counts)
         return stats
 
 
+def _parse_source(
+    parser, filespec, kleio_url, kleio_token, xml_cache, cache_key, read_timeout, content_hash
+):
+    """Parse a file, url or file in a Kleio server
+
+    Returns:
+        the content hash, None if the source could not be hashed
+    """
+    if kleio_url is not None and kleio_token is not None:
+        server_url = f"{kleio_url}{filespec}"
+        parse_url(
+            parser,
+            server_url,
+            token=kleio_token,
+            cache=xml_cache,
+            cache_key=cache_key,
+            read_timeout=read_timeout,
+            content_hash=content_hash,
+        )
+    elif kleio_token is not None or kleio_url is not None:
+        # this means that one of the options is missing
+        raise ValueError(
+            "Both kleio_url and kleio_token must be specified to fetch from kleio server"
+        )
+    elif isinstance(filespec, str) and filespec.startswith(("http://", "https://")):
+        parse_url(
+            parser,
+            filespec,
+            cache=xml_cache,
+            cache_key=cache_key,
+            read_timeout=read_timeout,
+            content_hash=content_hash,
+        )
+    elif not _parse_file(parser, filespec, content_hash):
+        return None
+    return content_hash
+
+
+def _parse_file(parser, source, content_hash: ContentHash) -> bool:
+    """Feed a file or stream to the parser, updating the content hash
+
+    Returns:
+        False if the source could not be hashed, e.g. a xml.sax InputSource,
+        and was given to the parser as is.
+    """
+    if isinstance(source, os.PathLike) or (
+        isinstance(source, str) and os.path.isfile(source)
+    ):
+        with open(source, "rb") as f:
+            return _parse_file(parser, f, content_hash)
+    if not hasattr(source, "read"):
+        parser.parse(source)
+        return False
+    while chunk := source.read(DEFAULT_CHUNK_SIZE):
+        if isinstance(chunk, str):
+            content_hash.update(chunk.encode("utf-8"))
+        else:
+            content_hash.update(chunk)
+        parser.feed(chunk)
+    parser.close()
+    return True
+
+
 if (
     __name__ == "__main__"
 ):  # Not sure this works, where is the session for KleioHandler?
@@ -1,10 +1,13 @@
 import copy
+import hashlib
+import json
 import logging
+import time
 from datetime import datetime, timezone
 from enum import Enum
 from typing import List
 
-from sqlalchemy import delete, text
+from sqlalchemy import delete, inspect, select, text, update
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 
@@ -16,6 +19,11 @@ from timelink.api.models.base import REntity
 from timelink.api.models.base_mappings import (
     pom_som_base_mappings as pom_som_base_mappingsTL,
 )
+from timelink.api.models.entity_digest import (
+    delete_entity_digests,
+    source_entity_digests,
+    store_entity_digests,
+)
 from timelink.api.models.pom_som_mapper import (
     PomClassAttributes as PomClassAttributesTL,
 )
@@ -25,6 +33,7 @@ from timelink.api.models.rentity import Link as LinkTL
 from timelink.api.models.rentity import REntity as REntityTL
 from timelink.api.models.system import KleioImportedFile as KleioFileTL
 from timelink.kleio.groups import KGroup
+from timelink.kleio.import_timer import ImportTimer
 from timelink.mhk.models.db import pom_som_base_mappings as pom_som_base_mappingsMHK
 from timelink.mhk.models.entity import Entity as EntityMHK
 from timelink.mhk.models.person import Person as PersonMHK
@@ -36,6 +45,10 @@ from timelink.mhk.models.relation import Relation as RelationMHK
 from timelink.mhk.models.system import KleioImportedFile as KleioFileMHK
 
 
+# elements with the position of a group in the file, not part of its content
+POSITION_ELEMENTS = ("line", "level", "order")
+
+
 class KleioContext(Enum):
     """Kleio context enumeration"""
 
@@ -49,6 +62,10 @@ class KleioContext(Enum):
     ORIGINAL = 8
 
 
+class ImportCancelled(Exception):
+    """Raised when an import is cancelled before it starts a file"""
+
+
 class KleioHandler:
     """This class handles the import of data from a Kleio XML file into a Timelink database.
 
@@ -61,6 +78,26 @@ class KleioHandler:
         newClass:  definition of a new class (mapping between SOM and POM)
         newGroup:  a new kleio Group
         newRelation:  a new meta relation between kleio groups such as same_as
+
+    A digest of the content of each group is stored with the entity
+    (see :mod:`timelink.api.models.entity_digest`). In incremental imports
+    a source already in the database is not deleted and inserted again:
+    each group is compared with the stored entity, only new and changed
+    entities are written and entities no longer in the source are deleted.
+    Unchanged entities keep their links to real entities. Sources imported
+    before digests were stored are imported in full.
+
+    Long imports can be followed with a progress callback, called at most
+    every progress_interval seconds with the dict of :meth:`get_progress`.
+    An import is not stopped in the middle of a file: groups are committed
+    as they are stored and the previous version of a source is deleted
+    when the new one starts, so a partial import would leave a partial
+    source. Imports are cancelled between files, see import_from_xml.
+
+    The time spent in each stage of the import is kept in timer, see
+    :mod:`timelink.kleio.import_timer`, and the groups stored in
+    group_counts, by class. Groups that take more than slow_group_seconds
+    to store are logged and kept in slow_groups.
     """
 
     pom_som_base_mappings = None
@@ -86,16 +123,49 @@ class KleioHandler:
     pom_som_cache = dict()
     kleio_file_is_aregister = False
 
-    def __init__(self, session: Session, mode="TL", user="user"):
+    def __init__(
+        self,
+        session: Session,
+        mode="TL",
+        user="user",
+        incremental=False,
+        progress=None,
+        progress_interval=1.0,
+        slow_group_seconds=1.0,
+        tracer=None,
+    ):
         """
         Arguments:
             session: a SQLAlchemy session
             mode: the mode of the import, either 'TL'(Timelink) or 'MHK'
             user: the user that is importing the data, used for same as ownership
+            incremental: if True, write only the entities that changed since the
+                last import of each source. Only in 'TL' mode.
+            progress: a function called with the progress of the import
+            progress_interval: minimum seconds between calls to progress
+            slow_group_seconds: groups taking longer than this are logged,
+                None to disable
+            tracer: an OpenTelemetry tracer for spans of the import stages
 
         """
         self.session = session
+        self.progress = progress
+        self.progress_interval = progress_interval
+        self.started = time.time()
+        self.last_progress = self.started
+        self.groups_processed = 0
+        self.timer = ImportTimer(tracer)
+        self.group_counts = {}
+        self.slow_group_seconds = slow_group_seconds
+        self.slow_groups = []
         self.user = user
+        self.incremental = incremental and mode == "TL"
+        self.class_digests = {}
+        self.new_digests = {}
+        self.diff_source = False
+        self.source_entities = {}
+        self.seen_ids = set()
+        self.import_counts = dict.fromkeys(["inserted", "updated", "unchanged", "deleted"], 0)
         self.kleio_file_is_aregister = False
         self.kleio_source_id = None
         self.aregister_id = None
@@ -222,36 +292,38 @@ class KleioHandler:
 
         # save the links that are going to be affected by the reimport
         for link_id in [link.id for link in xlinks]:
-            link = self.session.get(self.link_model, link_id)
+            self.backup_link(self.session.get(self.link_model, link_id))
+
+        # maybe not useful
+        self.xlinks[source_id] = xlinks
 
-            # find a blink for the same rid, entity and user
-            # if it exists we do not create a new one
+    def backup_link(self, link):
+        """Save a link to a real entity as a blink, before its entity is deleted"""
+        # find a blink for the same rid, entity and user
+        # if it exists we do not create a new one
 
-            blink = (
-                self.session.query(BLinkTL)
-                .filter(
-                    BLinkTL.rid == link.rid,
-                    BLinkTL.entity == link.entity,
-                    BLinkTL.user == link.user,
-                )
-                .first()
+        blink = (
+            self.session.query(BLinkTL)
+            .filter(
+                BLinkTL.rid == link.rid,
+                BLinkTL.entity == link.entity,
+                BLinkTL.user == link.user,
             )
+            .first()
+        )
 
-            if blink is None:
-                # create a blink with the link information
-                blink = BLinkTL(
-                    rid=link.rid,
-                    entity=link.entity,
-                    user=link.user,
-                    rule=link.rule,
-                    status=link.status,
-                    source=link.source,
-                )
-            self.session.add(blink)
-            self.session.commit()
-
-        # maybe not useful
-        self.xlinks[source_id] = xlinks
+        if blink is None:
+            # create a blink with the link information
+            blink = BLinkTL(
+                rid=link.rid,
+                entity=link.entity,
+                user=link.user,
+                rule=link.rule,
+                status=link.status,
+                source=link.source,
+            )
+        self.session.add(blink)
+        self.session.commit()
 
     def restore_source_context(self, source_id):
         """Restore all the links and relations pointing to this
@@ -358,6 +430,11 @@ class KleioHandler:
         self.sources_in_file = []
         self.xrefs = {}
         self.xlinks = {}
+        self.class_digests = {}
+        self.new_digests = {}
+        self.diff_source = False
+        self.source_entities = {}
+        self.seen_ids = set()
         logging.debug("Kleio file: %s", self.kleio_file)
         logging.debug("Kleio structure: %s", self.kleio_structure)
         logging.debug("Kleio translator: %s", self.kleio_translator)
@@ -379,6 +456,12 @@ class KleioHandler:
         Send imported definition of a new class to the database.
 
         """
+        with self.timer.stage("new_class"):
+            self._new_class(psm, attrs)
+
+    def _new_class(self, psm, attrs):
+        # a change in the mapping changes the digest of the groups of the class
+        self.class_digests[psm.id] = self.class_digest(psm, attrs)
 
         if self.model_type == "TL":
             # new code in Timelink
@@ -446,7 +529,61 @@ class KleioHandler:
                 f"ERROR: creating ORM mapping for class {psm.id}: {e.__class__.__name__}: {e}"
             )
 
+    def get_progress(self) -> dict:
+        """Return the progress of the import
+
+        Returns:
+            dict: file being imported, groups processed, groups per
+                second, number of errors and warnings
+        """
+        elapsed = time.time() - self.started
+        return {
+            "file": self.kleio_file,
+            "groups_processed": self.groups_processed,
+            "groups_per_second": self.groups_processed / elapsed if elapsed > 0 else 0.0,
+            "nerrors": len(self.errors),
+            "nwarnings": len(self.warnings),
+        }
+
+    def check_progress(self):
+        """Report progress if it is time"""
+        if self.progress is not None:
+            now = time.time()
+            if now - self.last_progress >= self.progress_interval:
+                self.last_progress = now
+                self.progress(self.get_progress())
+
     def newGroup(self, group: KGroup):
+        self.groups_processed += 1
+        self.check_progress()
+        started = time.perf_counter()
+        with self.timer.stage("new_group"):
+            self._new_group(group)
+        elapsed = time.perf_counter() - started
+        if self.slow_group_seconds is not None and elapsed > self.slow_group_seconds:
+            logging.warning(
+                "Slow group %s %s$%s line %s: %.2f seconds",
+                self.kleio_file_name,
+                group.kname,
+                group.id,
+                group.line,
+                elapsed,
+            )
+            if len(self.slow_groups) < 100:
+                self.slow_groups.append(
+                    {
+                        "id": str(group.id.core),
+                        "class": group.pom_class_id,
+                        "line": group.line,
+                        "seconds": elapsed,
+                    }
+                )
+
+    def count_group(self, group: KGroup):
+        """Count a group stored, by class"""
+        self.group_counts[group.pom_class_id] = self.group_counts.get(group.pom_class_id, 0) + 1
+
+    def _new_group(self, group: KGroup):
         # get the PomSomMapper
         # pass storeKGroup
         pom_mapper_for_group: PomSomMapperTL | PomSomMapperMHK
@@ -489,32 +626,58 @@ class KleioHandler:
             self.aregister_id = str(group.id.core)
 
         if pom_mapper_for_group.id == "source":  # TODO should be .extends("source")
+            self.end_source()
             self.kleio_source_id = str(group.id.core)
             group.source_id = self.kleio_source_id
             self.sources_in_file.append(self.kleio_source_id)
-            # We need to save all the links and relations pointing to this
-            # source from other sources because they will be nulled or deleted
-            # when the source is deleted
-            # after import we will restore them for the entities that are restored
-            # in this import
-            self.save_source_context(self.kleio_source_id)
+            if self.incremental:
+                self.start_source_diff(self.kleio_source_id)
+            if self.diff_source:
+                # the source is not deleted, relations from other sources are kept
+                self.xrelations[self.kleio_source_id] = []
+            else:
+                # We need to save all the links and relations pointing to this
+                # source from other sources because they will be nulled or deleted
+                # when the source is deleted
+                # after import we will restore them for the entities that are restored
+                # in this import
+                with self.timer.stage(
+                    "save_source_context", span=True, source=self.kleio_source_id
+                ):
+                    self.save_source_context(self.kleio_source_id)
+                if self.model_type == "TL":
+                    delete_entity_digests(self.session, source_id=self.kleio_source_id)
 
         if pom_mapper_for_group.id == "relation":  # TODO should be .extends("relation")
             # it can happen that the destination of a relation
             #  is not yet in the database (forward reference in relation)
             #  In this case we postpone the storing of the relation
             # until the end of file
-            exits_dest_rel = self.session.get(
-                self.entity_model,
-                group.get_element_by_name_or_class("destination").core,
-            )
+            destination = str(group.get_element_by_name_or_class("destination").core)
+            exits_dest_rel = self.session.get(self.entity_model, destination)
+            if (
+                self.diff_source
+                and destination in self.source_entities  # noqa: W503
+                and destination not in self.seen_ids  # noqa: W503
+            ):
+                # the destination comes later in the file, it can still change
+                exits_dest_rel = None
             if exits_dest_rel is None:
+                gid = str(group.id.core)
+                # stored at the end of the file, compared with the digest
+                # of the source being imported now
                 self.postponed_relations.append(
-                    (pom_mapper_for_group.id, copy.deepcopy(group))
+                    (
+                        pom_mapper_for_group.id,
+                        copy.deepcopy(group),
+                        self.diff_source,
+                        self.source_entities.get(gid),
+                    )
                 )
+                self.seen_ids.add(gid)
             else:
                 try:
-                    pom_mapper_for_group.store_KGroup(group, self.session)
+                    self.store_group(pom_mapper_for_group, group)
                 except Exception as exc:
                     self.session.rollback()
                     self.errors.append(
@@ -526,7 +689,7 @@ class KleioHandler:
         else:
             # we have the POM class, less check special cases
             try:
-                pom_mapper_for_group.store_KGroup(group, self.session)
+                self.store_group(pom_mapper_for_group, group)
             except IntegrityError as ierror:
                 logging.error(
                     f"ERROR: {self.kleio_file_name} line {str(group.line)} "
@@ -551,6 +714,208 @@ class KleioHandler:
                     f"storing group {group.kname}${group.id}: {exc.__class__.__name__}: {exc}"
                 )
 
+    def class_digest(self, psm, attrs) -> str:
+        """Digest of the definition of a class and its attributes"""
+        content = [psm.id, psm.table_name, psm.group_name, psm.super_class]
+        for attr in sorted(attrs, key=lambda a: a.name):
+            content.append(
+                [
+                    attr.name,
+                    attr.colname,
+                    attr.colclass,
+                    attr.coltype,
+                    attr.colsize,
+                    attr.colprecision,
+                    attr.pkey,
+                ]
+            )
+        return hashlib.sha256(json.dumps(content, default=str).encode("utf-8")).hexdigest()
+
+    def group_digest(self, group: KGroup) -> str:
+        """Digest of the content of a group
+
+        Includes the elements, the container and the definition of the class
+        of the group, but not its position (line, level, order) in the file,
+        so that editing a group does not change the digest of the groups after it.
+        """
+        content = [
+            group.kname,
+            group.pom_class_id,
+            group.get_container_id(),
+            self.class_digests.get(group.pom_class_id),
+        ]
+        for element in sorted(group.elements(), key=lambda e: e.name):
+            if element.element_class in POSITION_ELEMENTS:
+                continue
+            content.append(
+                [
+                    element.name,
+                    element.element_class,
+                    element.core,
+                    element.comment,
+                    element.original,
+                ]
+            )
+        return hashlib.sha256(json.dumps(content, default=str).encode("utf-8")).hexdigest()
+
+    def start_source_diff(self, source_id):
+        """Load the entities of a source for an incremental import
+
+        Sources imported before digests were stored are imported in full.
+        """
+        self.source_entities = source_entity_digests(self.session, source_id)
+        self.seen_ids = set()
+        self.diff_source = len(self.source_entities) > 0 and all(
+            entity[3] is not None for entity in self.source_entities.values()
+        )
+        if not self.diff_source:
+            self.source_entities = {}
+
+    def store_group(self, pom_mapper, group: KGroup):
+        """Store a group, in incremental imports only if it changed"""
+        with self.timer.stage("store_group"):
+            self._store_group(pom_mapper, group)
+        self.count_group(group)
+
+    def _store_group(self, pom_mapper, group: KGroup):
+        if self.model_type != "TL":
+            pom_mapper.store_KGroup(group, self.session)
+            return
+        previous = None
+        if self.diff_source:
+            gid = str(group.id.core)
+            self.seen_ids.add(gid)
+            previous = self.source_entities.get(gid)
+        self._store_digested_group(pom_mapper, group, self.diff_source, previous)
+
+    def _store_digested_group(self, pom_mapper, group: KGroup, diff: bool, previous):
+        """Store a group unless its digest is the previous one
+
+        Args:
+            diff: True if the source of the group is imported incrementally
+            previous: (line, level, order, digest) of the entity in the
+                database, None if it is not there or diff is False
+        """
+        gid = str(group.id.core)
+        digest = self.group_digest(group)
+        if previous is None:
+            pom_mapper.store_KGroup(group, self.session)
+            if diff:
+                self.import_counts["inserted"] += 1
+        elif previous[3] == digest:
+            position = (group.line, group.level, group.order)
+            # values from the file may be strings
+            if tuple(map(str, previous[:3])) != tuple(map(str, position)):
+                # groups before this one changed
+                entities = self.entity_model.__table__
+                self.session.execute(
+                    update(entities)
+                    .where(entities.c.id == gid)
+                    .values(the_line=group.line, the_level=group.level, the_order=group.order)
+                )
+            self.import_counts["unchanged"] += 1
+            return
+        else:
+            self.update_entity(pom_mapper, group)
+            self.import_counts["updated"] += 1
+        self.new_digests[gid] = digest
+
+    def update_entity(self, pom_mapper, group: KGroup):
+        """Update the columns of an existing entity with the content of a group
+
+        The entity is updated in place, the entities inside it and its links
+        are kept. If the class of the entity changed it is replaced.
+        """
+        new_entity = pom_mapper.kgroup_to_entity(group, self.session)
+        current = self.session.get(self.entity_model, new_entity.id)
+        if current is None or type(current) is not type(new_entity):
+            self.replace_entity(pom_mapper, group, current)
+            return
+        for attr in inspect(type(current)).column_attrs:
+            if attr.key in ("id", "updated", "indexed"):
+                continue
+            setattr(current, attr.key, getattr(new_entity, attr.key))
+        current.updated = datetime.now(timezone.utc)
+        self.session.commit()
+
+    def replace_entity(self, pom_mapper, group: KGroup, current):
+        """Replace an entity whose class changed with the content of a group
+
+        store_KGroup only replaces entities of the class of the group, so
+        the old entity is deleted first, with the entities inside it.
+        These are no longer in the database: they are removed from the
+        entities of the source, so that when their groups come they are
+        inserted, and if they do not come their digests are deleted.
+        """
+        self.flush_digests()
+        if current is not None:
+            self.session.delete(current)
+            self.session.commit()
+        entities = self.entity_model.__table__
+        remaining = set(
+            self.session.scalars(
+                select(entities.c.id).where(entities.c.the_source == self.kleio_source_id)
+            )
+        )
+        missing = [eid for eid in self.source_entities if eid not in remaining]
+        if missing:
+            delete_entity_digests(self.session, entity_ids=missing)
+            self.session.commit()
+            for eid in missing:
+                del self.source_entities[eid]
+        pom_mapper.store_KGroup(group, self.session)
+
+    def end_source(self):
+        """Finish the import of a source
+
+        In incremental imports delete the entities of the source that
+        are no longer in the file, then store the digests of the groups.
+        """
+        with self.timer.stage("end_source", span=True, source=self.kleio_source_id):
+            self._end_source()
+
+    def _end_source(self):
+        if self.diff_source:
+            self.session.commit()
+            removed = [eid for eid in self.source_entities if eid not in self.seen_ids]
+            if removed:
+                links = (
+                    self.session.query(self.link_model)
+                    .filter(self.link_model.entity.in_(removed))
+                    .all()
+                )
+                for link in links:
+                    self.backup_link(link)
+                for eid in removed:
+                    # entities inside others are deleted with them
+                    entity = self.session.get(self.entity_model, eid)
+                    if entity is not None:
+                        self.session.delete(entity)
+                        self.session.commit()
+                self.import_counts["deleted"] += len(removed)
+                delete_entity_digests(self.session, entity_ids=removed)
+                self.session.commit()
+        self.diff_source = False
+        self.source_entities = {}
+        self.seen_ids = set()
+        self.flush_digests()
+
+    def flush_digests(self):
+        """Store the digests of the groups imported since the last flush"""
+        if not self.new_digests or self.model_type != "TL":
+            self.new_digests = {}
+            return
+        try:
+            store_entity_digests(self.session, self.new_digests)
+            self.session.commit()
+        except Exception as exc:
+            self.session.rollback()
+            self.warnings.append(
+                f"WARNING: {self.kleio_file_name} could not store digests of "
+                f"imported groups, next import will be complete: {exc}"
+            )
+        self.new_digests = {}
+
     def newRelation(self, attrs):
         """Process a new (Meta) relation
 
@@ -586,6 +951,11 @@ class KleioHandler:
         rel_register = attrs.get("REGISTER", None)
         rel_user = attrs.get("USER", None)
 
+        stage = rel_value if rel_value in ("same_as", "attach_to_rentity") else "relation"
+        with self.timer.stage(stage):
+            self._new_relation(rel_id, rel_origin, rel_dest, rel_value, rel_register, rel_user)
+
+    def _new_relation(self, rel_id, rel_origin, rel_dest, rel_value, rel_register, rel_user):
         if rel_value == "same_as":
             self.session.commit()
 
@@ -650,16 +1020,39 @@ class KleioHandler:
 
     def endKleioFile(self):
         """Process end of file: process postponed relations"""
+        self.end_source()
         # store postponed relations
         postponed = len(self.postponed_relations)
         if postponed > 0:
             log = f"Storing {postponed} postponed relations"
             logging.info(log)
-        for pom_mapper_id, group in self.postponed_relations:
+        with self.timer.stage("postponed_relations", span=True, relations=postponed):
+            self.store_postponed_relations()
+        self.flush_digests()
+
+        # restore all the links and relations pointing to this
+        # source(s) from other sources that were saved before the source was deleted
+        # the cross references were save when a source group was processed
+        # TODO: should this go here or to models.Source?
+        with self.timer.stage("restore_source_context", span=True):
+            for source_id in self.sources_in_file:
+                self.restore_source_context(source_id)
+
+        with self.timer.stage("end_file"):
+            self.store_kleio_file()
+
+    def store_postponed_relations(self):
+        """Store the relations whose destination came after them in the file"""
+        for pom_mapper_id, group, diff, previous in self.postponed_relations:
             pom_mapper = self.pom_som_mapper.get_pom_class(pom_mapper_id, self.session)
             try:
-                pom_mapper.store_KGroup(group, self.session)
-                self.session.commit()
+                with self.timer.stage("store_group"):
+                    if self.model_type == "TL":
+                        self._store_digested_group(pom_mapper, group, diff, previous)
+                    else:
+                        pom_mapper.store_KGroup(group, self.session)
+                    self.session.commit()
+                self.count_group(group)
             except IntegrityError as ierror:
                 self.errors.append(
                     f"ERROR: {self.kleio_file_name}: {str(group.line)} "
@@ -674,14 +1067,8 @@ class KleioHandler:
                 self.session.rollback()
         self.postponed_relations = []
 
-        # restore all the links and relations pointing to this
-        # source(s) from other sources that were saved before the source was deleted
-        # the cross references were save when a source group was processed
-        # TODO: should this go here or to models.Source?
-        for source_id in self.sources_in_file:
-            self.restore_source_context(source_id)
-
-        # store information on kleio file import
+    def store_kleio_file(self):
+        """Store information on the import of the kleio file"""
         kfile = self.kleio_file_model(
             path=self.kleio_file,
             name=self.kleio_file_name,
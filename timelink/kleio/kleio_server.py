@@ -6,16 +6,25 @@ import re
 import secrets
 import socket
 import time
-import urllib.request
 from time import sleep
 from typing import List, Optional, Tuple
 
 import docker
 import requests
 from jsonrpcclient import Error, Ok, parse, request
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 from .schemas import KleioFile, TokenInfo
 
+# retries of failed requests, see make_http_session
+HTTP_RETRIES = 3
+HTTP_BACKOFF_FACTOR = 0.5
+HTTP_RETRY_STATUS = (502, 503, 504)
+
+# JSON-RPC methods that only read, retried on 502, 503 and 504 responses
+READ_RPC_METHODS = frozenset({"translations_get", "sources_get"})
+
 
 class KleioServerException(Exception):
     pass
@@ -62,22 +71,34 @@ class KleioServer:
         - get_logs: Get the logs of the kleio server container.
         - get_url: Get the kleio server url.
         - call: Basic call to kleio server API.
+        - call_batch: Several calls to kleio server API in one request.
         - stop: Stop the kleio server container.
         - invalidate_user: Invalidate a user.
         - generate_token: Generate a token for a user.
         - get_translations: Get translation status from kleio server.
+        - get_translations_batch: Get translation status of several paths.
         - translate: Translate sources from kleio server.
+        - translate_batch: Translate several paths.
         - translation_clean: Clean translations from kleio server.
         - get_sources: Get sources from kleio server.
         - get_report: Get report from kleio server.
         - get_url_content: Get content from Kleio Server.
         - get_home_page: Get home page from Kleio Server.
+        - close: Close the connections to the Kleio Server.
+
+    Requests to the server share a pool of keep-alive connections
+    (a requests.Session), with retries and backoff on connection errors
+    and on 502, 503 and 504 responses, see :func:`make_http_session`.
+    JSON-RPC calls are retried on those responses only if they read
+    (READ_RPC_METHODS): a translation may have started before the error.
     """
 
     #: kleio server host
     host: str
     #: kleio server url
     url: str
+    #: pooled HTTP connections, created on first use
+    _http_session: requests.Session | None = None
     #: kleio server admin token
     kleio_admin_token: str
     #: kleio server home directory
@@ -482,19 +503,129 @@ class KleioServer:
         if timeout is None:
             timeout = self.call_timeout
 
-        response = requests.post(url, json=rpc, timeout=timeout, headers=headers)
+        response = self._post_rpc(
+            url, rpc, headers, timeout, retry=method in READ_RPC_METHODS
+        )
         parsed = parse(response.json())
         if isinstance(parsed, Ok):
             return parsed.result
         elif isinstance(parsed, Error):
-            code, message, data, id = parsed
-            msg = f"Error {code}: {message} ({data} id:{id})"
-            if code == -32006:
-                raise KleioServerForbidenException("Forbiden " + msg)
+            raise rpc_exception(parsed)
+        return response
+
+    def call_batch(
+        self,
+        calls: list[tuple[str, dict]],
+        token: str | None = None,
+        timeout: int | float | None = None,
+        raise_errors: bool = True,
+    ) -> list:
+        """Call kleio server API several times in one request
+
+        Uses a JSON-RPC 2.0 batch request, saving a round trip per call.
+
+        Example::
+
+            results = kserver.call_batch(
+                [("translations_get", {"path": p, "recurse": "no"}) for p in paths]
+            )
+
+        Args:
+            calls (list[tuple[str, dict]]): list of (method, params)
+            token (str, optional): kleio server token; defaults to None -> use admin token
+            timeout (int | float | None, optional): timeout in seconds for the whole
+                batch; defaults to the instance `call_timeout` when None.
+            raise_errors (bool): if True raise the exception of the first call
+                that failed; if False return the exception in place of the result.
+
+        Returns:
+            list: results of the calls, in the same order as calls
+        """
+        if len(calls) == 0:
+            return []
+        url = f"{self.url}/json/"
+        if token is None:
+            token = self.kleio_admin_token
+        headers = {
+            "Content-Type": "application/json",
+            "Authorization": f"Bearer {token}",
+        }
+        rpcs = [
+            request(method, params={**params, "token": token}) for method, params in calls
+        ]
+        if timeout is None:
+            timeout = self.call_timeout
+
+        response = self._post_rpc(
+            url,
+            rpcs,
+            headers,
+            timeout,
+            retry=all(method in READ_RPC_METHODS for method, _ in calls),
+        )
+        content = response.json()
+        if isinstance(content, dict):
+            # the server answers a batch with a single error if the batch is invalid
+            parsed = parse(content)
+            if isinstance(parsed, Error):
+                raise rpc_exception(parsed)
+            raise KleioServerException(f"Unexpected answer to batch request: {content}")
+        # responses can come in any order
+        by_id = {parsed.id: parsed for parsed in parse(content)}
+        results = []
+        for rpc in rpcs:
+            parsed = by_id.get(rpc["id"])
+            if isinstance(parsed, Ok):
+                results.append(parsed.result)
+                continue
+            if parsed is None:
+                error = KleioServerException(f"No answer for {rpc['method']} id:{rpc['id']}")
             else:
-                raise KleioServerException(f"Error {code}: {message} ({data} id:{id})")
+                error = rpc_exception(parsed)
+            if raise_errors:
+                raise error
+            results.append(error)
+        return results
+
+    def _post_rpc(self, url, payload, headers, timeout, retry: bool) -> requests.Response:
+        """Post a JSON-RPC request, retrying 502, 503 and 504 if retry is True
+
+        Only requests that read are retried on these responses, the
+        server may have processed the request before the error.
+        Failed connections are retried by the session for all requests.
+        """
+        for attempt in range(HTTP_RETRIES + 1):
+            response = self.http_session().post(
+                url, json=payload, timeout=timeout, headers=headers
+            )
+            if (
+                not retry
+                or response.status_code not in HTTP_RETRY_STATUS  # noqa: W503
+                or attempt == HTTP_RETRIES  # noqa: W503
+            ):
+                return response
+            logging.debug(f"Kleio server answered {response.status_code}, retrying")
+            sleep(HTTP_BACKOFF_FACTOR * 2**attempt)
         return response
 
+    def http_session(self) -> requests.Session:
+        """Get the session used for requests to the Kleio Server
+
+        Created on first use, see :func:`make_http_session`.
+        """
+        if self._http_session is None:
+            self._http_session = make_http_session()
+        return self._http_session
+
+    def close(self):
+        """Close the connections to the Kleio Server
+
+        The server is not stopped, later requests open new connections.
+        """
+        if self._http_session is not None:
+            self._http_session.close()
+            self._http_session = None
+
     def stop(self):
         """Stop the kleio server container"""
         logging.debug(f"Stopping kleio server {self.container.name}")
@@ -618,6 +749,69 @@ class KleioServer:
 
         return self.call("translations_translate", pars), token
 
+    def get_translations_batch(
+        self,
+        paths: list[str],
+        recurse: str | bool = True,
+        status: str | None = None,
+        token: str | None = None,
+    ) -> dict[str, list[KleioFile]]:
+        """Get translation status of several paths in one request.
+
+        Args:
+            paths (list[str]): paths to directories or files in sources.
+            recurse, status, token: as in :meth:`get_translations`.
+
+        Returns:
+            dict[str, list[KleioFile]]: KleioFile objects for each path.
+        """
+        if recurse is True:
+            recurse = "yes"
+        elif recurse is False:
+            recurse = "no"
+        calls = []
+        for path in paths:
+            pars = {"path": "" if path is None else str(path), "recurse": recurse}
+            if status is not None:
+                pars["status"] = status
+            calls.append(("translations_get", pars))
+        results = self.call_batch(calls, token=token)
+        return {
+            path: [KleioFile.model_validate(t) for t in translations]
+            for path, translations in zip(paths, results)
+        }
+
+    def translate_batch(
+        self,
+        paths: list[str],
+        recurse: str | bool = "yes",
+        spawn: str = "yes",
+        token: str | None = None,
+    ) -> list:
+        """Translate several paths in one request.
+
+        Args:
+            paths (list[str]): paths to directories or files in sources.
+            recurse, spawn: as in :meth:`translate`.
+            token (str, optional): Kleio server token.
+
+        Returns:
+            list: kleio server API response for each path
+        """
+        if recurse is True:
+            recurse = "yes"
+        elif recurse is False:
+            recurse = "no"
+        calls = []
+        for path in paths:
+            pars = {"path": path}
+            if recurse is not None:
+                pars["recurse"] = recurse
+            if spawn is not None:
+                pars["spawn"] = spawn
+            calls.append(("translations_translate", pars))
+        return self.call_batch(calls, token=token)
+
     def translation_clean(self, path: str, recurse: str):
         """clean translations from kleio server
 
@@ -707,10 +901,10 @@ class KleioServer:
         if token is None:
             token = self.get_token()
         headers = {"Authorization": f"Bearer {token}"}
-        req = urllib.request.Request(server_url, headers=headers)
-        with urllib.request.urlopen(req, timeout=timeout) as source:
-            response_content = source.read().decode("utf-8")
-            return response_content
+        response = self.http_session().get(server_url, headers=headers, timeout=timeout)
+        response.raise_for_status()
+        response.encoding = "utf-8"
+        return response.text
 
     def get_home_page(self, token=None) -> str:
         """Get home page from Kleio Server
@@ -725,10 +919,12 @@ class KleioServer:
             headers = {}
         else:
             headers = {"Authorization": f"Bearer {token}"}
-        req = urllib.request.Request(self.get_url(), headers=headers)
-        with urllib.request.urlopen(req) as source:
-            response_content = source.read().decode("utf-8")
-            return response_content
+        response = self.http_session().get(
+            self.get_url(), headers=headers, timeout=self.call_timeout
+        )
+        response.raise_for_status()
+        response.encoding = "utf-8"
+        return response.text
 
     def extract_version_info(
         self, home_page_content: str
@@ -775,6 +971,54 @@ class KleioServer:
         return f"KleioServer(url={self.get_url()}, kleio_home={self.get_kleio_home()})"
 
 
+def make_http_session(
+    retries: int = HTTP_RETRIES,
+    backoff_factor: float = HTTP_BACKOFF_FACTOR,
+    pool_maxsize: int = 10,
+) -> requests.Session:
+    """Make a requests session for a Kleio Server
+
+    Connections are kept alive and reused. Failed connections are
+    retried with exponential backoff, the request was not sent.
+    502, 503 and 504 responses are retried for GET and the other
+    idempotent methods, not for POST: JSON-RPC calls that read are
+    retried by KleioServer.call, see READ_RPC_METHODS. Requests that
+    reached the server and timed out are not retried, since the server
+    may have processed them.
+
+    Args:
+        retries (int): maximum number of retries of a request.
+        backoff_factor (float): base delay in seconds between retries.
+        pool_maxsize (int): maximum number of connections kept.
+
+    Returns:
+        requests.Session: the session
+    """
+    retry = Retry(
+        total=retries,
+        connect=retries,
+        read=0,
+        status=retries,
+        backoff_factor=backoff_factor,
+        status_forcelist=HTTP_RETRY_STATUS,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(max_retries=retry, pool_maxsize=pool_maxsize)
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def rpc_exception(error: Error) -> KleioServerException:
+    """Exception for a JSON-RPC error returned by the Kleio Server"""
+    code, message, data, id = error
+    msg = f"Error {code}: {message} ({data} id:{id})"
+    if code == -32006:
+        return KleioServerForbidenException("Forbiden " + msg)
+    return KleioServerException(msg)
+
+
 def is_docker_running():
     """Check if docker is running"""
     try:
@@ -111,6 +111,7 @@ class SaxHandler(handler.ContentHandler):
             level = attrs["LEVEL"]
             line = attrs["LINE"]
 
+            self._kleio_handler.timer.start("group_build")
             # Mal [? porquê?]
             self._current_group = KGroup()
             self._current_group.id = gid
@@ -186,6 +187,7 @@ class SaxHandler(handler.ContentHandler):
         ename = name.upper()
 
         if ename == "GROUP":
+            self._kleio_handler.timer.stop("group_build")
             self._kleio_handler.newGroup(self._current_group)
             self._context = KleioContext.KLEIO
             self._current_group = None
@@ -0,0 +1,299 @@
+"""Streaming download of the xml files exported by the Kleio translator.
+
+Instead of handing a socket to the SAX parser, :func:`parse_url` feeds
+the parser with chunks as they arrive:
+
+    * compression (gzip, deflate) is negotiated with the server and
+      decoded on the fly;
+    * the timeout applies to each read, not to the whole download, so that
+      large files on slow connections are not interrupted;
+    * the xml can be saved in an :class:`XmlCache` while it is parsed,
+      so that a failed import can be retried without a new download;
+    * a :class:`ContentHash` of the xml can be computed on the way, to
+      detect translations that did not change the content of a file.
+
+Example::
+
+    cache = XmlCache("~/.timelink/xml_cache")
+    parse_url(parser, url, token=token, cache=cache, cache_key=xml_cache_key(kfile))
+"""
+
+import hashlib
+import json
+import os
+import re
+import tempfile
+import threading
+from pathlib import Path
+
+import requests
+
+from .schemas import KleioFile
+
+DEFAULT_CHUNK_SIZE = 64 * 1024
+DEFAULT_CONNECT_TIMEOUT = 10
+# seconds without receiving data, not the time of the whole download
+DEFAULT_READ_TIMEOUT = 60
+
+_session: requests.Session | None = None
+_session_lock = threading.Lock()
+
+
+# the opening KLEIO element and its WHEN attribute, the date of translation
+_kleio_element = re.compile(rb"<KLEIO\b[^>]*>")
+_when_attribute = re.compile(rb'\sWHEN="[^"]*"')
+# bytes searched for the KLEIO element
+_header_size = 64 * 1024
+
+
+def _get_session() -> requests.Session:
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = requests.Session()
+        return _session
+
+
+class XmlCache:
+    """Content addressed store of xml files
+
+    Each file is stored once, named by the sha256 of its content, in
+    ``<directory>/<hash[:2]>/<hash>.xml``. An index maps keys to hashes;
+    keys should identify a version of a file, see :func:`xml_cache_key`.
+
+    Args:
+        directory (str | Path): cache directory, created on first write
+    """
+
+    def __init__(self, directory: str | Path):
+        self.directory = Path(directory).expanduser()
+        self.index_file = self.directory / "index.json"
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return f"XmlCache({str(self.directory)!r})"
+
+    def _path(self, digest: str) -> Path:
+        return self.directory / digest[:2] / f"{digest}.xml"
+
+    def _read_index(self) -> dict:
+        try:
+            with open(self.index_file, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _update_index(self, key: str, digest: str | None):
+        with self._lock:
+            index = self._read_index()
+            if digest is None:
+                index.pop(key, None)
+            else:
+                index[key] = digest
+            self.directory.mkdir(parents=True, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".json")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(index, f)
+            os.replace(tmp, self.index_file)
+
+    def get(self, key: str) -> Path | None:
+        """Return the path of the file cached under key, or None"""
+        digest = self._read_index().get(key)
+        if digest is None:
+            return None
+        path = self._path(digest)
+        return path if path.exists() else None
+
+    def put(self, key: str, content: bytes) -> Path:
+        """Store content under key, return the path of the cached file"""
+        writer = self.writer(key)
+        writer.write(content)
+        return writer.commit()
+
+    def writer(self, key: str) -> "_CacheWriter":
+        """Return a writer that stores chunks under key when committed"""
+        return _CacheWriter(self, key)
+
+    def discard(self, key: str):
+        """Forget key, the file is kept if other keys use it"""
+        self._update_index(key, None)
+
+
+class _CacheWriter:
+    """Write chunks to a temporary file, move it into the cache on commit"""
+
+    def __init__(self, cache: XmlCache, key: str):
+        self.cache = cache
+        self.key = key
+        cache.directory.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=cache.directory, suffix=".part")
+        self._file = os.fdopen(fd, "wb")
+        self._tmp = Path(tmp)
+        self._hash = hashlib.sha256()
+
+    def write(self, chunk: bytes):
+        self._file.write(chunk)
+        self._hash.update(chunk)
+
+    def commit(self) -> Path:
+        self._file.close()
+        digest = self._hash.hexdigest()
+        path = self.cache._path(digest)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        os.replace(self._tmp, path)
+        self.cache._update_index(self.key, digest)
+        return path
+
+    def abort(self):
+        self._file.close()
+        self._tmp.unlink(missing_ok=True)
+
+
+class ContentHash:
+    """sha256 of a Kleio xml export, ignoring the date of translation
+
+    Each translation of a file changes the WHEN attribute of the KLEIO
+    element, which is left out so that translations with the same result
+    have the same hash. Use like a hashlib object::
+
+        content_hash = ContentHash()
+        for chunk in chunks:
+            content_hash.update(chunk)
+        content_hash.hexdigest()
+    """
+
+    def __init__(self):
+        self._hash = hashlib.sha256()
+        self._header = b""
+        self._in_header = True
+
+    def update(self, chunk: bytes):
+        if not self._in_header:
+            self._hash.update(chunk)
+            return
+        self._header += chunk
+        match = _kleio_element.search(self._header)
+        if match is not None:
+            element = _when_attribute.sub(b"", match.group(), count=1)
+            self._hash.update(self._header[: match.start()])
+            self._hash.update(element)
+            self._hash.update(self._header[match.end():])
+            self._end_header()
+        elif len(self._header) > _header_size:
+            self._hash.update(self._header)
+            self._end_header()
+
+    def _end_header(self):
+        self._header = b""
+        self._in_header = False
+
+    def hexdigest(self) -> str:
+        if self._in_header:
+            self._hash.update(self._header)
+            self._end_header()
+        return self._hash.hexdigest()
+
+
+def xml_content_hash(xml: bytes) -> str:
+    """Return the :class:`ContentHash` of a xml file"""
+    content_hash = ContentHash()
+    content_hash.update(xml)
+    return content_hash.hexdigest()
+
+
+def xml_cache_key(kfile: KleioFile) -> str:
+    """Cache key of the xml of a Kleio file, changes when it is translated again"""
+    translated = kfile.translated.isoformat() if kfile.translated else ""
+    return f"{kfile.xml_url}@{translated}"
+
+
+def parse_url(
+    parser,
+    url: str,
+    token: str | None = None,
+    cache: XmlCache | None = None,
+    cache_key: str | None = None,
+    read_timeout: int | float = DEFAULT_READ_TIMEOUT,
+    connect_timeout: int | float = DEFAULT_CONNECT_TIMEOUT,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    session: requests.Session | None = None,
+    content_hash: ContentHash | None = None,
+) -> bool:
+    """Download xml from url and feed it to an incremental SAX parser
+
+    If a cache is given the file is parsed from the cache when there,
+    otherwise it is stored in the cache as it is downloaded. The download
+    is completed even if the parser fails, so that the import can be
+    retried from the cache.
+
+    Args:
+        parser: a SAX parser with feed() and close(), from xml.sax.make_parser()
+        url (str): url of the xml file
+        token (str, optional): bearer token for the Kleio server
+        cache (XmlCache, optional): cache for the downloaded xml
+        cache_key (str, optional): key of this version of the file in the
+            cache, see :func:`xml_cache_key`. Required with a cache: the url
+            of a file does not change when it is translated again.
+        read_timeout (int | float): seconds to wait for each chunk
+        connect_timeout (int | float): seconds to wait for the connection
+        chunk_size (int): bytes read at a time
+        session (requests.Session, optional): session for the request
+        content_hash (ContentHash, optional): updated with the xml parsed
+
+    Returns:
+        bool: True if the xml was read from the cache
+
+    Raises:
+        ValueError: if a cache is given without a cache_key
+        requests.HTTPError: if the server answers with an error status
+        requests.Timeout: if the connection or a read times out
+    """
+    if cache is not None:
+        if cache_key is None:
+            raise ValueError("A cache_key is required with a cache, see xml_cache_key()")
+        cached = cache.get(cache_key)
+        if cached is not None:
+            with open(cached, "rb") as f:
+                while chunk := f.read(chunk_size):
+                    if content_hash is not None:
+                        content_hash.update(chunk)
+                    parser.feed(chunk)
+            parser.close()
+            return True
+
+    headers = {"Accept-Encoding": "gzip, deflate"}
+    if token is not None:
+        headers["Authorization"] = f"Bearer {token}"
+    if session is None:
+        session = _get_session()
+    with session.get(
+        url, headers=headers, stream=True, timeout=(connect_timeout, read_timeout)
+    ) as response:
+        response.raise_for_status()
+        writer = cache.writer(cache_key) if cache is not None else None
+        parse_error = None
+        try:
+            # iter_content decodes gzip and deflate
+            for chunk in response.iter_content(chunk_size):
+                if writer is not None:
+                    writer.write(chunk)
+                if content_hash is not None:
+                    content_hash.update(chunk)
+                if parse_error is None:
+                    try:
+                        parser.feed(chunk)
+                    except Exception as exc:
+                        if writer is None:
+                            raise
+                        # keep the rest of the file for a retry
+                        parse_error = exc
+        except BaseException:
+            if writer is not None:
+                writer.abort()
+            raise
+        if writer is not None:
+            writer.commit()
+    if parse_error is not None:
+        raise parse_error
+    parser.close()
+    return False
@@ -9,6 +9,7 @@
 # Check the following link for more information:
 # https://stackoverflow.com/questions/47636747/python3-6-keyerror-formatters
 # it might be related to the way we configure the path to the alembic.ini file.
+from functools import lru_cache
 from pathlib import Path
 
 from alembic import command
@@ -73,6 +74,13 @@ def get_versions(base='base', head='heads'):
     return revisions
 
 
+@lru_cache(maxsize=1)
+def head_revision() -> str:
+    """Get the most recent revision available in the migration scripts."""
+    script = ScriptDirectory.from_config(ALEMBIC_CFG)
+    return script.get_current_head()
+
+
 def current(db_url, verbose=False):
     """Get the current revision of the database."""
     set_db_url(db_url)
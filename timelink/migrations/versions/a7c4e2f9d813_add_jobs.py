@@ -0,0 +1,45 @@
+"""Add jobs table for background imports
+
+Revision ID: a7c4e2f9d813
+Revises: f3b8d1e6a2c9
+Create Date: 2025-04-02 10:15:37.884120
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a7c4e2f9d813'
+down_revision: Union[str, None] = 'f3b8d1e6a2c9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    conn = op.get_bind()
+    inspector = sa.inspect(conn)
+    if "jobs" not in inspector.get_table_names():
+        op.create_table(
+            "jobs",
+            sa.Column("id", sa.String(32), nullable=False),
+            sa.Column("kind", sa.String(32), nullable=False),
+            sa.Column("path", sa.String(1024), nullable=False),
+            sa.Column("status", sa.String(16), nullable=False),
+            sa.Column("params", sa.JSON(), nullable=True),
+            sa.Column("progress", sa.JSON(), nullable=True),
+            sa.Column("result", sa.JSON(), nullable=True),
+            sa.Column("error", sa.String(), nullable=True),
+            sa.Column("created", sa.DateTime(), nullable=False),
+            sa.Column("started", sa.DateTime(), nullable=True),
+            sa.Column("finished", sa.DateTime(), nullable=True),
+            sa.PrimaryKeyConstraint("id"),
+        )
+        op.create_index(op.f("ix_jobs_status"), "jobs", ["status"], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f("ix_jobs_status"), table_name="jobs")
+    op.drop_table("jobs")
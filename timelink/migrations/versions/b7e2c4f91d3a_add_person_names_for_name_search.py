@@ -0,0 +1,70 @@
+"""Add person_names and person_name_trigrams for name search
+
+Revision ID: b7e2c4f91d3a
+Revises: 6ccf1ef385a6
+Create Date: 2025-03-02 11:42:10.512877
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from timelink.api.models.person_name import rebuild_person_names
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7e2c4f91d3a'
+down_revision: Union[str, None] = '6ccf1ef385a6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    conn = op.get_bind()
+    inspector = sa.inspect(conn)
+    tables = inspector.get_table_names()
+    if "person_names" not in tables:
+        op.create_table(
+            "person_names",
+            sa.Column("id", sa.String(), nullable=False),
+            sa.Column("norm_name", sa.String(), nullable=True),
+            sa.ForeignKeyConstraint(["id"], ["persons.id"], ondelete="CASCADE"),
+            sa.PrimaryKeyConstraint("id"),
+        )
+        op.create_index(
+            op.f("ix_person_names_norm_name"), "person_names", ["norm_name"], unique=False
+        )
+        if conn.dialect.name == "postgresql":
+            op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+            op.create_index(
+                "ix_person_names_trgm",
+                "person_names",
+                ["norm_name"],
+                unique=False,
+                postgresql_using="gin",
+                postgresql_ops={"norm_name": "gin_trgm_ops"},
+            )
+    if "person_name_trigrams" not in tables:
+        op.create_table(
+            "person_name_trigrams",
+            sa.Column("trigram", sa.String(length=3), nullable=False),
+            sa.Column("id", sa.String(), nullable=False),
+            sa.ForeignKeyConstraint(["id"], ["person_names.id"], ondelete="CASCADE"),
+            sa.PrimaryKeyConstraint("trigram", "id"),
+        )
+        op.create_index(
+            op.f("ix_person_name_trigrams_id"), "person_name_trigrams", ["id"], unique=False
+        )
+    if "persons" in tables:
+        rebuild_person_names(conn)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f("ix_person_name_trigrams_id"), table_name="person_name_trigrams")
+    op.drop_table("person_name_trigrams")
+    conn = op.get_bind()
+    if conn.dialect.name == "postgresql":
+        op.drop_index("ix_person_names_trgm", table_name="person_names")
+    op.drop_index(op.f("ix_person_names_norm_name"), table_name="person_names")
+    op.drop_table("person_names")
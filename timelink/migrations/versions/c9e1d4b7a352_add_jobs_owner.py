@@ -0,0 +1,30 @@
+"""Add owner column to jobs
+
+Revision ID: c9e1d4b7a352
+Revises: a7c4e2f9d813
+Create Date: 2025-04-09 09:41:22.310582
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+from sqlalchemy import Column, String
+
+from timelink.migrations import column_exists
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c9e1d4b7a352'
+down_revision: Union[str, None] = 'a7c4e2f9d813'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    if not column_exists('jobs', 'owner', op):
+        op.add_column('jobs', Column('owner', String(128), nullable=True))
+
+
+def downgrade() -> None:
+    if column_exists('jobs', 'owner', op):
+        op.drop_column('jobs', 'owner')
@@ -0,0 +1,39 @@
+"""Add group_classes catalog of (group, class) pairs
+
+Revision ID: d41a8e6c5b20
+Revises: b7e2c4f91d3a
+Create Date: 2025-03-09 16:05:37.218004
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from timelink.api.models.group_class import rebuild_group_classes
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd41a8e6c5b20'
+down_revision: Union[str, None] = 'b7e2c4f91d3a'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    conn = op.get_bind()
+    inspector = sa.inspect(conn)
+    tables = inspector.get_table_names()
+    if "group_classes" not in tables:
+        op.create_table(
+            "group_classes",
+            sa.Column("groupname", sa.String(), nullable=False),
+            sa.Column("class", sa.String(), nullable=False),
+            sa.PrimaryKeyConstraint("groupname", "class"),
+        )
+    if "entities" in tables:
+        rebuild_group_classes(conn)
+
+
+def downgrade() -> None:
+    op.drop_table("group_classes")
@@ -0,0 +1,30 @@
+"""Add content_hash column to kleiofiles
+
+Revision ID: e5f2a9c7b413
+Revises: d41a8e6c5b20
+Create Date: 2025-03-21 10:12:48.514307
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+from sqlalchemy import Column, String
+
+from timelink.migrations import column_exists
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e5f2a9c7b413'
+down_revision: Union[str, None] = 'd41a8e6c5b20'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    if not column_exists('kleiofiles', 'content_hash', op):
+        op.add_column('kleiofiles', Column('content_hash', String(64), nullable=True))
+
+
+def downgrade() -> None:
+    if column_exists('kleiofiles', 'content_hash', op):
+        op.drop_column('kleiofiles', 'content_hash')
@@ -0,0 +1,35 @@
+"""Add entity_digests table for incremental imports
+
+Revision ID: f3b8d1e6a2c9
+Revises: e5f2a9c7b413
+Create Date: 2025-03-28 18:40:12.306551
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f3b8d1e6a2c9'
+down_revision: Union[str, None] = 'e5f2a9c7b413'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    conn = op.get_bind()
+    inspector = sa.inspect(conn)
+    if "entity_digests" not in inspector.get_table_names():
+        op.create_table(
+            "entity_digests",
+            sa.Column("id", sa.String(), nullable=False),
+            sa.Column("digest", sa.String(64), nullable=False),
+            sa.ForeignKeyConstraint(["id"], ["entities.id"], ondelete="CASCADE"),
+            sa.PrimaryKeyConstraint("id"),
+        )
+
+
+def downgrade() -> None:
+    op.drop_table("entity_digests")
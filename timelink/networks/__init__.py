@@ -1,3 +1,26 @@
 """ Generation and analysis of Networks in Timelink """
-from .network_generation import network_from_attribute  # noqa: F401
-from .network_draw import draw_network  # noqa: F401
+import importlib
+
+# Functions are imported on first use (PEP 562): networkx, numpy
+# and bokeh load only when a network is generated or drawn.
+_lazy_attributes = {
+    "network_from_attribute": ".network_generation",
+    "network_from_relations": ".network_generation",
+    "attribute_cooccurrence_edges": ".network_generation",
+    "draw_network": ".network_draw",
+}
+
+__all__ = list(_lazy_attributes)
+
+
+def __getattr__(name):
+    if name in _lazy_attributes:
+        module = importlib.import_module(_lazy_attributes[name], __name__)
+        value = getattr(module, name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
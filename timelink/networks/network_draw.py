@@ -1,9 +1,156 @@
+"""Drawing of networks with Bokeh"""
+
+import copy
+import hashlib
+from collections import OrderedDict
+from collections.abc import Hashable
+
 import networkx as nx
 from bokeh.io import output_notebook, save, show
 from bokeh.models import MultiLine, Range1d, Scatter
 from bokeh.palettes import Category10
 from bokeh.plotting import figure, from_networkx
 
+#: maximum number of layouts kept in the layout cache
+LAYOUT_CACHE_SIZE = 32
+
+# positions of previously computed layouts, see compute_layout()
+_layout_cache: OrderedDict = OrderedDict()
+
+
+def _spring(G, iterations=50, **kwargs):
+    return nx.spring_layout(G, iterations=iterations, **kwargs)
+
+
+def _forceatlas2(G, iterations=50, **kwargs):
+    if not hasattr(nx, "forceatlas2_layout"):
+        raise ValueError("The forceatlas2 layout requires networkx>=3.4")
+    return nx.forceatlas2_layout(G, max_iter=iterations, **kwargs)
+
+
+def _spectral(G, iterations=None, **kwargs):
+    # spectral_layout uses sparse eigenvalue solvers (scipy) for large graphs;
+    # in a disconnected graph the nodes of each component collapse together
+    return nx.spectral_layout(G, **kwargs)
+
+
+def _kamada_kawai(G, iterations=None, **kwargs):
+    return nx.kamada_kawai_layout(G, **kwargs)
+
+
+def _circular(G, iterations=None, **kwargs):
+    return nx.circular_layout(G, **kwargs)
+
+
+#: layout engines available by name in draw_network and compute_layout
+layout_engines = {
+    "spring": _spring,
+    "forceatlas2": _forceatlas2,
+    "spectral": _spectral,
+    "kamada_kawai": _kamada_kawai,
+    "circular": _circular,
+}
+
+
+def graph_fingerprint(Graph: nx.Graph) -> str:
+    """Return a hash identifying the nodes, edges and edge weights of a graph.
+
+    Two graphs with the same fingerprint produce the same layout,
+    independently of node and edge attributes other than "weight".
+    """
+    nodes = sorted(repr(n) for n in Graph.nodes)
+    if Graph.is_directed():
+        edges = [(repr(u), repr(v), w) for u, v, w in Graph.edges(data="weight")]
+    else:
+        edges = [
+            (*sorted((repr(u), repr(v))), w) for u, v, w in Graph.edges(data="weight")
+        ]
+    fingerprint = hashlib.sha1()
+    fingerprint.update(repr(nodes).encode("utf-8"))
+    fingerprint.update(repr(sorted(edges, key=repr)).encode("utf-8"))
+    return fingerprint.hexdigest()
+
+
+def compute_layout(
+    Graph: nx.Graph,
+    layout="spring",
+    iterations=50,
+    scale=1,
+    use_cache=True,
+    **layout_kwargs,
+) -> dict:
+    """Compute (or fetch from cache) the positions of the nodes of a graph.
+
+    Positions are cached by graph fingerprint, layout and arguments,
+    so drawing the same network again, e.g. with different colors
+    or tooltips, does not repeat the layout. Layout functions are
+    cached by the function object, not its name: two lambdas are
+    different layouts. The cache keeps a reference to the function.
+
+    Args:
+        Graph: a networkx graph object
+        layout: name of a layout engine (see ``layout_engines``: "spring",
+                "forceatlas2", "spectral", "kamada_kawai", "circular")
+                or a function f(Graph, iterations=..., **layout_kwargs) returning
+                a dictionary of positions.
+        iterations: number of iterations for iterative layouts
+        scale: positions are rescaled to [-scale, scale]
+        use_cache: if False the layout is always computed
+        layout_kwargs: extra arguments to the layout function (e.g. seed)
+
+    Returns:
+        dict: node -> (x, y), a copy that can be changed without
+        changing the cache
+    """
+    if callable(layout):
+        layout_function = layout
+        # the function itself, names of lambdas and nested functions repeat
+        layout_name = layout
+        if not isinstance(layout, Hashable):
+            use_cache = False
+    elif layout in layout_engines:
+        layout_function = layout_engines[layout]
+        layout_name = layout
+    else:
+        raise ValueError(
+            f"Unknown layout {layout}. Use one of {list(layout_engines.keys())} or a function."
+        )
+
+    key = None
+    if use_cache:
+        key = (
+            graph_fingerprint(Graph),
+            layout_name,
+            iterations,
+            scale,
+            repr(sorted(layout_kwargs.items())),
+        )
+        if key in _layout_cache:
+            _layout_cache.move_to_end(key)
+            return _copy_positions(_layout_cache[key])
+
+    if len(Graph) == 0:
+        pos = {}
+    else:
+        pos = layout_function(Graph, iterations=iterations, **layout_kwargs)
+        pos = nx.rescale_layout_dict(pos, scale=scale)
+
+    if key is not None:
+        _layout_cache[key] = _copy_positions(pos)
+        while len(_layout_cache) > LAYOUT_CACHE_SIZE:
+            _layout_cache.popitem(last=False)
+    return pos
+
+
+def _copy_positions(pos: dict) -> dict:
+    # positions are numpy arrays, changed in place by some callers
+    return {node: copy.copy(xy) for node, xy in pos.items()}
+
+
+def clear_layout_cache():
+    """Remove all the layouts kept in the layout cache."""
+    _layout_cache.clear()
+
 
 def draw_network(
     Graph: nx.Graph,
@@ -12,6 +159,9 @@ def draw_network(
     edge_tooltips=None,
     iterations=50,
     scale=1,
+    layout="spring",
+    layout_kwargs: dict | None = None,
+    use_cache=True,
     node_color_attr="type",
     node_colors: dict | None = None,
     color_palette: dict | None = None,
@@ -32,7 +182,16 @@ def draw_network(
                         defaults to [("desc", "@desc"), ("type", "@type")]
         edge_tooltips: a list of tuples with the information to show when hovering over edges
                         defaults to None, which means no tooltips for edges
-        iterations: number of iterations for the spring layout
+        iterations: number of iterations for the spring and forceatlas2 layouts
+        scale: scale of the layout positions
+        layout: layout engine, see :func:`compute_layout`. Can also be
+                a dictionary with precomputed positions for each node
+                (ValueError if nodes are missing).
+                For large graphs "spectral" (sparse eigenvectors, requires scipy)
+                is much faster than "spring".
+        layout_kwargs: extra arguments for the layout engine (e.g. {"seed": 1})
+        use_cache: reuse the positions previously computed for the same graph
+                   and layout arguments
         node_color_attr: the attribute to color nodes by (default is "type")
         node_colors: a dictionary mapping node types to colors. If None, a default color palette is used.
         color_palette:  a dictionary mapping node types to colors. If none a
@@ -57,8 +216,29 @@ def draw_network(
     """
     output_notebook()  # Use this if you want to display the plot in a Jupyter notebook
 
+    # compute the positions on the original labels, so they can be cached
+    if isinstance(layout, dict):
+        missing = set(Graph) - set(layout)
+        if missing:
+            raise ValueError(
+                f"No position in layout for nodes: {', '.join(sorted(map(str, missing)))}"
+            )
+        positions = layout
+    else:
+        if layout_kwargs is None:
+            layout_kwargs = {}
+        positions = compute_layout(
+            Graph,
+            layout=layout,
+            iterations=iterations,
+            scale=scale,
+            use_cache=use_cache,
+            **layout_kwargs,
+        )
+
     # convert the label to integer
     G = nx.convert_node_labels_to_integers(Graph, label_attribute="original_id")
+    positions = {n: positions[G.nodes[n]["original_id"]] for n in G.nodes}
 
     # Establish which categories will appear when hovering over each node
     if node_tooltips is None:
@@ -98,15 +278,8 @@ def draw_network(
         title=title,
     )
 
-    # Create a network graph object with spring layout
-    # https://networkx.github.io/documentation/networkx-1.9/reference/generated/networkx.drawing.layout.spring_layout.html
-    network_graph = from_networkx(
-        G,
-        nx.spring_layout,  # type: ignore
-        iterations=iterations,
-        scale=scale,
-        center=(0, 0),
-    )
+    # Create a network graph object with the computed layout
+    network_graph = from_networkx(G, positions)
 
     # Set node size and color
     network_graph.node_renderer.glyph = Scatter(size=circle_size, fill_color="color", marker="circle")  # type: ignore
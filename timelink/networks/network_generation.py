@@ -1,11 +1,16 @@
 """Generation of networks"""
 
+from collections import defaultdict
 from itertools import combinations
 
 import networkx as nx
+import numpy as np
+import pandas as pd
+from sqlalchemy import MetaData, Table, and_, func, select
 
 from timelink.api.database import TimelinkDatabase
 from timelink.api.models.entity import Entity
+from timelink.api.models.rentity import Link, REntity
 from timelink.kleio.utilities import convert_timelink_date as ctd
 from timelink.kleio.utilities import format_timelink_date as ftd
 from timelink.pandas import attribute_values, entities_with_attribute
@@ -19,6 +24,10 @@ def network_from_attribute(
     user=None,
     db: TimelinkDatabase | None = None,
     session=None,
+    max_clique_size: int | None = None,
+    oversize: str = "sample",
+    random_seed: int | None = None,
+    backend: str = "networkx",
 ) -> nx.Graph:
     """
     Generate a network from common attribute values.
@@ -36,9 +45,21 @@ def network_from_attribute(
         db (TimelinkDatase, optional): The TimelinkDatase object. Defaults to None.
                                        Either db or session must be provided.
         session (object, optional): The session object for the database connection. Defaults to None.
+        max_clique_size (int, optional): In "cliques" mode, the maximum number of entities
+                              connected through a single value. Values shared by more
+                              entities are handled according to ``oversize``.
+                              Defaults to None (no limit).
+        oversize (str, optional): What to do with values above ``max_clique_size``:
+                              "sample" keeps a random sample of ``max_clique_size``
+                              entities, "skip" ignores the value. Defaults to "sample".
+        random_seed (int, optional): Seed used when sampling oversized values. Defaults to None.
+        backend (str, optional): How cliques are projected. "networkx" keeps the
+                              date and obs of each pair in the edges; "sparse" computes
+                              only the edge weights with a scipy.sparse incidence matrix
+                              (requires scipy). Defaults to "networkx".
 
     Raises:
-        None
+        ValueError: if mode, oversize or backend are not valid.
 
     Topology the generated network:
         * If mode = "cliques" all the entities with attribute
@@ -52,6 +73,17 @@ def network_from_attribute(
           contribute to the overall connectivity of the graph, by
           linking clusters of same value entities.
 
+    In "cliques" mode the network is the weighted projection of the
+    bipartite graph entity-value over the entities: two entities are
+    linked if they share at least one value and the "weight" of the edge
+    is the number of values they share. All the rows of the attribute
+    are fetched in a single query, so the cost of the projection is
+    dominated by the number of pairs. A value shared by n entities
+    produces n*(n-1)/2 edges; use ``max_clique_size`` to bound that
+    number for very common values, or
+    :func:`attribute_cooccurrence_edges` to get the edges as a DataFrame
+    without building a graph.
+
     Returns:
         networkx.classes.graph.Graph: The generated network as a networkx Graph object.
 
@@ -72,6 +104,9 @@ def network_from_attribute(
         * "date2": date of the attribute in the right most node
         * "attribute": the type of the attribute
         * "value": the value of the attribute
+        * "weight": number of values shared by the two entities ("cliques" mode)
+
+    With backend="sparse" the edges only have "attribute" and "weight".
 
     Examples:
 
@@ -80,6 +115,13 @@ def network_from_attribute(
 
     """
 
+    if mode not in ("cliques", "value-node"):
+        raise ValueError(f"Invalid mode {mode}. Use 'cliques' or 'value-node'.")
+    if oversize not in ("sample", "skip"):
+        raise ValueError(f"Invalid oversize {oversize}. Use 'sample' or 'skip'.")
+    if backend not in ("networkx", "sparse"):
+        raise ValueError(f"Invalid backend {backend}. Use 'networkx' or 'sparse'.")
+
     G = nx.Graph()
     if session is not None:
         mysession = session
@@ -95,6 +137,33 @@ def network_from_attribute(
         ignore_values = ["?"]
 
     with mysession:
+        if mode == "cliques":
+            memberships = _attribute_memberships(
+                attribute,
+                ignore_values=ignore_values,
+                max_clique_size=max_clique_size,
+                oversize=oversize,
+                random_seed=random_seed,
+                db=db,
+                session=mysession,
+            )
+            if memberships.empty:
+                return G
+            for eid, info in _entity_nodes_info(
+                memberships["id"].unique(), mysession
+            ).items():
+                G.add_node(eid, **info)
+            if backend == "sparse":
+                edges = _sparse_cooccurrence(memberships)
+                G.add_edges_from(
+                    (id1, id2, {"attribute": attribute, "weight": int(weight)})
+                    for id1, id2, weight in edges.itertuples(index=False)
+                )
+            else:
+                B = _bipartite_graph(memberships)
+                _project_cliques(B, G, attribute)
+            return G
+
         attribute_values_list = attribute_values(
             the_type=attribute,
             db=db,
@@ -171,65 +240,441 @@ def network_from_attribute(
                                 value=avalue,
                                 obs=obs_value,
                             )
-            elif mode == "cliques":
-                # in this mode each entity with the same value is connected in a clique
-                unique = entities.index.unique()
-                for id in unique:
-                    # add the entity nodes
-                    # get info on the entity
-                    entity: Entity | None = mysession.get(Entity, id)
-                    if entity is not None:
-                        G.add_node(
-                            id,
-                            desc=entity.description,
-                            group=entity.groupname,
-                            type=entity.pom_class,
-                            source=entity.the_source,
-                        )
-                pairs = list(combinations(unique, 2))
-                if len(pairs) > 1:
-                    for id1, id2 in pairs:
-                        # get the dates and obs
-                        date1 = (
-                            entities.at[id1, date_col]
-                            if date_col in entities.columns
-                            else ""
-                        )
-                        date2 = (
-                            entities.at[id2, date_col]
-                            if date_col in entities.columns
-                            else ""
-                        )
-                        date1 = ftd(date1) if date1 else ""
-                        date2 = ftd(date2) if date2 else ""
-                        obs1: str = (
-                            entities.at[id1, obs_col]
-                            if obs_col in entities.columns
-                            else ""
-                        )
-                        obs2: str = (
-                            entities.at[id2, obs_col]
-                            if obs_col in entities.columns
-                            else ""
-                        )
-                        if ":" in date1:
-                            date1 = f'"{date1}"'
-                        if ":" in date2:
-                            date2 = f'"{date2}"'
-                        if ":" in obs1:
-                            obs1 = f'"{obs1}"'
-                        if ":" in obs2:
-                            obs2 = f'"{obs2}"'
-
-                        # add the edge
-                        G.add_edge(
-                            id1,
-                            id2,
-                            date1=date1,
-                            date2=date2,
-                            attribute=attribute,
-                            value=avalue,
-                            obs1=obs1,
-                            obs2=obs2,
-                        )
     return G
+
+
+def network_from_relations(
+    relation_type: str | list[str] | None = None,
+    relation_value: str | list[str] | None = None,
+    dates_between: tuple[str, str] | None = None,
+    user: str | None = None,
+    directed: bool = False,
+    as_dataframe: bool = False,
+    chunk_size: int = 10000,
+    db: TimelinkDatabase | None = None,
+    session=None,
+) -> nx.Graph | nx.DiGraph | pd.DataFrame:
+    """
+    Generate a network from the relations between entities.
+
+    Relations are read from the ``nrelations`` view, in a single query
+    streamed in chunks of ``chunk_size`` rows, so that only the graph
+    being built (or the resulting DataFrame) is kept in memory.
+
+    Args:
+        relation_type (str | list[str], optional): type of the relations, e.g.
+                "parentesco", "function-in-act", "identification". A string can
+                include SQL wildcards, a list matches any of the types.
+                Defaults to None (all types).
+        relation_value (str | list[str], optional): value of the relations
+                (same rules as relation_type). Defaults to None (all values).
+        dates_between (tuple[str, str], optional): (from_date, to_date) in timelink
+                format (yyyymmdd or yyyy-mm-dd), relations with
+                from_date < date < to_date. Defaults to None.
+        user (str, optional): if given, occurrences linked to real entities by
+                this user are replaced by the real entity. Defaults to None
+                (same as "*none*"), use occurrences.
+        directed (bool, optional): if True return a DiGraph from origin to
+                destination. Defaults to False.
+        as_dataframe (bool, optional): if True return an edge list DataFrame,
+                one row per relation, instead of a graph. Defaults to False.
+        chunk_size (int, optional): number of rows fetched at a time. Defaults to 10000.
+        db (TimelinkDatabase): the database. Either db or session must be provided.
+        session (object, optional): database session. Defaults to None.
+                Without db the nrelations view is reflected from the
+                database of the session.
+
+    Note:
+        ``nrelations`` only includes relations between named entities
+        (persons, objects, geoentities). Relations between two occurrences
+        of the same real entity, or of an entity with itself, are not
+        included in the graph nor in the DataFrame.
+
+    Returns:
+        * networkx.Graph or networkx.DiGraph: nodes have "id", "desc" and
+          "is_real" attributes; edges have "relation_id", "type", "value"
+          and "date" of the last relation found between the two nodes and
+          "weight", the number of relations between them.
+        * pandas.DataFrame (as_dataframe=True): columns relation_id, origin,
+          origin_name, destination, destination_name, type, value, date.
+
+    Examples:
+
+    Kinship network of the real persons identified by user "jrc":
+        ``G = network_from_relations("parentesco", user="jrc", db=db)``
+
+    """
+    if session is not None:
+        mysession = session
+    elif db is not None:
+        mysession = db.session()
+    else:
+        raise ValueError(
+            "No database nor session. Specifcy db=TimeLinkDatabase() or "
+            "session=database session."
+        )
+    if db is not None:
+        nrelations = db.get_view("nrelations")
+    else:
+        # only a session, reflect the view from its database
+        nrelations = Table("nrelations", MetaData(), autoload_with=mysession.get_bind())
+    collapse = user is not None and user != "*none*"
+    if collapse:
+        real = (
+            select(Link.entity.label("entity"), func.min(Link.rid).label("rid"))
+            .where(Link.user == user)
+            .group_by(Link.entity)
+            .subquery()
+        )
+        origin_real = real.alias("origin_real")
+        destination_real = real.alias("destination_real")
+        origin_rentity = REntity.__table__.alias("origin_rentity")
+        destination_rentity = REntity.__table__.alias("destination_rentity")
+        origin = func.coalesce(origin_real.c.rid, nrelations.c.origin_id)
+        origin_name = func.coalesce(
+            origin_rentity.c.description, nrelations.c.origin_name
+        )
+        destination = func.coalesce(destination_real.c.rid, nrelations.c.destination_id)
+        destination_name = func.coalesce(
+            destination_rentity.c.description, nrelations.c.destination_name
+        )
+        from_clause = (
+            nrelations.outerjoin(
+                origin_real, origin_real.c.entity == nrelations.c.origin_id
+            )
+            .outerjoin(origin_rentity, origin_rentity.c.id == origin_real.c.rid)
+            .outerjoin(
+                destination_real,
+                destination_real.c.entity == nrelations.c.destination_id,
+            )
+            .outerjoin(
+                destination_rentity,
+                destination_rentity.c.id == destination_real.c.rid,
+            )
+        )
+        origin_is_real = origin_real.c.rid.is_not(None)
+        destination_is_real = destination_real.c.rid.is_not(None)
+    else:
+        origin = nrelations.c.origin_id
+        origin_name = nrelations.c.origin_name
+        destination = nrelations.c.destination_id
+        destination_name = nrelations.c.destination_name
+        from_clause = nrelations
+        origin_is_real = destination_is_real = False
+
+    stmt = select(
+        nrelations.c.relation_id.label("relation_id"),
+        origin.label("origin"),
+        origin_name.label("origin_name"),
+        destination.label("destination"),
+        destination_name.label("destination_name"),
+        nrelations.c.relation_type.label("type"),
+        nrelations.c.relation_value.label("value"),
+        nrelations.c.relation_date.label("date"),
+    ).select_from(from_clause).where(origin != destination)
+    if collapse:
+        stmt = stmt.add_columns(
+            origin_is_real.label("origin_is_real"),
+            destination_is_real.label("destination_is_real"),
+        )
+
+    for column, spec in (
+        (nrelations.c.relation_type, relation_type),
+        (nrelations.c.relation_value, relation_value),
+    ):
+        if spec is None:
+            continue
+        if isinstance(spec, list):
+            stmt = stmt.where(column.in_(spec))
+        else:
+            stmt = stmt.where(column.like(spec))
+    if dates_between is not None:
+        first_date, last_date = dates_between
+        stmt = stmt.where(
+            and_(
+                nrelations.c.relation_date > first_date.replace("-", ""),
+                nrelations.c.relation_date < last_date.replace("-", ""),
+            )
+        )
+
+    columns = [
+        "relation_id",
+        "origin",
+        "origin_name",
+        "destination",
+        "destination_name",
+        "type",
+        "value",
+        "date",
+    ]
+    chunks = []
+    G = nx.DiGraph() if directed else nx.Graph()
+    with mysession:
+        result = mysession.execute(stmt, execution_options={"yield_per": chunk_size})
+        for partition in result.partitions():
+            if as_dataframe:
+                chunks.append(
+                    pd.DataFrame.from_records(
+                        [row[:8] for row in partition], columns=columns
+                    )
+                )
+                continue
+            for row in partition:
+                for node, name, is_real in (
+                    (row.origin, row.origin_name, collapse and row.origin_is_real),
+                    (
+                        row.destination,
+                        row.destination_name,
+                        collapse and row.destination_is_real,
+                    ),
+                ):
+                    if node not in G:
+                        G.add_node(node, id=node, desc=name, is_real=bool(is_real))
+                if G.has_edge(row.origin, row.destination):
+                    weight = G[row.origin][row.destination]["weight"] + 1
+                else:
+                    weight = 1
+                G.add_edge(
+                    row.origin,
+                    row.destination,
+                    relation_id=row.relation_id,
+                    type=row.type,
+                    value=row.value,
+                    date=row.date,
+                    weight=weight,
+                )
+    if as_dataframe:
+        if len(chunks) == 0:
+            return pd.DataFrame(columns=columns)
+        return pd.concat(chunks, ignore_index=True)
+    return G
+
+
+def attribute_cooccurrence_edges(
+    attribute: str,
+    ignore_values: list[str] | None = None,
+    max_clique_size: int | None = None,
+    oversize: str = "sample",
+    random_seed: int | None = None,
+    db: TimelinkDatabase | None = None,
+    session=None,
+) -> pd.DataFrame:
+    """Edge list of entities that share values of an attribute.
+
+    This is the "cliques" topology of :func:`network_from_attribute`
+    computed as the product of the sparse entity x value incidence
+    matrix by its transpose. The pairs are produced as numpy arrays,
+    without creating a Python object per pair, so the result can be
+    saved or filtered before building a graph, e.g. with
+    ``nx.from_pandas_edgelist(edges, "id1", "id2", "weight")``.
+
+    Requires scipy.
+
+    Args:
+        attribute (str): The name (type) of the attribute.
+        ignore_values (list[str], optional): values to ignore. Defaults to ["?"].
+        max_clique_size (int, optional): see :func:`network_from_attribute`.
+        oversize (str, optional): see :func:`network_from_attribute`.
+        random_seed (int, optional): see :func:`network_from_attribute`.
+        db (TimelinkDatabase): the database.
+        session (object, optional): database session, if None uses db.session().
+
+    Returns:
+        pandas.DataFrame: columns "id1", "id2" and "weight" (number of shared values),
+        one row per pair of entities, with id1 < id2 in the order of first occurrence.
+    """
+    if oversize not in ("sample", "skip"):
+        raise ValueError(f"Invalid oversize {oversize}. Use 'sample' or 'skip'.")
+    if session is not None:
+        mysession = session
+    elif db is not None:
+        mysession = db.session()
+    else:
+        raise ValueError(
+            "No database nor session. Specifcy db=TimeLinkDatabase() or "
+            "session=database session."
+        )
+    with mysession:
+        memberships = _attribute_memberships(
+            attribute,
+            ignore_values=ignore_values,
+            max_clique_size=max_clique_size,
+            oversize=oversize,
+            random_seed=random_seed,
+            db=db,
+            session=mysession,
+        )
+    return _sparse_cooccurrence(memberships)
+
+
+def _attribute_memberships(
+    attribute: str,
+    ignore_values=None,
+    max_clique_size=None,
+    oversize="sample",
+    random_seed=None,
+    db: TimelinkDatabase | None = None,
+    session=None,
+) -> pd.DataFrame:
+    """Fetch the entity-value pairs of an attribute in a single query.
+
+    Returns a DataFrame with columns "id", "value", "date" and "obs",
+    one row per entity and value (first occurrence, in date order),
+    with oversized values sampled or removed.
+    """
+    columns = ["id", "value", "date", "obs"]
+    if ignore_values is None:
+        ignore_values = ["?"]
+
+    rows = entities_with_attribute(the_type=attribute, db=db, session=session)
+    if rows is None or rows.empty:
+        return pd.DataFrame(columns=columns)
+
+    # entities_with_attribute uses LIKE, keep only the exact type
+    rows = rows[rows[f"{attribute}.type"] == attribute]
+    memberships = pd.DataFrame(
+        {
+            "id": rows.index,
+            "value": rows[attribute].values,
+            "date": rows[f"{attribute}.date"].values,
+            "obs": rows[f"{attribute}.obs"].values,
+        }
+    )
+    memberships = memberships[
+        memberships["value"].notna() & ~memberships["value"].isin(ignore_values)
+    ]
+    memberships = memberships.drop_duplicates(subset=["id", "value"])
+
+    if max_clique_size is not None:
+        sizes = memberships["value"].value_counts()
+        oversized = memberships["value"].isin(sizes[sizes > max_clique_size].index)
+        if oversize == "sample" and oversized.any():
+            sampled = (
+                memberships[oversized]
+                .groupby("value", group_keys=False)
+                .sample(n=max_clique_size, random_state=random_seed)
+            )
+            memberships = pd.concat([memberships[~oversized], sampled]).sort_index()
+        else:
+            memberships = memberships[~oversized]
+
+    return memberships.reset_index(drop=True)[columns]
+
+
+def _entity_nodes_info(ids, session, chunk_size=500) -> dict:
+    """Node attributes for a list of entity ids.
+
+    Entities are fetched in chunks and by class, so that the
+    description of specialized entities (e.g. names of persons)
+    is available without a query per entity.
+    """
+    ids = list(ids)
+    info = {}
+    for start in range(0, len(ids), chunk_size):
+        chunk = ids[start:start + chunk_size]
+        by_class = defaultdict(list)
+        for eid, pom_class in session.execute(
+            select(Entity.id, Entity.pom_class).where(Entity.id.in_(chunk))
+        ):
+            by_class[pom_class].append(eid)
+        for pom_class, class_ids in by_class.items():
+            orm_class = Entity.get_orm_for_pom_class(pom_class)
+            if orm_class is None:
+                orm_class = Entity
+            for entity in session.scalars(
+                select(orm_class).where(orm_class.id.in_(class_ids))
+            ):
+                info[entity.id] = {
+                    "desc": entity.description,
+                    "group": entity.groupname,
+                    "type": entity.pom_class,
+                    "source": entity.the_source,
+                }
+    # keep the order of the ids
+    return {eid: info[eid] for eid in ids if eid in info}
+
+
+def _bipartite_graph(memberships: pd.DataFrame) -> nx.Graph:
+    """Bipartite graph entities (bipartite=0) - values (bipartite=1).
+
+    Value nodes are tuples ("value", value) to avoid clashes with
+    entity ids. Edges keep the date and obs of the attribute.
+    """
+    B = nx.Graph()
+    for eid, value, date, obs in memberships.itertuples(index=False):
+        value_node = ("value", value)
+        B.add_node(eid, bipartite=0)
+        B.add_node(value_node, bipartite=1, value=value)
+        B.add_edge(value_node, eid, date=date, obs=obs)
+    return B
+
+
+def _quoted(text) -> str:
+    """Quote a string with ":" for use in edge attributes."""
+    if text is None or text != text:  # None or NaN
+        return ""
+    text = str(text)
+    if ":" in text:
+        return f'"{text}"'
+    return text
+
+
+def _project_cliques(B: nx.Graph, G: nx.Graph, attribute: str):
+    """Weighted projection of the bipartite graph B onto the entities.
+
+    Edges are added to G. The "weight" is the number of shared values,
+    as in :func:`networkx.algorithms.bipartite.weighted_projected_graph`,
+    the other edge attributes refer to the last shared value.
+    """
+    for value_node, value_data in B.nodes(data=True):
+        if value_data.get("bipartite") != 1:
+            continue
+        value = value_data["value"]
+        members = [
+            (eid, ftd(edge["date"]) if edge["date"] else "", edge["obs"])
+            for eid, edge in B[value_node].items()
+        ]
+        for (id1, date1, obs1), (id2, date2, obs2) in combinations(members, 2):
+            if G.has_edge(id1, id2):
+                weight = G[id1][id2]["weight"] + 1
+            else:
+                weight = 1
+            G.add_edge(
+                id1,
+                id2,
+                date1=_quoted(date1),
+                date2=_quoted(date2),
+                attribute=attribute,
+                value=value,
+                obs1=_quoted(obs1),
+                obs2=_quoted(obs2),
+                weight=weight,
+            )
+
+
+def _sparse_cooccurrence(memberships: pd.DataFrame) -> pd.DataFrame:
+    """Pairs of entities sharing values using a sparse incidence matrix."""
+    try:
+        from scipy import sparse
+    except ImportError as exc:
+        raise ImportError(
+            "The sparse backend requires scipy. Install it with 'pip install scipy'."
+        ) from exc
+
+    if memberships.empty:
+        return pd.DataFrame(columns=["id1", "id2", "weight"])
+
+    entity_codes, entity_ids = pd.factorize(memberships["id"])
+    value_codes, values = pd.factorize(memberships["value"])
+    incidence = sparse.csr_matrix(
+        (np.ones(len(entity_codes), dtype=np.int32), (entity_codes, value_codes)),
+        shape=(len(entity_ids), len(values)),
+    )
+    cooccurrence = sparse.triu(incidence @ incidence.T, k=1).tocoo()
+    return pd.DataFrame(
+        {
+            "id1": entity_ids[cooccurrence.row],
+            "id2": entity_ids[cooccurrence.col],
+            "weight": cooccurrence.data,
+        }
+    )
@@ -303,9 +303,16 @@ class TimelinkNotebook:
         """
         return get_postgres_dbnames()
 
-    def table_row_count_df(self):
-        """Return the row count of all tables in the database"""
-        tables = self.db.table_row_count()
+    def table_row_count_df(self, estimate=False, parallel=False):
+        """Return the row count of all tables in the database
+
+        Args:
+            estimate: use the database statistics instead of counting rows
+            parallel: count rows in several tables concurrently
+
+        See TimelinkDatabase.table_row_count()
+        """
+        tables = self.db.table_row_count(estimate=estimate, parallel=parallel)
         tables_df = pandas.DataFrame(tables, columns=["table", "count"])
         return tables_df
 
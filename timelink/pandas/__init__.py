@@ -15,9 +15,35 @@ Now being integrated in the timelink-py package
 #                               name_like = name of person with function
 #                               more_funcs=['pn','mn','ppn','mpn','pmn','mmn'],....)
 
-from .name_to_df import pname_to_df  # noqa: F401
+import importlib
+
+# These functions have the name of their module. Once the module is
+# imported the package attribute would be the module, so they are bound
+# here, which loads pandas.
 from .entities_with_attribute import entities_with_attribute  # noqa: F401
 from .attribute_values import attribute_values  # noqa: F401
-from .group_attributes import group_attributes  # noqa: F401
-from .group_attributes import display_group_attributes  # noqa: F401
-from .styles import category_palette, styler_row_colors  # noqa: F401
+
+# The others are imported on first use (PEP 562), so that importing
+# one helper does not load all the others and their dependencies.
+_lazy_attributes = {
+    "pname_to_df": ".name_to_df",
+    "group_attributes": ".group_attributes",
+    "display_group_attributes": ".group_attributes",
+    "category_palette": ".styles",
+    "styler_row_colors": ".styles",
+}
+
+__all__ = ["entities_with_attribute", "attribute_values"] + list(_lazy_attributes)
+
+
+def __getattr__(name):
+    if name in _lazy_attributes:
+        module = importlib.import_module(_lazy_attributes[name], __name__)
+        value = getattr(module, name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
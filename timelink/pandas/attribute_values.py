@@ -4,7 +4,7 @@ Create a dataframe with the values of an attribute
 
 import pandas as pd
 
-from sqlalchemy import select, func, and_, desc
+from sqlalchemy import Integer, select, func, and_, desc, cast
 from sqlalchemy.orm import Session
 
 from timelink.api.database import TimelinkDatabase
@@ -18,6 +18,7 @@ def attribute_values(
     dates_between=None,
     db: TimelinkDatabase | None = None,
     session=None,
+    histogram=None,
     sql_echo=False,
 ):
     """Return the vocabulary of an attribute
@@ -34,6 +35,8 @@ def attribute_values(
         db = database to use
         session = database session to use, if None will use db.session()
         dates_between = tuple with two dates in format yyyy-mm-dd
+        histogram = None, "year" or "decade"; if set, count entities
+                    per value and period instead of per value
         sql_echo = if true will print the sql statement
 
 
@@ -42,6 +45,12 @@ def attribute_values(
     will return attributes with
     from_date < date < to_date
 
+    With histogram="year" or histogram="decade" the dataframe
+    is indexed by (value, year|decade) with a single 'count' column.
+    Periods are computed in the database from the date string;
+    attributes without a year are not counted. Use
+    ``df["count"].unstack(fill_value=0)`` to get a value x period table.
+
     """
     if the_type is None and attr_type is not None:
         warnings.warn(
@@ -61,59 +70,65 @@ def attribute_values(
     else:
         raise ValueError("db parameter is required")
 
-    attr_table = db._create_eattribute_view()
-    entities_table = db.get_table("entity")
+    try:
+        attr_table = dbsystem.get_view("eattributes")
+    except KeyError:
+        attr_table = dbsystem._create_eattribute_view()
 
-    if dates_between is not None:
-        first_date, last_date = dates_between
+    if histogram is None:
+        columns = ["value", "count", "date_min", "date_max"]
+        index = ["value"]
         stmt = select(
             attr_table.c.the_value.label("value"),
             func.count(attr_table.c.entity.distinct()).label("count"),
             func.min(attr_table.c.the_date).label("date_min"),
             func.max(attr_table.c.the_date).label("date_max"),
-        ).where(
-            and_(
-                attr_table.c.the_type == the_type,
-                attr_table.c.the_date > first_date.strip("-"),
-                attr_table.c.the_date < last_date.strip("-"),
-            )
         )
-
     else:
+        # bucket computed in the database from the yyyymmdd string
+        if histogram == "year":
+            bucket = cast(func.substr(attr_table.c.the_date, 1, 4), Integer)
+        elif histogram == "decade":
+            bucket = cast(func.substr(attr_table.c.the_date, 1, 3), Integer) * 10
+        else:
+            raise ValueError("histogram must be None, 'year' or 'decade'")
+        bucket = bucket.label(histogram)
+        columns = ["value", histogram, "count"]
+        index = ["value", histogram]
         stmt = select(
             attr_table.c.the_value.label("value"),
+            bucket,
             func.count(attr_table.c.entity.distinct()).label("count"),
-            func.min(attr_table.c.the_date).label("date_min"),
-            func.max(attr_table.c.the_date).label("date_max"),
-        ).where(attr_table.c.the_type == the_type)
+        ).where(
+            func.length(attr_table.c.the_date) >= 4,
+            func.substr(attr_table.c.the_date, 1, 4) != "0000",
+        )
 
-    if groupname is not None:
-        if isinstance(groupname, list):
-            stmt = stmt.where(
-                select(entities_table.c.id)
-                .where(
-                    and_(
-                        entities_table.c.id == attr_table.c.entity,
-                        entities_table.c.groupname.in_(groupname),
-                    )
-                )
-                .exists()
+    stmt = stmt.where(attr_table.c.the_type == the_type)
+
+    if dates_between is not None:
+        first_date, last_date = dates_between
+        stmt = stmt.where(
+            and_(
+                attr_table.c.the_date > first_date.replace("-", ""),
+                attr_table.c.the_date < last_date.replace("-", ""),
             )
+        )
 
+    if groupname is not None:
+        # e_groupname is the group of the entity that has the attribute,
+        # already joined in the view.
+        if isinstance(groupname, list):
+            stmt = stmt.where(attr_table.c.e_groupname.in_(groupname))
         else:
-            # where entity exists in entities with groupname = groupname
-            stmt = stmt.where(
-                select(entities_table.c.id)
-                .where(
-                    and_(
-                        entities_table.c.id == attr_table.c.entity,
-                        entities_table.c.groupname == groupname,
-                    )
-                )
-                .exists()
-            )
+            stmt = stmt.where(attr_table.c.e_groupname == groupname)
 
-    stmt = stmt.group_by(attr_table.c.the_value).order_by(desc("count"))
+    if histogram is None:
+        stmt = stmt.group_by(attr_table.c.the_value).order_by(desc("count"))
+    else:
+        stmt = stmt.group_by(attr_table.c.the_value, bucket).order_by(
+            attr_table.c.the_value, bucket
+        )
 
     if sql_echo:
         print(stmt)
@@ -124,10 +139,8 @@ def attribute_values(
     else:
         mysession = session
     with mysession:
-        records = mysession.execute(stmt)
+        records = mysession.execute(stmt).all()
 
-    df = pd.DataFrame.from_records(
-        records, index=["value"], columns=["value", "count", "date_min", "date_max"]
-    )
+    df = pd.DataFrame.from_records(records, index=index, columns=columns)
 
     return df
@@ -2,11 +2,14 @@
 
 """
 
+import warnings
+
 from sqlalchemy import select
 import pandas as pd
 
 from timelink.api.database import TimelinkDatabase
 from timelink.api.models import Person
+from timelink.api.models.person_name import similar_names_select
 
 
 def remove_particles(name, particles=None):
@@ -30,10 +33,20 @@ def pname_to_df(
         name: name to search for
         db: = database connection to use, either db or session must be specified
         session: session to use, either db or session must be specified
-        similar: if true will strip particles and insert a wild card %
-                between name components with an extra one at the end
-        name_particles: list, particles to remove before comparing names
+        similar: if true search normalized names (lowercase, no accents,
+                no particles) for the name components in order, the
+                first one at the start of the name. Uses the name search
+                index maintained at import (see timelink.api.models.person_name)
+        name_particles: deprecated and ignored, similar search removes the
+                particles in timelink.api.models.person_name.NAME_PARTICLES,
+                those removed from the names in the index
     """
+    if name_particles is not None:
+        warnings.warn(
+            "name_particles is ignored, similar search uses NAME_PARTICLES",
+            DeprecationWarning,
+            stacklevel=2,
+        )
     if db is not None:  # try if we have a db connection in the parameters
         my_session = db.session()
     elif session is not None:
@@ -43,18 +56,18 @@ def pname_to_df(
             Exception("must provide database connection (db=) or session (session=)")
         )
 
-    if similar:
-        name_particles = remove_particles(name).split(" ")
-        name_like = "%".join(name_particles)
-        name_like = name_like + "%"
-    else:
-        name_like = name
-
     ptable = Person.__table__
 
-    stmt = select(ptable.c.id, ptable.c.name, ptable.c.sex, ptable.c.obs).where(
-        ptable.c.name.like(name_like)
-    )
+    stmt = select(ptable.c.id, ptable.c.name, ptable.c.sex, ptable.c.obs)
+    if similar:
+        dialect_name = my_session.get_bind().dialect.name
+        stmt = stmt.where(
+            ptable.c.id.in_(
+                similar_names_select(name, dialect_name)
+            )
+        )
+    else:
+        stmt = stmt.where(ptable.c.name.like(name))
 
     if sql_echo:
         print(stmt)